@@ -15,6 +15,8 @@
     selectedEvent: null,
     originalSelectedEvent: null, // Original event when first entering detail view (for back button text)
     renderedMonthRange: null, // {startYear, startMonth, endYear, endMonth}
+    shardIndex: null, // Month shard index of the selected calendar (null: whole .ics files are loaded)
+    loadedMonths: new Set(), // Month keys ('YYYY-MM') of the shards already requested
     isLoadingMonths: false, // Flag to prevent multiple simultaneous loads
     currentTimeUpdateInterval: null, // Interval ID for updating current time indicator
     currentTimeUpdateTimeout: null, // Timeout ID for initial current time update
@@ -256,6 +258,105 @@
     });
   }
 
+  // Load the month shard index of the calendar
+  async function loadShardIndex(filename) {
+    const base = `data/shards/${state.language}/${filename.replace('.ics', '')}`;
+    try {
+      const response = await fetch(`${base}/index.json`);
+      if (!response.ok) return false;
+
+      const index = await response.json();
+      index.base = base;
+      state.shardIndex = index;
+      return true;
+    } catch (error) {
+      console.error('Error loading shard index:', error);
+      return false;
+    }
+  }
+
+  function getMonthKey(year, month) {
+    const date = new Date(year, month, 1);
+    return `${date.getFullYear()}-${String(date.getMonth() + 1).padStart(2, '0')}`;
+  }
+
+  // Load month shards in the range and merge them into state.events
+  // Returns true if any new event is added
+  async function ensureMonthsLoaded(startYear, startMonth, endYear, endMonth) {
+    const keys = [];
+    const date = new Date(startYear, startMonth, 1);
+    const endDate = new Date(endYear, endMonth, 1);
+    while (date <= endDate) {
+      keys.push(getMonthKey(date.getFullYear(), date.getMonth()));
+      date.setMonth(date.getMonth() + 1);
+    }
+
+    return loadMonthShards(keys);
+  }
+
+  async function ensureAllMonthsLoaded() {
+    if (!state.shardIndex) return false;
+    return loadMonthShards(Object.keys(state.shardIndex.months));
+  }
+
+  async function loadMonthShards(keys) {
+    const index = state.shardIndex;
+    if (!index) return false;
+
+    // Mark months as loaded before fetching to avoid duplicate requests
+    const targetKeys = keys.filter(key => index.months[key] && !state.loadedMonths.has(key));
+    if (targetKeys.length === 0) return false;
+    targetKeys.forEach(key => state.loadedMonths.add(key));
+
+    const shards = await Promise.all(targetKeys.map(async key => {
+      try {
+        // The hash in the index changes only when the shard changes, so the shard can be cached
+        const response = await fetch(`${index.base}/${key}.json?v=${index.months[key]}`);
+        return await response.json();
+      } catch (error) {
+        console.error('Error loading month shard:', key, error);
+        state.loadedMonths.delete(key);
+        return [];
+      }
+    }));
+
+    // Ignore the result if another calendar has been selected while loading
+    if (state.shardIndex !== index) return false;
+
+    // Events around the month boundary are included in both shards
+    const loadedUids = new Set(state.events.map(event => event.uid));
+    let added = false;
+    shards.forEach(entries => {
+      entries.forEach(entry => {
+        if (loadedUids.has(entry.uid)) return;
+        loadedUids.add(entry.uid);
+        state.events.push(createEventFromShard(entry));
+        added = true;
+      });
+    });
+
+    if (added) {
+      state.events.sort((a, b) => a.startDate - b.startDate);
+    }
+
+    return added;
+  }
+
+  function createEventFromShard(entry) {
+    return {
+      uid: entry.uid,
+      summary: entry.summary,
+      description: entry.description,
+      location: entry.location,
+      url: entry.url,
+      // All-day events are dates in the local time zone
+      startDate: entry.allDay ? parseDateFromURL(entry.start) : new Date(entry.start),
+      endDate: entry.allDay ? parseDateFromURL(entry.end) : new Date(entry.end),
+      isAllDay: entry.allDay,
+      geo: entry.geo ? { lat: entry.geo[0], lng: entry.geo[1] } : null,
+    };
+  }
+
   // Load and parse iCal data
   async function loadCalendar(filename) {
     // Show loading indicator first
@@ -263,6 +364,16 @@
 
     // Clear events
     state.events = [];
+    state.shardIndex = null;
+    state.loadedMonths = new Set();
+
+    // Load only the months around the current date if the calendar has month shards
+    if (await loadShardIndex(filename)) {
+      const date = state.currentDate;
+      await ensureMonthsLoaded(date.getFullYear(), date.getMonth() - 6, date.getFullYear(), date.getMonth() + 6);
+      renderCurrentView();
+      return;
+    }
 
     try {
       const files = filename === 'events.ics' ? ['events.ics', 'birthdays.ics'] : [filename];
@@ -663,6 +774,29 @@
 
       currentDate.setMonth(currentDate.getMonth() + 1);
     }
+
+    // Load month shards of the range and re-render the months which got new events
+    ensureMonthsLoaded(actualStartYear, actualStartMonth, actualEndYear, actualEndMonth).then(added => {
+      if (added) {
+        refreshMonthSections(actualStartYear, actualStartMonth - 1, actualEndYear, actualEndMonth + 1);
+      }
+    });
+  }
+
+  function refreshMonthSections(startYear, startMonth, endYear, endMonth) {
+    const calendar = document.getElementById('month-calendar-body');
+    if (!calendar) return;
+
+    const date = new Date(startYear, startMonth, 1);
+    const endDate = new Date(endYear, endMonth, 1);
+    while (date <= endDate) {
+      const dateKey = `${date.getFullYear()}-${date.getMonth()}`;
+      const existing = calendar.querySelector(`.month-section[data-date="${dateKey}"]`);
+      if (existing) {
+        calendar.replaceChild(createMonthSection(new Date(date.getFullYear(), date.getMonth(), 1)), existing);
+      }
+      date.setMonth(date.getMonth() + 1);
+    }
   }
 
   function insertMonthSectionInOrder(calendar, newSection, year, month) {
@@ -1558,6 +1692,14 @@
     const container = document.getElementById('day-view');
     container.innerHTML = '';
 
+    // Load month shards around the day and re-render if new events are found
+    const shownDate = state.selectedDate;
+    ensureMonthsLoaded(shownDate.getFullYear(), shownDate.getMonth() - 1, shownDate.getFullYear(), shownDate.getMonth() + 1).then(added => {
+      if (added && state.currentView === 'day' && state.selectedDate === shownDate) {
+        renderDayView();
+      }
+    });
+
     // Add swipe support
     let touchStartX = 0;
     let touchEndX = 0;
@@ -1856,6 +1998,14 @@
 
     const event = state.selectedEvent;
 
+    // Load month shards around the event to show other events of the day
+    const eventDate = event.startDate;
+    ensureMonthsLoaded(eventDate.getFullYear(), eventDate.getMonth() - 1, eventDate.getFullYear(), eventDate.getMonth() + 1).then(added => {
+      if (added && state.currentView === 'detail' && state.selectedEvent === event) {
+        renderDetailView();
+      }
+    });
+
     // Header
     const header = document.createElement('div');
     header.className = 'detail-header';
@@ -2457,6 +2607,18 @@
     return btoa(encodeURIComponent(`${event.summary}-${dateStr}`)).replace(/=/g, '');
   }
 
+  // Get the start date from an event ID (see getEventId)
+  function getDateFromEventId(eventId) {
+    try {
+      const parts = decodeURIComponent(atob(eventId)).split('-');
+      const [year, month, day] = parts.slice(-5).map(Number);
+      const date = new Date(year, month, day);
+      return isNaN(date.getTime()) ? null : date;
+    } catch (error) {
+      return null;
+    }
+  }
+
   function findEventById(eventId) {
     for (const event of state.events) {
       if (getEventId(event) === eventId) {
@@ -2523,12 +2685,25 @@
   }
 
   // Search functionality
-  function performSearch(query) {
+  async function performSearch(query) {
     if (!query || query.trim() === '') {
       document.getElementById('search-results').classList.remove('active');
       return;
     }
 
+    const indexResults = await searchWithIndex(query);
+
+    // Ignore the result if the query has been changed while searching
+    if (document.getElementById('search-input').value !== query) return;
+
+    if (indexResults !== null) {
+      renderSearchResults(indexResults);
+      return;
+    }
+
+    // Without the search index, search needs all events of the calendar
+    await ensureAllMonthsLoaded();
+
     const terms = query.toLowerCase().split(' ').filter(t => t);
     const results = state.events.filter(event => {
       const searchText = `${event.summary} ${event.description} ${event.location}`.toLowerCase();
@@ -2538,6 +2713,93 @@
     renderSearchResults(results);
   }
 
+  // Search with the prebuilt index without loading events
+  // Returns null if the index is not available
+  async function searchWithIndex(query) {
+    if (typeof NijiSearch === 'undefined') return null;
+
+    try {
+      const [docs, talents] = await Promise.all([
+        NijiSearch.searchEvents(state.language, query),
+        NijiSearch.getTalents(),
+      ]);
+
+      const talentId = talents.findIndex(talent => talent.calendar === state.selectedCalendar);
+      const results = [];
+      docs.forEach(doc => {
+        if (state.selectedCalendar !== 'events' && !(talentId >= 0 && searchDocHasTalent(doc, talentId, talents[talentId]))) {
+          return;
+        }
+        results.push(...createEventsFromSearchDoc(doc));
+      });
+      return results;
+    } catch (error) {
+      console.error('Error searching with index:', error);
+      return null;
+    }
+  }
+
+  // Same rule as Event.has_talent
+  function searchDocHasTalent(doc, talentId, talent) {
+    if (doc.org) {
+      const begin = new Date(doc.start);
+      if (talent.until && new Date(talent.until) < begin) {
+        // It won't include the event if it's later than their graduation
+      } else if (begin > new Date(talent.since)) {
+        return true;
+      }
+    }
+
+    return doc.talents.includes(talentId);
+  }
+
+  function createEventsFromSearchDoc(doc) {
+    const event = {
+      uid: doc.uid,
+      summary: doc.summary,
+      location: doc.location,
+      isAllDay: doc.allDay,
+      fromSearchIndex: true,
+    };
+
+    if (!doc.yearly) {
+      return [{
+        ...event,
+        startDate: doc.allDay ? parseDateFromURL(doc.start) : new Date(doc.start),
+        endDate: doc.allDay ? parseDateFromURL(doc.end) : new Date(doc.end),
+      }];
+    }
+
+    // Expand yearly events in the same range as recurring events in .ics files
+    const start = parseDateFromURL(doc.start);
+    const days = Math.round((parseDateFromURL(doc.end) - start) / (24 * 60 * 60 * 1000));
+    const events = [];
+    for (let year = start.getFullYear(); year <= new Date().getFullYear() + 1; year++) {
+      const startDate = new Date(year, start.getMonth(), start.getDate());
+      // Skip February 29 in non-leap years
+      if (startDate.getMonth() !== start.getMonth()) continue;
+
+      events.push({
+        ...event,
+        uid: `${doc.uid}-${formatDateForURL(startDate)}`,
+        startDate: startDate,
+        endDate: new Date(year, start.getMonth(), start.getDate() + days),
+      });
+    }
+    return events;
+  }
+
+  // Get the loaded event of a search result to show its details
+  async function resolveSearchResult(event) {
+    if (!event.fromSearchIndex) return event;
+
+    const date = event.startDate;
+    await ensureMonthsLoaded(date.getFullYear(), date.getMonth(), date.getFullYear(), date.getMonth());
+
+    const loadedEvent = state.events.find(e => e.uid === event.uid);
+    return loadedEvent || { ...event, description: '', url: '', geo: null };
+  }
+
   function renderSearchResults(results) {
     const container = document.getElementById('search-results');
     container.innerHTML = '';
@@ -2585,8 +2847,8 @@
         item.appendChild(locationDiv);
       }
 
-      item.onclick = () => {
-        showEventDetail(event, 'search');
+      item.onclick = async () => {
+        showEventDetail(await resolveSearchResult(event), 'search');
       };
 
       container.appendChild(item);
@@ -2962,6 +3224,21 @@
         renderCurrentView();
         return true;
       }
+
+      // The event may be in a month shard which is not loaded yet
+      const eventDate = state.shardIndex ? getDateFromEventId(eventId) : null;
+      if (eventDate) {
+        ensureMonthsLoaded(eventDate.getFullYear(), eventDate.getMonth(), eventDate.getFullYear(), eventDate.getMonth()).then(() => {
+          const loadedEvent = findEventById(eventId);
+          if (loadedEvent) {
+            state.selectedEvent = loadedEvent;
+            state.currentView = 'detail';
+            state.previousView = from || 'month';
+          }
+          renderCurrentView();
+        });
+        return true;
+      }
     } else if (view === 'year' && dateStr) {
       state.currentDate = parseDateFromURL(dateStr);
       state.currentView = 'year';
@@ -1,13 +1,169 @@
+// Client of the prebuilt search index (data/search, generated by nijical/search.py)
+var NijiSearch = (function() {
+    var baseUrl = new URL('../data/search/', document.currentScript.src).href;
+    var requests = {};
+
+    function fetchJSON(path) {
+        if (!(path in requests)) {
+            requests[path] = fetch(baseUrl + path).then(function(response) {
+                if (!response.ok) {
+                    throw new Error('Failed to load ' + path + ': ' + response.status);
+                }
+                return response.json();
+            });
+            requests[path].catch(function() {
+                delete requests[path];
+            });
+        }
+        return requests[path];
+    }
+
+    function normalize(text) {
+        return text.normalize('NFKC').toLowerCase();
+    }
+
+    function getGrams(term) {
+        var chars = Array.from(term);
+        var grams = [];
+        for (var i = 0; i < chars.length - 1; i++) {
+            grams.push(chars[i] + chars[i + 1]);
+        }
+        return grams;
+    }
+
+    // 32-bit FNV-1a over code points (same as SearchIndex.get_bucket)
+    function getBucket(gram, bucketCount) {
+        var value = 0x811c9dc5;
+        Array.from(gram).forEach(function(char) {
+            value = Math.imul(value ^ char.codePointAt(0), 0x01000193) >>> 0;
+        });
+        return value % bucketCount;
+    }
+
+    // Find IDs of the documents which include all terms of the query
+    function searchIds(query, texts, getPostings) {
+        var terms = normalize(query).split(/\s+/).filter(function(term) { return term; });
+        var grams = [];
+        terms.forEach(function(term) {
+            grams = grams.concat(getGrams(term));
+        });
+
+        return Promise.all(grams.map(getPostings)).then(function(postings) {
+            var ids = null;
+            postings.forEach(function(posting) {
+                var set = new Set(posting);
+                ids = ids === null ? posting : ids.filter(function(id) { return set.has(id); });
+            });
+
+            // Single character queries don't have bigrams
+            if (ids === null) {
+                ids = texts.map(function(text, id) { return id; });
+            }
+
+            // Bigrams can match in different positions, so check the texts
+            return ids.filter(function(id) {
+                return terms.every(function(term) { return texts[id].includes(term); });
+            });
+        });
+    }
+
+    function getTalents() {
+        return fetchJSON('talents.json').then(function(data) {
+            return data.docs.map(function(doc) {
+                return {
+                    name: doc[0],
+                    romaji: doc[1],
+                    furigana: doc[2],
+                    calendar: doc[3],
+                    since: doc[4],
+                    until: doc[5],
+                };
+            });
+        });
+    }
+
+    function searchTalents(query) {
+        return Promise.all([fetchJSON('talents.json'), getTalents()]).then(function(results) {
+            var data = results[0];
+            var talents = results[1];
+            return searchIds(query, data.texts, function(gram) {
+                return data.grams[gram] || [];
+            }).then(function(ids) {
+                return ids.map(function(id) { return talents[id]; });
+            });
+        });
+    }
+
+    function searchEvents(lang, query) {
+        return Promise.all([fetchJSON('events.json'), fetchJSON(lang + '/events.json')]).then(function(results) {
+            var index = results[0];
+            var docs = results[1].docs;
+            return searchIds(query, index.texts, function(gram) {
+                var bucket = String(getBucket(gram, index.buckets)).padStart(2, '0');
+                return fetchJSON('events-' + bucket + '.json').then(function(postings) {
+                    return postings[gram] || [];
+                });
+            }).then(function(ids) {
+                return ids.map(function(id) {
+                    var doc = docs[id];
+                    return {
+                        uid: doc[0],
+                        summary: doc[1],
+                        start: doc[2],
+                        end: doc[3],
+                        allDay: doc[4],
+                        yearly: doc[5],
+                        location: doc[6],
+                        talents: doc[7],
+                        org: doc[8],
+                    };
+                });
+            });
+        });
+    }
+
+    return {
+        getTalents: getTalents,
+        searchTalents: searchTalents,
+        searchEvents: searchEvents,
+    };
+})();
+
+var filterRequestCount = 0;
+
 function updateFilter(event) {
     var searchString = event.currentTarget.value.toLowerCase();
     var elements = document.getElementsByClassName('liver-item');
     var livers = Array.from(elements);
-    livers.forEach(function(liver) {
-        if (searchString == '' || liver.getAttribute('tags').includes(searchString)) {
-            liver.style.display = 'table-row';
-        } else {
-            liver.style.display = 'none';
-        }
+    var requestCount = ++filterRequestCount;
+
+    function showLivers(isVisible) {
+        livers.forEach(function(liver) {
+            liver.style.display = isVisible(liver) ? 'table-row' : 'none';
+        });
+    }
+
+    if (searchString == '') {
+        showLivers(function() { return true; });
+        return;
+    }
+
+    NijiSearch.searchTalents(searchString).then(function(talents) {
+        if (requestCount !== filterRequestCount) return;
+
+        var calendars = new Set(talents.map(function(talent) { return talent.calendar; }));
+        showLivers(function(liver) {
+            var link = liver.querySelector('a').getAttribute('href');
+            return calendars.has(link.substring(link.lastIndexOf('/') + 1).replace('.ics', ''));
+        });
+    }).catch(function(error) {
+        // Fall back to the tags of the rows if the index is not available
+        console.error('Error searching talents:', error);
+        if (requestCount !== filterRequestCount) return;
+
+        showLivers(function(liver) {
+            return liver.getAttribute('tags').includes(searchString);
+        });
     });
 }
 
@@ -0,0 +1,317 @@
+import argparse
+import arrow
+import asyncio
+import io
+import json
+import sys
+from datetime import timedelta
+from .dataset import Dataset
+from .diff import UPDATE_TWEET_PREFIXES, compute_change_set
+from .fetch import Fetcher
+from .folding import OutputProfile
+from .manifest import StampManifest
+from .nijical import NijiCal
+from .overlap import find_overlaps, write_overlaps_csv
+from .partition import merge_partitions, verify_partitions
+from .server import CalendarServer
+from .store import EventStore
+from .validator import IssueLevel, Validator
+
+
+# Exit code of fetch when none of the files changed
+NO_CHANGES = 3
+
+
+def fetch(args: argparse.Namespace) -> int:
+    targets: list[tuple[str, str]] = []
+    for target in args.targets:
+        path, separator, url = target.partition("=")
+        if separator == "" or url == "":
+            print(f"Invalid target '{target}': expected PATH=URL", file=sys.stderr)
+            return 2
+        targets.append((path, url))
+
+    results = Fetcher(args.cache).fetch_all(targets)
+    for result in results:
+        state = "updated" if result.changed else "not changed"
+        print(f"{result.path}: {state} ({result.status})", file=sys.stderr)
+
+    if not any(result.changed for result in results):
+        return NO_CHANGES
+    return 0
+
+
+def validate(args: argparse.Namespace) -> int:
+    issues = Validator(args.talents, args.events, args.tickets).validate()
+    for issue in issues:
+        print(issue, file=sys.stderr)
+
+    errors = [issue for issue in issues if issue.level == IssueLevel.ERROR]
+    warnings = len(issues) - len(errors)
+    if issues:
+        print(f"{len(errors)} error(s), {warnings} warning(s)", file=sys.stderr)
+
+    if errors or (args.strict and warnings > 0):
+        return 1
+    return 0
+
+
+def serve(args: argparse.Namespace) -> int:
+    instance = NijiCal(args.talents, args.events, args.tickets, url_prefix="")
+    # Events which differ from the manifest are stamped with the start time,
+    # so reloading unchanged data doesn't give them a new DTSTAMP each time
+    started = arrow.utcnow()
+
+    def load() -> Dataset:
+        # Use the same DTSTAMP and SEQUENCE as the generated files without
+        # updating them
+        manifest = StampManifest(args.manifest, started)
+        return instance.load_dataset(manifest)
+
+    dataset = load()
+    watch_paths = [args.talents, args.events, args.tickets, args.manifest]
+
+    print(f"Serving on http://{args.host}:{args.port}/", file=sys.stderr)
+    server = CalendarServer(
+        dataset,
+        cache_size=args.cache_size,
+        caldav=args.caldav,
+        profile=OutputProfile(args.output_profile),
+        loader=load,
+        watch_paths=watch_paths if args.watch else None,
+    )
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def store(args: argparse.Namespace) -> int:
+    instance = NijiCal(args.talents, args.events, args.tickets, url_prefix="")
+    manifest = StampManifest(args.manifest, arrow.utcnow())
+    dataset = instance.load_dataset(manifest)
+
+    with EventStore(args.database) as event_store:
+        event_store.import_dataset(dataset)
+
+    events = len(dataset.all_events)
+    print(f"Imported {events} events into {args.database}", file=sys.stderr)
+    return 0
+
+
+def diff(args: argparse.Namespace) -> int:
+    old, new = [
+        NijiCal(
+            f"{directory}/talents.csv",
+            f"{directory}/events.csv",
+            f"{directory}/tickets.csv",
+            url_prefix="",
+        )
+        for directory in (args.old, args.new)
+    ]
+    change_set = compute_change_set(old, new)
+
+    text = json.dumps(change_set.to_dict(), ensure_ascii=False, indent=2)
+    if args.output is None:
+        print(text)
+    else:
+        with open(args.output, mode="w", encoding="utf_8") as file:
+            file.write(text + "\n")
+
+    # Two lines as tweet_calendar_update.py expects in the pull request body,
+    # each short enough to be tweeted after its prefix
+    import pkg_resources_compat  # noqa: F401
+    from twitter_text import parse_tweet
+
+    summary = "\n".join(
+        change_set.generate_summary(
+            is_english,
+            is_valid=lambda line: parse_tweet(
+                UPDATE_TWEET_PREFIXES[is_english] + line
+            ).valid,
+        )
+        for is_english in (False, True)
+    )
+    if args.summary is None:
+        print(summary, file=sys.stderr)
+    else:
+        with open(args.summary, mode="w", encoding="utf_8") as file:
+            file.write(summary)
+
+    return 0
+
+
+def overlaps(args: argparse.Namespace) -> int:
+    instance = NijiCal(args.talents, args.events, args.tickets, url_prefix="")
+    talents = instance.fetch_talents()
+    events = instance.fetch_events(talents, instance.fetch_tickets())
+    found = find_overlaps(events, timedelta(hours=args.max_hours))
+
+    if args.format == "json":
+        text = json.dumps(
+            [overlap.to_dict() for overlap in found], ensure_ascii=False, indent=2
+        )
+        text += "\n"
+    else:
+        buffer = io.StringIO()
+        write_overlaps_csv(found, buffer)
+        text = buffer.getvalue()
+
+    if args.output is None:
+        sys.stdout.write(text)
+    else:
+        with open(args.output, mode="w", encoding="utf_8") as file:
+            file.write(text)
+
+    print(f"{len(found)} overlapping event(s)", file=sys.stderr)
+    if args.strict and len(found) > 0:
+        return 1
+    return 0
+
+
+def merge(args: argparse.Namespace) -> int:
+    errors = verify_partitions(args.partitions)
+    for error in errors:
+        print(error, file=sys.stderr)
+    if errors:
+        return 1
+
+    merge_partitions(args.partitions, args.output_root)
+    print(
+        f"Merged {len(args.partitions)} partitions into {args.output_root}",
+        file=sys.stderr,
+    )
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m nijical")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    fetch_parser = subparsers.add_parser(
+        "fetch",
+        help="download the CSV files if they are changed "
+        + f"(exit code {NO_CHANGES} if nothing changed)",
+    )
+    fetch_parser.add_argument(
+        "targets", nargs="+", metavar="PATH=URL", help="file to write and URL"
+    )
+    fetch_parser.add_argument(
+        "--cache",
+        default="docs/data/fetch_cache.json",
+        help="file to store ETag, Last-Modified and hash of the files",
+    )
+    fetch_parser.set_defaults(func=fetch)
+
+    validate_parser = subparsers.add_parser(
+        "validate", help="check the CSV files and report every problem"
+    )
+    validate_parser.add_argument("talents", help="path to talents.csv")
+    validate_parser.add_argument("events", help="path to events.csv")
+    validate_parser.add_argument("tickets", help="path to tickets.csv")
+    validate_parser.add_argument(
+        "--strict", action="store_true", help="fail on warnings too"
+    )
+    validate_parser.set_defaults(func=validate)
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="serve calendars rendered on demand over HTTP"
+    )
+    serve_parser.add_argument("talents", help="path to talents.csv")
+    serve_parser.add_argument("events", help="path to events.csv")
+    serve_parser.add_argument("tickets", help="path to tickets.csv")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000)
+    serve_parser.add_argument(
+        "--cache-size", type=int, default=64, help="number of calendars to cache"
+    )
+    serve_parser.add_argument(
+        "--manifest",
+        default="docs/data/manifest.json",
+        help="manifest of DTSTAMP and SEQUENCE of the events",
+    )
+    serve_parser.add_argument(
+        "--caldav", action="store_true", help="serve read-only CalDAV under /caldav/"
+    )
+    serve_parser.add_argument(
+        "--output-profile",
+        choices=[profile.value for profile in OutputProfile],
+        default=OutputProfile.GOOGLE.value,
+        help="'strict' folds long lines for clients which require it",
+    )
+    serve_parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="reload the data when the files change (SIGHUP always reloads)",
+    )
+    serve_parser.set_defaults(func=serve)
+
+    store_parser = subparsers.add_parser(
+        "store", help="import the talents and events into a SQLite database"
+    )
+    store_parser.add_argument("database", help="path to the SQLite database")
+    store_parser.add_argument("talents", help="path to talents.csv")
+    store_parser.add_argument("events", help="path to events.csv")
+    store_parser.add_argument("tickets", help="path to tickets.csv")
+    store_parser.add_argument(
+        "--manifest",
+        default="docs/data/manifest.json",
+        help="manifest of DTSTAMP and SEQUENCE of the events",
+    )
+    store_parser.set_defaults(func=store)
+
+    diff_parser = subparsers.add_parser(
+        "diff", help="list the added, changed and removed rows of the CSV files"
+    )
+    diff_parser.add_argument(
+        "old", help="directory of talents.csv, events.csv and tickets.csv before"
+    )
+    diff_parser.add_argument("new", help="directory of the CSV files after")
+    diff_parser.add_argument(
+        "--output", help="file to write the change set in JSON (default: stdout)"
+    )
+    diff_parser.add_argument(
+        "--summary",
+        help="file to write the Japanese and English summary lines "
+        + "(default: stderr)",
+    )
+    diff_parser.set_defaults(func=diff)
+
+    overlaps_parser = subparsers.add_parser(
+        "overlaps", help="report the events of a talent at the same time"
+    )
+    overlaps_parser.add_argument("talents", help="path to talents.csv")
+    overlaps_parser.add_argument("events", help="path to events.csv")
+    overlaps_parser.add_argument("tickets", help="path to tickets.csv")
+    overlaps_parser.add_argument("--format", choices=["csv", "json"], default="csv")
+    overlaps_parser.add_argument(
+        "--output", help="file to write the report to (default: stdout)"
+    )
+    overlaps_parser.add_argument(
+        "--max-hours",
+        type=float,
+        default=24,
+        help="ignore longer events such as cafes and exhibitions (default: 24)",
+    )
+    overlaps_parser.add_argument(
+        "--strict", action="store_true", help="fail if any events overlap"
+    )
+    overlaps_parser.set_defaults(func=overlaps)
+
+    merge_parser = subparsers.add_parser(
+        "merge-partitions",
+        help="check the outputs of run.py --shard i/N and merge them",
+    )
+    merge_parser.add_argument("output_root", help="directory to merge into")
+    merge_parser.add_argument(
+        "partitions", nargs="+", help="output roots of all the partitions"
+    )
+    merge_parser.set_defaults(func=merge)
+
+    args = parser.parse_args()
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
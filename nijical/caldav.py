@@ -0,0 +1,472 @@
+import hashlib
+import re
+import threading
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from .calendar import Calendar
+from .dataset import Dataset
+
+DAV = "DAV:"
+CALDAV = "urn:ietf:params:xml:ns:caldav"
+CALSERVER = "http://calendarserver.org/ns/"
+
+ET.register_namespace("D", DAV)
+ET.register_namespace("C", CALDAV)
+ET.register_namespace("CS", CALSERVER)
+
+
+def tag(namespace: str, name: str) -> str:
+    return f"{{{namespace}}}{name}"
+
+
+ENTITY_TAG_PATTERN = re.compile(r'\*|(?:W/)?("[^"]*")')
+
+
+def match_entity_tag(if_none_match: str, etag: str) -> bool:
+    """
+    Check If-None-Match against an ETag with the weak comparison (RFC 9110).
+
+    The header is "*" or a list of entity tags, which may be weak (W/"...").
+    """
+    for match in ENTITY_TAG_PATTERN.finditer(if_none_match):
+        if match.group(0) == "*" or match.group(1) == etag:
+            return True
+    return False
+
+
+class CalDavResponse:
+    status: int
+    reason: str
+    headers: dict[str, str]
+    body: bytes
+
+    def __init__(
+        self,
+        status: int,
+        reason: str,
+        headers: dict[str, str] | None = None,
+        body: bytes = b"",
+    ) -> None:
+        self.status = status
+        self.reason = reason
+        self.headers = headers or {}
+        self.body = body
+
+
+class CalDavCollection:
+    """
+    Snapshot of a calendar collection: one resource per VEVENT.
+    """
+
+    path: str
+    display_name: str
+    # href: (ETag, body)
+    members: dict[str, tuple[str, bytes]]
+    sync_token: str
+
+    def __init__(
+        self, path: str, display_name: str, calendar: Calendar, is_english: bool
+    ) -> None:
+        self.path = path
+        self.display_name = display_name
+        self.members = {}
+
+        for event in calendar.events:
+            # Some rows share the same UID, but hrefs must be unique
+            href = f"{path}{event.uid}.ics"
+            count = 1
+            while href in self.members:
+                count += 1
+                href = f"{path}{event.uid}-{count}.ics"
+
+            body = (
+                Calendar(events=[event])
+                .generate_ical(name=display_name, is_english=is_english)
+                .encode("utf_8")
+            )
+            etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+            self.members[href] = (etag, body)
+
+        # The token only depends on the content, so it survives reloading
+        # the same data
+        content = "\n".join(
+            f"{href} {etag}" for href, (etag, _) in sorted(self.members.items())
+        )
+        digest = hashlib.sha256(f"{path}\n{content}".encode("utf_8")).hexdigest()
+        self.sync_token = f"urn:nijical:sync:{digest[:16]}"
+
+    def get_etags(self) -> dict[str, str]:
+        return {href: etag for href, (etag, _) in self.members.items()}
+
+
+class CalDavService:
+    """
+    Read-only CalDAV (RFC 4791) service over the calendars of a dataset.
+
+    Collections are /caldav/<lang>/<calendar>/ and each event is a resource
+    in it. Clients can download only the changed events with
+    calendar-multiget and sync-collection (RFC 6578) reports. The member
+    ETags of each sync token are kept in memory per collection, so a token
+    is valid for its collection while it is in the recent history; older
+    tokens and tokens of other collections get the valid-sync-token error
+    and the client starts a full sync.
+    """
+
+    root = "/caldav/"
+    languages = ("ja", "en")
+    allow = "OPTIONS, GET, HEAD, PROPFIND, REPORT"
+
+    dataset: Dataset
+    history_size: int
+
+    def __init__(self, dataset: Dataset, history_size: int = 256) -> None:
+        self.dataset = dataset
+        self.history_size = history_size
+        self._collections: OrderedDict[tuple[str, str, str], CalDavCollection] = (
+            OrderedDict()
+        )
+        # (collection path, sync token): member ETags
+        self._history: OrderedDict[tuple[str, str], dict[str, str]] = OrderedDict()
+        # Requests can be handled in worker threads
+        self._lock = threading.Lock()
+
+    def set_dataset(self, dataset: Dataset) -> None:
+        # Keep the history, so tokens of the old data give the changes
+        with self._lock:
+            self.dataset = dataset
+            self._collections.clear()
+
+    def handle(
+        self, method: str, path: str, headers: dict[str, str], body: bytes
+    ) -> CalDavResponse:
+        if method == "OPTIONS":
+            return CalDavResponse(
+                200,
+                "OK",
+                {"Allow": self.allow, "DAV": "1, 3, calendar-access"},
+            )
+
+        if method not in ("GET", "HEAD", "PROPFIND", "REPORT"):
+            return CalDavResponse(405, "Method Not Allowed", {"Allow": self.allow})
+
+        try:
+            request = ET.fromstring(body) if body.strip() else None
+        except ET.ParseError:
+            return CalDavResponse(400, "Bad Request")
+
+        if not path.startswith(self.root):
+            return CalDavResponse(404, "Not Found")
+        parts = path[len(self.root) :].split("/")
+
+        # /caldav/ and /caldav/<lang>/
+        if parts == [""] or (parts[0] in self.languages and parts[1:] == [""]):
+            if method != "PROPFIND":
+                return CalDavResponse(405, "Method Not Allowed")
+            return self.propfind_home(path, parts[0], headers, request)
+
+        if len(parts) != 3 or parts[0] not in self.languages:
+            return CalDavResponse(404, "Not Found")
+
+        lang, calendar_name, resource = parts
+        collection = self.get_collection(lang, calendar_name)
+        if collection is None:
+            return CalDavResponse(404, "Not Found")
+
+        if resource != "":
+            member = collection.members.get(path)
+            if member is None:
+                return CalDavResponse(404, "Not Found")
+
+            etag, data = member
+            if method == "PROPFIND":
+                multistatus = ET.Element(tag(DAV, "multistatus"))
+                props = self.get_member_props(etag, data, False)
+                self.add_response(
+                    multistatus, path, props, self.get_requested_props(request)
+                )
+                return self.multistatus_response(multistatus)
+            if method != "GET" and method != "HEAD":
+                return CalDavResponse(405, "Method Not Allowed", {"Allow": self.allow})
+
+            if match_entity_tag(headers.get("if-none-match", ""), etag):
+                return CalDavResponse(304, "Not Modified", {"ETag": etag})
+            return CalDavResponse(
+                200,
+                "OK",
+                {"ETag": etag, "Content-Type": "text/calendar; charset=utf-8"},
+                data if method == "GET" else b"",
+            )
+
+        if method == "PROPFIND":
+            return self.propfind_collection(collection, headers, request)
+        if method == "REPORT" and request is not None:
+            if request.tag == tag(CALDAV, "calendar-multiget"):
+                return self.report_multiget(collection, request)
+            if request.tag == tag(DAV, "sync-collection"):
+                return self.report_sync_collection(collection, request)
+        return CalDavResponse(403, "Forbidden")
+
+    def get_collection(self, lang: str, calendar_name: str) -> CalDavCollection | None:
+        with self._lock:
+            return self._get_collection(lang, calendar_name)
+
+    def _get_collection(
+        self, lang: str, calendar_name: str
+    ) -> CalDavCollection | None:
+        key = (lang, calendar_name, self.dataset.version)
+        collection = self._collections.get(key)
+        if collection is None:
+            is_english = lang == "en"
+            result = self.dataset.get_calendar(calendar_name, is_english=is_english)
+            if result is None:
+                return None
+
+            name, calendar = result
+            collection = CalDavCollection(
+                f"{self.root}{lang}/{calendar_name}/", name, calendar, is_english
+            )
+            self._collections[key] = collection
+            # Collections are kept for every calendar of the current dataset
+            max_size = len(self.languages) * len(self.dataset.get_calendar_names())
+            while len(self._collections) > max_size:
+                self._collections.popitem(last=False)
+
+        self._collections.move_to_end(key)
+        history_key = (collection.path, collection.sync_token)
+        self._history[history_key] = collection.get_etags()
+        self._history.move_to_end(history_key)
+        while len(self._history) > self.history_size:
+            self._history.popitem(last=False)
+
+        return collection
+
+    def propfind_home(
+        self,
+        path: str,
+        lang: str,
+        headers: dict[str, str],
+        request: ET.Element | None,
+    ) -> CalDavResponse:
+        requested = self.get_requested_props(request)
+        multistatus = ET.Element(tag(DAV, "multistatus"))
+
+        def collection_props(name: str) -> dict[str, ET.Element | str | None]:
+            resourcetype = ET.Element(tag(DAV, "resourcetype"))
+            ET.SubElement(resourcetype, tag(DAV, "collection"))
+            return {
+                tag(DAV, "resourcetype"): resourcetype,
+                tag(DAV, "displayname"): name,
+                tag(DAV, "current-user-principal"): self.href_element(
+                    "current-user-principal", self.root
+                ),
+                tag(CALDAV, "calendar-home-set"): self.href_element(
+                    "calendar-home-set", path, CALDAV
+                ),
+            }
+
+        self.add_response(multistatus, path, collection_props("Nij.iCal"), requested)
+
+        if headers.get("depth", "infinity") != "0":
+            if lang == "":
+                for child in self.languages:
+                    self.add_response(
+                        multistatus,
+                        f"{self.root}{child}/",
+                        collection_props(child),
+                        requested,
+                    )
+            else:
+                for calendar_name in self.dataset.get_calendar_names():
+                    collection = self.get_collection(lang, calendar_name)
+                    self.add_response(
+                        multistatus,
+                        collection.path,
+                        self.get_collection_props(collection),
+                        requested,
+                    )
+
+        return self.multistatus_response(multistatus)
+
+    def propfind_collection(
+        self,
+        collection: CalDavCollection,
+        headers: dict[str, str],
+        request: ET.Element | None,
+    ) -> CalDavResponse:
+        requested = self.get_requested_props(request)
+        multistatus = ET.Element(tag(DAV, "multistatus"))
+        props = self.get_collection_props(collection)
+        self.add_response(multistatus, collection.path, props, requested)
+
+        if headers.get("depth", "infinity") != "0":
+            for href, (etag, data) in collection.members.items():
+                props = self.get_member_props(etag, data, False)
+                self.add_response(multistatus, href, props, requested)
+
+        return self.multistatus_response(multistatus)
+
+    def report_multiget(
+        self, collection: CalDavCollection, request: ET.Element
+    ) -> CalDavResponse:
+        requested = self.get_requested_props(request)
+        multistatus = ET.Element(tag(DAV, "multistatus"))
+
+        for href_element in request.findall(tag(DAV, "href")):
+            href = (href_element.text or "").strip()
+            member = collection.members.get(href)
+            if member is None:
+                self.add_status_response(multistatus, href, "404 Not Found")
+                continue
+
+            etag, data = member
+            self.add_response(
+                multistatus, href, self.get_member_props(etag, data, True), requested
+            )
+
+        return self.multistatus_response(multistatus)
+
+    def report_sync_collection(
+        self, collection: CalDavCollection, request: ET.Element
+    ) -> CalDavResponse:
+        requested = self.get_requested_props(request)
+        token_element = request.find(tag(DAV, "sync-token"))
+        token = (token_element.text or "").strip() if token_element is not None else ""
+
+        with self._lock:
+            previous = self._history.get((collection.path, token))
+        if token == "":
+            previous = {}
+        elif previous is None:
+            error = ET.Element(tag(DAV, "error"))
+            ET.SubElement(error, tag(DAV, "valid-sync-token"))
+            return CalDavResponse(
+                403,
+                "Forbidden",
+                {"Content-Type": "application/xml; charset=utf-8"},
+                ET.tostring(error, encoding="utf-8", xml_declaration=True),
+            )
+
+        multistatus = ET.Element(tag(DAV, "multistatus"))
+        for href, (etag, data) in collection.members.items():
+            if previous.get(href) == etag:
+                continue
+            self.add_response(
+                multistatus, href, self.get_member_props(etag, data, True), requested
+            )
+
+        for href in previous:
+            if href not in collection.members:
+                self.add_status_response(multistatus, href, "404 Not Found")
+
+        ET.SubElement(multistatus, tag(DAV, "sync-token")).text = collection.sync_token
+        return self.multistatus_response(multistatus)
+
+    def get_collection_props(
+        self, collection: CalDavCollection
+    ) -> dict[str, ET.Element | str | None]:
+        resourcetype = ET.Element(tag(DAV, "resourcetype"))
+        ET.SubElement(resourcetype, tag(DAV, "collection"))
+        ET.SubElement(resourcetype, tag(CALDAV, "calendar"))
+
+        components = ET.Element(tag(CALDAV, "supported-calendar-component-set"))
+        ET.SubElement(components, tag(CALDAV, "comp"), name="VEVENT")
+
+        reports = ET.Element(tag(DAV, "supported-report-set"))
+        for namespace, name in (
+            (CALDAV, "calendar-multiget"),
+            (DAV, "sync-collection"),
+        ):
+            supported = ET.SubElement(reports, tag(DAV, "supported-report"))
+            report = ET.SubElement(supported, tag(DAV, "report"))
+            ET.SubElement(report, tag(namespace, name))
+
+        return {
+            tag(DAV, "resourcetype"): resourcetype,
+            tag(DAV, "displayname"): collection.display_name,
+            tag(DAV, "sync-token"): collection.sync_token,
+            tag(CALSERVER, "getctag"): collection.sync_token,
+            tag(CALDAV, "supported-calendar-component-set"): components,
+            tag(DAV, "supported-report-set"): reports,
+            tag(DAV, "current-user-principal"): self.href_element(
+                "current-user-principal", self.root
+            ),
+        }
+
+    def get_member_props(
+        self, etag: str, data: bytes, with_data: bool
+    ) -> dict[str, ET.Element | str | None]:
+        props: dict[str, ET.Element | str | None] = {
+            tag(DAV, "resourcetype"): None,
+            tag(DAV, "getetag"): etag,
+            tag(DAV, "getcontenttype"): "text/calendar; charset=utf-8",
+            tag(DAV, "getcontentlength"): str(len(data)),
+        }
+        # calendar-data is only returned by reports, not by PROPFIND
+        if with_data:
+            props[tag(CALDAV, "calendar-data")] = data.decode("utf_8")
+        return props
+
+    def get_requested_props(self, request: ET.Element | None) -> list[str] | None:
+        """
+        Get the property names requested by PROPFIND or REPORT.
+
+        Returns:
+            List of the property names, or None for all properties
+        """
+        if request is None:
+            return None
+
+        prop = request.find(tag(DAV, "prop"))
+        if prop is None:
+            return None
+        return [child.tag for child in prop]
+
+    def add_response(
+        self,
+        multistatus: ET.Element,
+        href: str,
+        props: dict[str, ET.Element | str | None],
+        requested: list[str] | None,
+    ) -> None:
+        response = ET.SubElement(multistatus, tag(DAV, "response"))
+        ET.SubElement(response, tag(DAV, "href")).text = href
+
+        names = list(props) if requested is None else requested
+        found = [name for name in names if name in props]
+        missing = [name for name in names if name not in props]
+
+        for names_in_status, status in ((found, "200 OK"), (missing, "404 Not Found")):
+            if not names_in_status:
+                continue
+
+            propstat = ET.SubElement(response, tag(DAV, "propstat"))
+            prop = ET.SubElement(propstat, tag(DAV, "prop"))
+            for name in names_in_status:
+                value = props.get(name)
+                if isinstance(value, ET.Element):
+                    prop.append(value)
+                else:
+                    ET.SubElement(prop, name).text = value
+            ET.SubElement(propstat, tag(DAV, "status")).text = f"HTTP/1.1 {status}"
+
+    def add_status_response(
+        self, multistatus: ET.Element, href: str, status: str
+    ) -> None:
+        response = ET.SubElement(multistatus, tag(DAV, "response"))
+        ET.SubElement(response, tag(DAV, "href")).text = href
+        ET.SubElement(response, tag(DAV, "status")).text = f"HTTP/1.1 {status}"
+
+    def href_element(
+        self, name: str, href: str, namespace: str = DAV
+    ) -> ET.Element:
+        element = ET.Element(tag(namespace, name))
+        ET.SubElement(element, tag(DAV, "href")).text = href
+        return element
+
+    def multistatus_response(self, multistatus: ET.Element) -> CalDavResponse:
+        return CalDavResponse(
+            207,
+            "Multi-Status",
+            {"Content-Type": "application/xml; charset=utf-8"},
+            ET.tostring(multistatus, encoding="utf-8", xml_declaration=True),
+        )
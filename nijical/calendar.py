@@ -1,5 +1,7 @@
 from dataclasses import dataclass, field
+from .escape import escape_text
 from .event import Event
+from .folding import OutputProfile, fold_lines
 from .talent import Talent
 
 
@@ -13,18 +15,26 @@ class Calendar:
     def add(self, event: Event) -> None:
         self.events.append(event)
 
+    def generate_ical_header(self, name: str) -> str:
+        """
+        Lines of the VCALENDAR before the first VEVENT.
+        """
+        result = "BEGIN:VCALENDAR\r\n"
+        result += f"PRODID:{self.prod_id}\r\n"
+        result += f"METHOD:{self.method}\r\n"
+        result += f"VERSION:{self.version}\r\n"
+        result += f"X-WR-CALNAME:{escape_text(name)}\r\n"
+        result += "X-WR-TIMEZONE:Asia/Tokyo\r\n"
+        return result
+
     def generate_ical(
         self,
         name: str,
         is_english: bool = False,
         talent: Talent | None = None,
+        profile: OutputProfile = OutputProfile.GOOGLE,
     ) -> str:
-        result = "BEGIN:VCALENDAR\r\n"
-        result += f"PRODID:{self.prod_id}\r\n"
-        result += f"METHOD:{self.method}\r\n"
-        result += f"VERSION:{self.version}\r\n"
-        result += f"X-WR-CALNAME:{name}\r\n"
-        result += "X-WR-TIMEZONE:Asia/Tokyo\r\n"
+        result = self.generate_ical_header(name)
 
         events = self.events
         if talent is not None:
@@ -35,4 +45,7 @@ class Calendar:
 
         result += "END:VCALENDAR\r\n"
 
+        if profile == OutputProfile.STRICT:
+            result = fold_lines(result)
+
         return result
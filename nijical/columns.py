@@ -0,0 +1,51 @@
+# Columns of the CSV files exported from the spreadsheet. NijiCal and
+# Validator both check the files against these lists.
+
+TALENT_COLUMNS = [
+    "名前",
+    "UID",
+    "データ更新日時",
+    "ローマ字",
+    "ふりがな",
+    "誕生日",
+    "特殊誕生日",
+    "特殊誕生日（英語）",
+    "活動開始日時",
+    "初配信日時",
+    "YouTube",
+    "X",
+    "Twitch",
+    "補足",
+    "補足（英語）",
+    "卒業",
+]
+
+EVENT_COLUMNS = [
+    "イベント名",
+    "UID",
+    "データ更新日時",
+    "イベント名（英語）",
+    "開始日時",
+    "終了日時",
+    "場所",
+    "場所（英語）",
+    "geo",
+    "説明文",
+    "説明文（英語）",
+    "URL",
+    "参加者",
+    "ハッシュタグ",
+]
+
+TICKET_COLUMNS = [
+    "タイトル",
+    "UID",
+    "更新日時",
+    "タイトル（英語）",
+    "イベントUID",
+    "イベント名（自動、確認用）",
+    "開始日時",
+    "終了日時",
+    "URL",
+    "色分け用",
+]
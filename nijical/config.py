@@ -0,0 +1,74 @@
+import json
+from dataclasses import dataclass
+from .nijical import NIJISANJI
+
+
+@dataclass(frozen=True)
+class DatasetConfig:
+    """
+    Paths and settings of one roster to generate calendars for.
+    """
+
+    name: str
+    talent_data_path: str
+    event_data_path: str
+    ticket_data_path: str
+    url_prefix: str
+    output_root: str
+    organization: str = NIJISANJI
+
+
+def load_dataset_configs(path: str) -> list[DatasetConfig]:
+    """
+    Load the datasets of a build from a JSON file like:
+
+        {
+          "datasets": [
+            {
+              "name": "nijisanji",
+              "talents": "docs/data/talents.csv",
+              "events": "docs/data/events.csv",
+              "tickets": "docs/data/tickets.csv",
+              "url_prefix": "webcal://magicien.github.io/Nij.iCal",
+              "output_root": "docs",
+              "organization": "にじさんじ"
+            }
+          ]
+        }
+
+    Relative paths are relative to the current directory, and
+    "organization" can be omitted for Nijisanji.
+
+    Raises:
+        ValueError: If a dataset lacks a key, or two datasets have the same
+            name or output root
+    """
+    with open(path, encoding="utf_8") as file:
+        data = json.load(file)
+
+    configs: list[DatasetConfig] = []
+    for index, item in enumerate(data["datasets"]):
+        try:
+            config = DatasetConfig(
+                name=item["name"],
+                talent_data_path=item["talents"],
+                event_data_path=item["events"],
+                ticket_data_path=item["tickets"],
+                url_prefix=item["url_prefix"],
+                output_root=item["output_root"],
+                organization=item.get("organization", NIJISANJI),
+            )
+        except KeyError as error:
+            raise ValueError(
+                f"Error in {path}: dataset {index} has no {error.args[0]}"
+            ) from error
+
+        for other in configs:
+            if other.name == config.name or other.output_root == config.output_root:
+                raise ValueError(
+                    f"Error in {path}: datasets '{other.name}' and '{config.name}' "
+                    "have the same name or output root"
+                )
+        configs.append(config)
+
+    return configs
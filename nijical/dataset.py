@@ -0,0 +1,166 @@
+import arrow
+from bisect import bisect_right
+from dataclasses import dataclass
+from functools import cached_property
+from .calendar import Calendar
+from .event import Event
+from .talent import Talent
+
+
+@dataclass(frozen=True)
+class Dataset:
+    """
+    Talents and events parsed from the CSV files.
+
+    `version` changes whenever any of the CSV files changes, so it can be used
+    as a cache key of anything rendered from the dataset.
+    """
+
+    talents: dict[str, Talent]
+    live_events: list[Event]
+    talent_events: list[Event]
+    version: str
+
+    @property
+    def all_events(self) -> list[Event]:
+        return self.live_events + self.talent_events
+
+    def get_calendar_names(self) -> list[str]:
+        names = ["events", "birthdays"]
+        for talent in self.talents.values():
+            if talent.is_organization:
+                continue
+            names.append(self.get_talent_calendar_name(talent))
+        return names
+
+    def get_calendar(
+        self, calendar_name: str, is_english: bool
+    ) -> tuple[str, Calendar] | None:
+        """
+        Get a calendar with the same content as docs/<lang>/<calendar_name>.ics.
+
+        Args:
+            calendar_name: File name of the calendar without the extension
+            is_english: True to get the English calendar name
+
+        Returns:
+            Tuple of the calendar name and the calendar, or None if not found
+        """
+        events = self.get_calendar_events(calendar_name)
+        if events is None:
+            return None
+        title = self.get_calendar_title(calendar_name, is_english)
+        return (title, Calendar(events=events))
+
+    def get_calendar_events(self, calendar_name: str) -> list[Event] | None:
+        if calendar_name == "events":
+            return self.live_events
+
+        if calendar_name == "birthdays":
+            return self.talent_events
+
+        talent = self.get_talent(calendar_name)
+        if talent is None:
+            return None
+        return self.get_talent_events(talent)
+
+    def get_talent_events(self, talent: Talent) -> list[Event]:
+        """
+        Get the events of the calendar of a talent, in the order of all_events.
+
+        The result is the same as filtering all_events with has_talent, but
+        only the events naming the talent and the organization-wide events
+        from their first tweet until their graduation are checked, so it
+        doesn't scan every event for every talent. The organization-wide
+        events are looked up by their begin time, so a graduated talent
+        costs as much as their own events however many come after them.
+        """
+        all_events, positions_by_name, organization_events = self._event_index
+        begins, organization_positions = organization_events
+        # has_talent includes organization-wide events after the first tweet
+        # and, for graduated talents, until the graduation. The organization
+        # itself is named by all of them.
+        first = 0
+        last = len(begins)
+        if not talent.is_organization:
+            first = bisect_right(begins, talent.first_tweet_datetime)
+            if type(talent.graduation_date) is arrow.Arrow:
+                last = bisect_right(begins, talent.graduation_date)
+        positions = sorted(
+            set(positions_by_name.get(talent.name, [])).union(
+                organization_positions[first:last]
+            )
+        )
+        return [
+            all_events[position]
+            for position in positions
+            if all_events[position].has_talent(talent)
+        ]
+
+    @cached_property
+    def _event_index(
+        self,
+    ) -> tuple[
+        list[Event], dict[str, list[int]], tuple[list[arrow.Arrow], list[int]]
+    ]:
+        """
+        All events, the positions of the events of each talent name, and the
+        begin times and positions of the organization-wide events in the
+        order of the begin times.
+        """
+        all_events = self.all_events
+        positions_by_name: dict[str, list[int]] = {}
+        organization_positions: list[int] = []
+        for position, event in enumerate(all_events):
+            for talent in event.talents:
+                if talent.is_organization:
+                    organization_positions.append(position)
+                else:
+                    positions_by_name.setdefault(talent.name, []).append(position)
+
+        # An event with the organization twice is listed once
+        organization_positions = sorted(
+            set(organization_positions), key=lambda p: all_events[p].begin
+        )
+        begins = [all_events[position].begin for position in organization_positions]
+        return (all_events, positions_by_name, (begins, organization_positions))
+
+    def get_calendar_title(self, calendar_name: str, is_english: bool) -> str:
+        if calendar_name in ("events", "birthdays"):
+            # e.g. "にじさんじイベント" and "Nijisanji Birthdays"
+            organization = self.get_organization()
+            if organization is None:
+                prefix = ""
+            elif is_english:
+                prefix = f"{organization.eng_name} "
+            else:
+                prefix = organization.name
+
+            if calendar_name == "events":
+                return f"{prefix}Events" if is_english else f"{prefix}イベント"
+            return f"{prefix}Birthdays" if is_english else f"{prefix}誕生日"
+
+        talent = self.get_talent(calendar_name)
+        return talent.eng_name if is_english else talent.name
+
+    def get_organization(self) -> Talent | None:
+        for talent in self.talents.values():
+            if talent.is_organization:
+                return talent
+        return None
+
+    def get_talent(self, calendar_name: str) -> Talent | None:
+        return self._talents_by_calendar_name.get(calendar_name)
+
+    @cached_property
+    def _talents_by_calendar_name(self) -> dict[str, Talent]:
+        talents: dict[str, Talent] = {}
+        for talent in self.talents.values():
+            if talent.is_organization:
+                continue
+            # The first talent wins if two talents have the same file name
+            talents.setdefault(self.get_talent_calendar_name(talent), talent)
+        return talents
+
+    def get_talent_calendar_name(self, talent: Talent) -> str:
+        return talent.eng_name.lower().replace(" ", "_")
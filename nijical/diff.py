@@ -0,0 +1,245 @@
+import arrow
+import dataclasses
+import hashlib
+import json
+import math
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import Callable
+from .event import Event, EventType
+from .manifest import get_unique_key
+from .nijical import NijiCal
+from .talent import Talent
+from .ticket import Ticket
+
+# Fields which change without any change of the row itself: the update time,
+# and the tickets of an event which are compared as rows of tickets.csv
+IGNORED_FIELDS = {"timestamp", "sequence", "tickets"}
+
+# Kind: (Japanese name, English singular, English plural)
+KIND_NAMES = {
+    "events": ("イベント", "event", "events"),
+    "tickets": ("チケット", "ticket", "tickets"),
+    "talents": ("ライバー", "liver", "livers"),
+}
+
+# is_english: prefix of the summary in the tweets of tweet_calendar_update.py
+UPDATE_TWEET_PREFIXES = {
+    False: "カレンダーを更新しました: ",
+    True: "The calendar data has been updated: ",
+}
+# Lengths the titles are shortened to, in order, when the summary is too long
+TITLE_LENGTHS = [None, 20, 10]
+
+
+@dataclass(frozen=True)
+class Change:
+    uid: str
+    name: str
+    eng_name: str
+
+
+@dataclass
+class KindChanges:
+    added: list[Change] = field(default_factory=list)
+    changed: list[Change] = field(default_factory=list)
+    removed: list[Change] = field(default_factory=list)
+
+    def is_empty(self) -> bool:
+        return not (self.added or self.changed or self.removed)
+
+
+@dataclass
+class ChangeSet:
+    """
+    Rows of events.csv, tickets.csv and talents.csv which were added, changed
+    or removed, compared by UID and a hash of the parsed values.
+    """
+
+    events: KindChanges = field(default_factory=KindChanges)
+    tickets: KindChanges = field(default_factory=KindChanges)
+    talents: KindChanges = field(default_factory=KindChanges)
+
+    def is_empty(self) -> bool:
+        return all(getattr(self, kind).is_empty() for kind in KIND_NAMES)
+
+    def to_dict(self) -> dict:
+        return dataclasses.asdict(self)
+
+    def generate_summary(
+        self,
+        is_english: bool,
+        max_titles: int = 2,
+        is_valid: Callable[[str], bool] | None = None,
+    ) -> str:
+        """
+        Generate a line which describes the changes, e.g.
+        "イベント3件追加（「A」「B」ほか）・1件変更、チケット1件追加".
+
+        If `is_valid` rejects the line, the titles are shortened with "…",
+        then fewer titles are shown, down to the counts only.
+
+        Args:
+            is_english: True to generate the English line
+            max_titles: Number of titles of the added events to show
+            is_valid: Check of the length of the line, e.g. as a tweet
+
+        Returns:
+            The summary line
+        """
+        for titles in range(max_titles, 0, -1):
+            for title_length in TITLE_LENGTHS:
+                line = self.generate_summary_line(is_english, titles, title_length)
+                if is_valid is None or is_valid(line):
+                    return line
+        return self.generate_summary_line(is_english, 0, None)
+
+    def generate_summary_line(
+        self, is_english: bool, max_titles: int, title_length: int | None
+    ) -> str:
+        parts: list[str] = []
+        for kind, (ja_name, singular, plural) in KIND_NAMES.items():
+            changes: KindChanges = getattr(self, kind)
+            items: list[str] = []
+            for action, ja_action, records in [
+                ("added", "追加", changes.added),
+                ("changed", "変更", changes.changed),
+                ("removed", "削除", changes.removed),
+            ]:
+                if not records:
+                    continue
+
+                titles = ""
+                if kind == "events" and action == "added" and max_titles > 0:
+                    titles = self.generate_titles(
+                        records, is_english, max_titles, title_length
+                    )
+
+                count = len(records)
+                if is_english:
+                    name = singular if count == 1 else plural
+                    prefix = f"{count} {name} " if not items else f"{count} "
+                    items.append(f"{prefix}{action}{titles}")
+                else:
+                    prefix = ja_name if not items else ""
+                    items.append(f"{prefix}{count}件{ja_action}{titles}")
+
+            if items:
+                parts.append(", ".join(items) if is_english else "・".join(items))
+
+        if not parts:
+            return "No changes to the data" if is_english else "データの変更なし"
+        return "; ".join(parts) if is_english else "、".join(parts)
+
+    def generate_titles(
+        self,
+        records: list[Change],
+        is_english: bool,
+        max_titles: int,
+        title_length: int | None = None,
+    ) -> str:
+        names = [
+            record.eng_name if is_english and record.eng_name else record.name
+            for record in records[:max_titles]
+        ]
+        if title_length is not None:
+            names = [
+                name if len(name) <= title_length else name[: title_length - 1] + "…"
+                for name in names
+            ]
+        more = len(records) > max_titles
+        if is_english:
+            return f" ({', '.join(names)}{' and more' if more else ''})"
+        quoted = "".join(f"「{name}」" for name in names)
+        return f"（{quoted}{'ほか' if more else ''}）"
+
+
+def to_plain(value):
+    """
+    Convert a parsed value to a JSON value; talents of an event are
+    represented by their names so that they are compared separately.
+    """
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    if isinstance(value, arrow.Arrow):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.name
+    if isinstance(value, Talent):
+        return value.name
+    if isinstance(value, list):
+        return [to_plain(item) for item in value]
+    return value
+
+
+def get_record_hash(record: Event | Ticket | Talent) -> str:
+    values = [
+        to_plain(getattr(record, item.name))
+        for item in dataclasses.fields(record)
+        if item.name not in IGNORED_FIELDS
+    ]
+    data = json.dumps(values, ensure_ascii=False, default=str)
+    return hashlib.sha256(data.encode("utf_8")).hexdigest()
+
+
+def get_records_by_key(records: list) -> dict[str, tuple[str, Change]]:
+    """
+    Get the hash and the description of the records by UID. Duplicated UIDs
+    are distinguished by their order, like "<uid>#2" (see get_unique_key).
+    """
+    result: dict[str, tuple[str, Change]] = {}
+    for record in records:
+        key = get_unique_key(record.uid, result)
+        if isinstance(record, Talent):
+            change = Change(record.uid, record.name, record.eng_name)
+        else:
+            change = Change(record.uid, record.summary, record.eng_summary)
+        result[key] = (get_record_hash(record), change)
+    return result
+
+
+def compare_records(old_records: list, new_records: list) -> KindChanges:
+    old = get_records_by_key(old_records)
+    new = get_records_by_key(new_records)
+    changes = KindChanges()
+    for key, (new_hash, change) in new.items():
+        if key not in old:
+            changes.added.append(change)
+        elif old[key][0] != new_hash:
+            changes.changed.append(change)
+    for key, (_, change) in old.items():
+        if key not in new:
+            changes.removed.append(change)
+    return changes
+
+
+def load_records(instance: NijiCal) -> dict[str, list]:
+    """
+    Parse the rows of the CSV files of the instance by kind.
+    """
+    talents = instance.fetch_talents()
+    tickets = instance.fetch_tickets()
+    events = instance.fetch_events(talents, tickets)
+    return {
+        "events": [ev for ev in events if ev.event_type == EventType.EVENT],
+        "tickets": [ticket for items in tickets.values() for ticket in items],
+        "talents": list(talents.values()),
+    }
+
+
+def compute_change_set(old: NijiCal, new: NijiCal) -> ChangeSet:
+    """
+    Compare the rows of the CSV files of two instances.
+
+    Only the rows are compared: birthdays, anniversaries and ticket events
+    are generated from them, so they are reported as changes of the talents
+    and the tickets.
+    """
+    old_records = load_records(old)
+    new_records = load_records(new)
+    return ChangeSet(
+        **{
+            kind: compare_records(old_records[kind], new_records[kind])
+            for kind in KIND_NAMES
+        }
+    )
@@ -0,0 +1,23 @@
+def escape_text(value: str) -> str:
+    """
+    Escape a value of a TEXT property such as SUMMARY or DESCRIPTION.
+
+    Backslash, semicolon, comma and newline are escaped (RFC 5545 3.3.11).
+    Chained str.replace is used instead of str.translate, which is many
+    times slower for non-ASCII text like Japanese.
+    """
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def escape_param(value: str) -> str:
+    """
+    Escape a value to put in a quoted property parameter, e.g. X-TITLE="...".
+
+    Caret, newline and double quote are encoded as RFC 6868 defines.
+    """
+    return value.replace("^", "^^").replace("\n", "^n").replace('"', "^'")
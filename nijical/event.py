@@ -1,7 +1,9 @@
 import arrow
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from enum import Enum
+from functools import cached_property
 from urllib.parse import quote
+from .escape import escape_param, escape_text
 from .talent import Talent
 from .ticket import Ticket
 
@@ -42,17 +44,54 @@ class Event:
     talents: list[Talent] = field(default_factory=list)
     tickets: list[Ticket] = field(default_factory=list)
     event_type: EventType = EventType.UNKNOWN
+    sequence: int = 0
 
     def generate_ical(self, is_english: bool = False) -> str:
-        datetime_format = "YYYYMMDDTHHmmss[Z]"
-        date_format = "YYYYMMDD"
+        return self.generate_stamp() + self.generate_content(is_english)
 
+    def generate_stamp(self) -> str:
+        """
+        Generate the properties of VEVENT until DTSTAMP and SEQUENCE.
+        """
         result = self.param("BEGIN", "VEVENT")
         result += self.param("UID", self.uid)
         result += self.param(
-            "DTSTAMP", self.timestamp.to("utc").format(datetime_format)
+            "DTSTAMP", self.timestamp.to("utc").format("YYYYMMDDTHHmmss[Z]")
         )
+        if self.sequence > 0:
+            result += self.param("SEQUENCE", str(self.sequence))
+        return result
+
+    def with_stamp(self, timestamp: arrow.Arrow, sequence: int) -> "Event":
+        """
+        Copy the event with another DTSTAMP and SEQUENCE.
+
+        The rendered content doesn't depend on them, so the copy shares it.
+        """
+        event = replace(self, timestamp=timestamp, sequence=sequence)
+        event.__dict__["_content"] = self._content
+        return event
 
+    @cached_property
+    def _content(self) -> dict[bool, str]:
+        # is_english: properties after DTSTAMP and SEQUENCE
+        return {}
+
+    def generate_content(self, is_english: bool) -> str:
+        """
+        Generate the properties of VEVENT after DTSTAMP and SEQUENCE.
+
+        An event is rendered into the event calendar and the calendars of all
+        its talents, so the result is kept and reused.
+        """
+        cache = self._content
+        if is_english in cache:
+            return cache[is_english]
+
+        datetime_format = "YYYYMMDDTHHmmss[Z]"
+        date_format = "YYYYMMDD"
+
+        result = ""
         if self.all_day:
             result += self.param("DTSTART;VALUE=DATE", self.begin.format(date_format))
             if self.begin != self.end:
@@ -71,50 +110,54 @@ class Event:
             result += self.param("RRULE", param)
 
         result += self.param("TRANSP", "TRANSPARENT")
+        result += self.generate_text_properties(is_english)
+
+        if type(self.url) is str:
+            result += self.param("URL", self.url)
+
+        result += self.param("END", "VEVENT")
 
+        cache[is_english] = result
+        return result
+
+    def generate_text_properties(self, is_english: bool) -> str:
+        """
+        Generate the language dependent properties: the escaped SUMMARY,
+        LOCATION and DESCRIPTION.
+        """
+        result = ""
         if is_english:
-            result += self.param("SUMMARY", self.eng_summary)
+            result += self.text_param("SUMMARY", self.eng_summary)
 
             if type(self.eng_location) is str:
-                result += self.param("LOCATION", self.eng_location)
+                result += self.text_param("LOCATION", self.eng_location)
 
             if type(self.geo) is str:
-                result += f'X-APPLE-STRUCTURED-LOCATION;VALUE=URI;X-TITLE="{self.eng_location}":geo:{self.geo}\r\n'
+                title = escape_param(f"{self.eng_location}")
+                result += f'X-APPLE-STRUCTURED-LOCATION;VALUE=URI;X-TITLE="{title}":geo:{self.geo}\r\n'
 
-            result += self.param(
-                "DESCRIPTION",
-                self.eng_description
-                + self.generate_hashtag_description(is_english=True)
-                + self.generate_ticket_description(is_english=True)
-                + self.generate_talent_description(is_english=True),
+            result += self.text_param(
+                "DESCRIPTION", self.generate_description(is_english=True)
             )
 
         else:
-            result += self.param("SUMMARY", self.summary)
+            result += self.text_param("SUMMARY", self.summary)
 
             if type(self.location) is str:
-                result += self.param("LOCATION", self.location)
+                result += self.text_param("LOCATION", self.location)
 
             if type(self.geo) is str:
-                result += f'X-APPLE-STRUCTURED-LOCATION;VALUE=URI;X-TITLE="{self.location}":geo:{self.geo}\r\n'
+                title = escape_param(f"{self.location}")
+                result += f'X-APPLE-STRUCTURED-LOCATION;VALUE=URI;X-TITLE="{title}":geo:{self.geo}\r\n'
 
-            result += self.param(
-                "DESCRIPTION",
-                self.description
-                + self.generate_hashtag_description(is_english=False)
-                + self.generate_ticket_description(is_english=False)
-                + self.generate_talent_description(is_english=False),
+            result += self.text_param(
+                "DESCRIPTION", self.generate_description(is_english=False)
             )
 
-        if type(self.url) is str:
-            result += self.param("URL", self.url)
-
-        result += self.param("END", "VEVENT")
-
         return result
 
     def has_talent(self, target: Talent) -> bool:
-        if any(talent.name == "にじさんじ" for talent in self.talents):
+        if any(talent.is_organization for talent in self.talents):
             if (
                 type(target.graduation_date) is arrow.Arrow
                 and target.graduation_date < self.begin
@@ -129,36 +172,22 @@ class Event:
     def param(self, name: str, value: str) -> str:
         value_text = value.replace("\n", "\\n")
         param = f"{name}:{value_text}"
+        # Line folding seems to not work in Google Calendar, so the lines are
+        # folded only for OutputProfile.STRICT by Calendar.generate_ical
         return f"{param}\r\n"
 
-        # Line folding seems to not work in Google Calendar
-        # encoding = "utf-8"
-        # max_line_len = 75
-
-        # text_data = param
-        # byte_data = param.encode(encoding)
-        # if len(byte_data) <= max_line_len:
-        #     return f"{param}\r\n"
-
-        # # fold param text
-        # result = ""
-        # while len(byte_data) > 0:
-        #     this_line = byte_data[:max_line_len].decode(encoding, errors="ignore")
-        #     next_line = text_data[len(this_line) :]
-
-        #     # Avoid the next line from starting with a space
-        #     while len(next_line) > 0 and next_line[0] == " ":
-        #         next_line = this_line[-1] + next_line
-        #         this_line = this_line[:-1]
-
-        #     if result != "":
-        #         result += " "
-
-        #     result += f"{this_line}\r\n"
-        #     text_data = next_line
-        #     byte_data = next_line.encode(encoding)
-
-        # return result
+    def text_param(self, name: str, value: str) -> str:
+        # TEXT values need ",", ";" and "\" escaped as well as newlines
+        return f"{name}:{escape_text(value)}\r\n"
+
+    def generate_description(self, is_english: bool = False) -> str:
+        description = self.eng_description if is_english else self.description
+        return (
+            description
+            + self.generate_hashtag_description(is_english=is_english)
+            + self.generate_ticket_description(is_english=is_english)
+            + self.generate_talent_description(is_english=is_english)
+        )
 
     def generate_hashtag_description(self, is_english: bool = False) -> str:
         if self.hashtag is None or (
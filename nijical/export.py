@@ -0,0 +1,312 @@
+import arrow
+import json
+from enum import Enum
+from functools import cached_property
+from xml.sax.saxutils import escape, quoteattr
+from .calendar import Calendar
+from .event import Event
+from .folding import OutputProfile, fold_lines
+
+
+class ExportFormat(Enum):
+    """
+    File formats of the calendars; the value is the file extension.
+    """
+
+    ICS = "ics"
+    JSON_FEED = "json"
+    ATOM = "atom"
+
+    @classmethod
+    def parse_list(cls, value: str) -> list["ExportFormat"]:
+        """
+        Parse comma separated extensions like "ics,json,atom".
+
+        Raises:
+            ValueError: If an extension is unknown
+        """
+        formats: list[ExportFormat] = []
+        for extension in value.split(","):
+            export_format = cls(extension.strip())
+            if export_format not in formats:
+                formats.append(export_format)
+        return formats
+
+
+class EventView:
+    """
+    Values of an event in a language which the format writers share.
+
+    Each value is computed on the first use, once for all the formats and
+    all the calendars the event is in.
+    """
+
+    def __init__(self, event: Event, is_english: bool) -> None:
+        self.event = event
+        self.is_english = is_english
+
+    @cached_property
+    def stamp(self) -> str:
+        return self.event.generate_stamp()
+
+    @property
+    def content(self) -> str:
+        # Cached by the event; not copied into the view
+        return self.event.generate_content(self.is_english)
+
+    @cached_property
+    def title(self) -> str:
+        event = self.event
+        return event.eng_summary if self.is_english else event.summary
+
+    @cached_property
+    def description(self) -> str:
+        return self.event.generate_description(is_english=self.is_english).strip()
+
+    @cached_property
+    def location(self) -> str | None:
+        event = self.event
+        location = event.eng_location if self.is_english else event.location
+        return location if type(location) is str else None
+
+    @cached_property
+    def url(self) -> str | None:
+        return self.event.url if type(self.event.url) is str else None
+
+    @cached_property
+    def start(self) -> str:
+        return self.format_time(self.event.begin)
+
+    @cached_property
+    def end(self) -> str:
+        return self.format_time(self.event.end)
+
+    @cached_property
+    def updated(self) -> str:
+        return self.event.timestamp.to("utc").format("YYYY-MM-DDTHH:mm:ss[Z]")
+
+    @cached_property
+    def period(self) -> str:
+        """
+        Human readable time and place, e.g. "2025-01-01T19:00:00+09:00 / Tokyo".
+        """
+        period = self.start if self.start == self.end else f"{self.start} - {self.end}"
+        if self.event.yearly:
+            period += " (yearly)" if self.is_english else "（毎年）"
+        if self.location is not None:
+            period += f" / {self.location}"
+        return period
+
+    def format_time(self, time: arrow.Arrow) -> str:
+        if self.event.all_day:
+            return time.format("YYYY-MM-DD")
+        return time.to("+09:00").isoformat()
+
+
+class FormatWriter:
+    """
+    Serializer of a calendar in a format. The exporter calls `add` for each
+    event in the order of the calendar, then `finish` to get the content.
+    """
+
+    format: ExportFormat
+
+    def __init__(self, calendar_name: str, title: str, is_english: bool) -> None:
+        self.calendar_name = calendar_name
+        self.title = title
+        self.is_english = is_english
+
+    def add(self, view: EventView) -> None:
+        raise NotImplementedError
+
+    def finish(self) -> str:
+        raise NotImplementedError
+
+
+class IcsWriter(FormatWriter):
+    format = ExportFormat.ICS
+
+    def __init__(
+        self,
+        calendar_name: str,
+        title: str,
+        is_english: bool,
+        calendar: Calendar,
+        profile: OutputProfile,
+    ) -> None:
+        super().__init__(calendar_name, title, is_english)
+        self.profile = profile
+        self.parts = [calendar.generate_ical_header(title)]
+
+    def add(self, view: EventView) -> None:
+        # Joined in finish, so the content of the event is not copied for
+        # each calendar
+        self.parts.append(view.stamp)
+        self.parts.append(view.content)
+
+    def finish(self) -> str:
+        self.parts.append("END:VCALENDAR\r\n")
+        result = "".join(self.parts)
+        if self.profile == OutputProfile.STRICT:
+            result = fold_lines(result)
+        return result
+
+
+class JsonFeedWriter(FormatWriter):
+    """
+    JSON Feed 1.1 with an item per event. The time and the place of the
+    event are in `_nijical` of each item, which readers ignore.
+    """
+
+    format = ExportFormat.JSON_FEED
+
+    def __init__(
+        self, calendar_name: str, title: str, is_english: bool, base_url: str
+    ) -> None:
+        super().__init__(calendar_name, title, is_english)
+        lang = "en" if is_english else "ja"
+        self.feed = {
+            "version": "https://jsonfeed.org/version/1.1",
+            "title": title,
+            "home_page_url": base_url + ("/index_en.html" if is_english else "/"),
+            "feed_url": f"{base_url}/{lang}/{calendar_name}.json",
+            "language": lang,
+            "items": [],
+        }
+
+    def add(self, view: EventView) -> None:
+        item = {
+            "id": view.event.uid,
+            "title": view.title,
+            "content_text": f"{view.period}\n\n{view.description}",
+            "date_modified": view.updated,
+            "_nijical": {
+                "start": view.start,
+                "end": view.end,
+                "all_day": view.event.all_day,
+                "yearly": view.event.yearly,
+                "location": view.location,
+            },
+        }
+        if view.url is not None:
+            item["url"] = view.url
+        self.feed["items"].append(item)
+
+    def finish(self) -> str:
+        return json.dumps(self.feed, ensure_ascii=False, separators=(",", ":"))
+
+
+class AtomWriter(FormatWriter):
+    format = ExportFormat.ATOM
+
+    def __init__(
+        self, calendar_name: str, title: str, is_english: bool, base_url: str
+    ) -> None:
+        super().__init__(calendar_name, title, is_english)
+        lang = "en" if is_english else "ja"
+        self.base_url = base_url
+        self.feed_url = f"{base_url}/{lang}/{calendar_name}.atom"
+        self.lang = lang
+        self.entries: list[str] = []
+        # The feed is as new as the newest entry, so the output is stable
+        self.updated = "1970-01-01T00:00:00Z"
+
+    def add(self, view: EventView) -> None:
+        entry = (
+            "<entry>"
+            f"<id>{escape(self.base_url)}/events/{escape(view.event.uid)}</id>"
+            f"<title>{escape(view.title)}</title>"
+            f"<updated>{view.updated}</updated>"
+            f"<summary>{escape(view.period)}</summary>"
+            f"<content type=\"text\">{escape(view.description)}</content>"
+        )
+        if view.url is not None:
+            entry += f"<link href={quoteattr(view.url)}/>"
+        self.entries.append(entry + "</entry>\n")
+        self.updated = max(self.updated, view.updated)
+
+    def finish(self) -> str:
+        return (
+            '<?xml version="1.0" encoding="utf-8"?>\n'
+            f'<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="{self.lang}">\n'
+            f"<id>{escape(self.feed_url)}</id>"
+            f"<title>{escape(self.title)}</title>"
+            f"<updated>{self.updated}</updated>"
+            f"<link rel=\"self\" href={quoteattr(self.feed_url)}/>"
+            "<author><name>Nij.iCal</name></author>\n"
+            + "".join(self.entries)
+            + "</feed>\n"
+        )
+
+
+class Exporter:
+    """
+    Write a calendar in several formats with a single walk over its events.
+
+    The values of an event are computed once and shared by the writers of
+    all the formats and all the calendars, so adding a format only adds its
+    serialization.
+    """
+
+    formats: list[ExportFormat]
+    base_url: str
+    profile: OutputProfile
+
+    def __init__(
+        self,
+        formats: list[ExportFormat],
+        url_prefix: str,
+        profile: OutputProfile = OutputProfile.GOOGLE,
+    ) -> None:
+        self.formats = formats
+        # Feeds are read over HTTPS from the same place as the webcal:// URLs
+        self.base_url = url_prefix.replace("webcal://", "https://", 1)
+        self.profile = profile
+        self._views: dict[tuple[int, bool], EventView] = {}
+
+    def export(
+        self,
+        calendar_name: str,
+        title: str,
+        events: list[Event],
+        is_english: bool,
+    ) -> dict[ExportFormat, str]:
+        """
+        Serialize the events of a calendar in all the formats.
+
+        Returns:
+            Content of each format
+        """
+        writers = [
+            self.create_writer(export_format, calendar_name, title, is_english)
+            for export_format in self.formats
+        ]
+        for event in events:
+            view = self.get_view(event, is_english)
+            for writer in writers:
+                writer.add(view)
+        return {writer.format: writer.finish() for writer in writers}
+
+    def create_writer(
+        self,
+        export_format: ExportFormat,
+        calendar_name: str,
+        title: str,
+        is_english: bool,
+    ) -> FormatWriter:
+        if export_format == ExportFormat.ICS:
+            return IcsWriter(
+                calendar_name, title, is_english, Calendar(), self.profile
+            )
+        if export_format == ExportFormat.JSON_FEED:
+            return JsonFeedWriter(calendar_name, title, is_english, self.base_url)
+        return AtomWriter(calendar_name, title, is_english, self.base_url)
+
+    def get_view(self, event: Event, is_english: bool) -> EventView:
+        # The view keeps the event alive, so its id is not reused
+        key = (id(event), is_english)
+        view = self._views.get(key)
+        if view is None:
+            view = EventView(event, is_english)
+            self._views[key] = view
+        return view
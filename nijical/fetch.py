@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+@dataclass(frozen=True)
+class FetchResult:
+    path: str
+    changed: bool
+    # HTTP status of the last response; 304 if the server said not modified
+    status: int
+
+
+class Fetcher:
+    """
+    Download the CSV files concurrently with conditional requests.
+
+    The ETag, Last-Modified and content hash of each file are stored in a
+    cache file next to the data. They are sent as If-None-Match and
+    If-Modified-Since, and the file is left untouched on 304. Google Sheets
+    doesn't always honor them, so a 200 response with the same content
+    hash is also treated as unchanged.
+    """
+
+    cache_path: str
+    timeout: int
+
+    def __init__(self, cache_path: str, timeout: int = 60) -> None:
+        self.cache_path = cache_path
+        self.timeout = timeout
+        self._cache: dict[str, dict] = {}
+
+        if os.path.isfile(cache_path):
+            with open(cache_path, encoding="utf_8") as file:
+                self._cache = json.load(file)
+
+    def fetch_all(self, targets: list[tuple[str, str]]) -> list[FetchResult]:
+        """
+        Download the files.
+
+        Args:
+            targets: List of (path, URL) to download
+
+        Returns:
+            Results in the same order as the targets
+        """
+        retry = Retry(
+            total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504]
+        )
+        adapter = HTTPAdapter(pool_maxsize=len(targets), max_retries=retry)
+
+        with requests.Session() as session:
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+                results = list(
+                    executor.map(
+                        lambda target: self.fetch(session, target[0], target[1]),
+                        targets,
+                    )
+                )
+
+        self.write_cache()
+        return results
+
+    def fetch(self, session: requests.Session, path: str, url: str) -> FetchResult:
+        key = os.path.basename(path)
+        # URLs have secrets and the cache is committed, so only keep the hash
+        url_hash = self.get_hash(url.encode("utf_8"))
+        entry = self._cache.get(key, {})
+
+        # The validators are only valid for the same URL and the same file
+        headers: dict[str, str] = {}
+        is_cached = entry.get("url") == url_hash
+        if is_cached and self.get_file_hash(path) == entry.get("sha256"):
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        with session.get(
+            url, headers=headers, stream=True, timeout=self.timeout
+        ) as response:
+            if response.status_code == 304:
+                return FetchResult(path, False, 304)
+            response.raise_for_status()
+
+            # Write to a temporary file so that a broken download doesn't
+            # overwrite the data
+            temp_path = f"{path}.download"
+            digest = hashlib.sha256()
+            with open(temp_path, mode="wb") as file:
+                for chunk in response.iter_content(chunk_size=65536):
+                    digest.update(chunk)
+                    file.write(chunk)
+
+            content_hash = digest.hexdigest()
+            changed = content_hash != self.get_file_hash(path)
+            if changed:
+                os.replace(temp_path, path)
+            else:
+                os.remove(temp_path)
+
+            self._cache[key] = {
+                "url": url_hash,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "sha256": content_hash,
+            }
+            return FetchResult(path, changed, response.status_code)
+
+    def write_cache(self) -> None:
+        with open(self.cache_path, mode="w", encoding="utf_8") as file:
+            json.dump(dict(sorted(self._cache.items())), file, indent=2)
+            file.write("\n")
+
+    def get_file_hash(self, path: str) -> str | None:
+        if not os.path.isfile(path):
+            return None
+
+        digest = hashlib.sha256()
+        with open(path, mode="rb") as file:
+            for chunk in iter(lambda: file.read(65536), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get_hash(self, data: bytes) -> str:
+        return hashlib.sha256(data).hexdigest()
@@ -0,0 +1,57 @@
+from enum import Enum
+
+
+class OutputProfile(Enum):
+    """
+    Flavor of the generated iCalendar text.
+
+    GOOGLE keeps each content line unfolded because Google Calendar doesn't
+    unfold them correctly. STRICT folds the lines at 75 octets as RFC 5545
+    requires, for clients which reject longer lines.
+    """
+
+    GOOGLE = "google"
+    STRICT = "strict"
+
+
+def fold_lines(text: str, max_line_len: int = 75) -> str:
+    """
+    Fold the content lines longer than `max_line_len` octets.
+
+    The text is encoded once and scanned once, so the time is linear in the
+    size of the text. Continuation lines start with a space, and lines are
+    never split inside a multi-byte UTF-8 character.
+
+    Args:
+        text: iCalendar text with CRLF line breaks
+        max_line_len: Maximum octets of a line excluding the line break
+
+    Returns:
+        The folded text
+    """
+    data = text.encode("utf_8")
+    chunks: list[bytes] = []
+    position = 0
+    length = len(data)
+    while position < length:
+        line_end = data.find(b"\r\n", position)
+        if line_end < 0:
+            line_end = length
+
+        # The first line can have max_line_len octets, and the continuation
+        # lines one less for the leading space
+        limit = max_line_len
+        while line_end - position > limit:
+            end = position + limit
+            # Move back to the first byte of the character (not 0b10xxxxxx)
+            while data[end] & 0xC0 == 0x80:
+                end -= 1
+            chunks.append(data[position:end])
+            chunks.append(b"\r\n ")
+            position = end
+            limit = max_line_len - 1
+
+        chunks.append(data[position : line_end + 2])
+        position = line_end + 2
+
+    return b"".join(chunks).decode("utf_8")
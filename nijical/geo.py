@@ -0,0 +1,147 @@
+import json
+import math
+import os
+import shutil
+from .event import Event, EventType
+from .talent import Talent
+
+
+class GeoIndex:
+    """
+    Write pre-aggregated event locations for the event map.
+
+    `<root>/index.json` has the unique venues and, for each year, the grid
+    tiles which have venues. `<root>/<year>/<tile>.json` has the event IDs of
+    each venue in the tile and the events themselves, and
+    `<root>/<year>/online.json` has the events without a location. The map
+    loads only the tiles and years in view instead of the whole CSV files.
+    """
+
+    # Size of a grid tile in degrees
+    tile_size = 5
+
+    root: str
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def write(self, talents: dict[str, Talent], events: list[Event]) -> None:
+        venues: list[list] = []
+        venue_ids: dict[tuple[float, float], int] = {}
+        tiles: dict[str, dict[str, dict[int, list[str]]]] = {}
+        tile_events: dict[str, dict[str, dict[str, dict]]] = {}
+        online_events: dict[str, dict[str, dict]] = {}
+
+        for event in events:
+            if event.event_type != EventType.EVENT:
+                continue
+
+            year = str(event.begin.to("+09:00").year)
+            row = self.generate_row(event)
+            position = self.parse_geo(event.geo)
+            if position is None:
+                online_events.setdefault(year, {})[event.uid] = row
+                continue
+
+            if position not in venue_ids:
+                venue_ids[position] = len(venues)
+                venues.append(
+                    [
+                        position[0],
+                        position[1],
+                        event.location if type(event.location) is str else "",
+                        event.eng_location if type(event.eng_location) is str else "",
+                    ]
+                )
+            venue_id = venue_ids[position]
+
+            tile = self.get_tile(position)
+            tiles.setdefault(year, {}).setdefault(tile, {}).setdefault(
+                venue_id, []
+            ).append(event.uid)
+            tile_events.setdefault(year, {}).setdefault(tile, {})[event.uid] = row
+
+        # Rewrite everything because tiles of past years can be removed or moved
+        if os.path.isdir(self.root):
+            shutil.rmtree(self.root)
+        os.makedirs(self.root)
+
+        index = {"tileSize": self.tile_size, "venues": venues, "years": {}}
+        for year in sorted(set(tiles) | set(online_events)):
+            os.makedirs(f"{self.root}/{year}")
+            year_tiles = tiles.get(year, {})
+            index["years"][year] = {
+                "tiles": {tile: sorted(year_tiles[tile]) for tile in sorted(year_tiles)},
+                "online": len(online_events.get(year, {})),
+            }
+
+            for tile, tile_venues in year_tiles.items():
+                self._write_json(
+                    f"{self.root}/{year}/{tile}.json",
+                    {
+                        "venues": {str(idx): uids for idx, uids in tile_venues.items()},
+                        "events": tile_events[year][tile],
+                    },
+                )
+
+            if year in online_events:
+                self._write_json(
+                    f"{self.root}/{year}/online.json", {"events": online_events[year]}
+                )
+
+        self._write_json(f"{self.root}/index.json", index)
+
+        # The map needs only a few columns of the talents
+        self._write_json(
+            f"{self.root}/talents.json",
+            [
+                {
+                    "名前": talent.name,
+                    "ローマ字": talent.eng_name,
+                    "ふりがな": talent.furigana,
+                    "活動開始日時": talent.first_tweet_datetime.format(
+                        "YYYY/MM/DD HH:mm"
+                    ),
+                    "卒業": talent.graduation_date.format("YYYY/MM/DD")
+                    if talent.graduation_date is not None
+                    else "",
+                }
+                for talent in talents.values()
+            ],
+        )
+
+    def generate_row(self, event: Event) -> dict:
+        """
+        Generate an event in the same shape as a row of events.csv parsed by the map.
+        """
+        return {
+            "イベント名": event.summary,
+            "イベント名（英語）": event.eng_summary,
+            "開始日時": event.begin.to("+09:00").format("YYYY/MM/DD HH:mm"),
+            "終了日時": event.end.to("+09:00").format("YYYY/MM/DD HH:mm"),
+            "場所": event.location if type(event.location) is str else "",
+            "場所（英語）": event.eng_location if type(event.eng_location) is str else "",
+            "geo": event.geo if type(event.geo) is str else "",
+            "参加者": ", ".join(talent.name for talent in event.talents),
+            "URL": event.url if type(event.url) is str else "",
+        }
+
+    def get_tile(self, position: tuple[float, float]) -> str:
+        lat, lng = position
+        return f"{math.floor(lat / self.tile_size)}_{math.floor(lng / self.tile_size)}"
+
+    def parse_geo(self, geo: str | None) -> tuple[float, float] | None:
+        if type(geo) is not str:
+            return None
+
+        try:
+            lat, lng = (float(value) for value in geo.split(","))
+        except ValueError:
+            return None
+
+        # Same precision as the map groups markers
+        return (round(lat, 6), round(lng, 6))
+
+    def _write_json(self, path: str, data) -> None:
+        with open(path, mode="w", encoding="utf_8") as file:
+            json.dump(data, file, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,171 @@
+import arrow
+import hashlib
+import json
+import os
+from typing import Container
+from .event import Event
+
+# Change when the rendering of the hashed content changes, together with a
+# migration in tools/migrate_manifest.py which carries the stamps over.
+# 2: TEXT values are escaped as RFC 5545 requires
+MANIFEST_VERSION = 2
+
+
+class StampManifest:
+    """
+    Keep DTSTAMP and SEQUENCE of each VEVENT stable while its content is unchanged.
+
+    Generated events inherit the timestamp of their source row, so editing a
+    talent row used to rewrite DTSTAMP of all their anniversary events. The
+    manifest stores the content hash, DTSTAMP and SEQUENCE of every VEVENT,
+    and they are advanced only when the rendered content changes. It is
+    committed with the calendars, so the next update compares with it.
+    """
+
+    path: str
+    now: arrow.Arrow
+
+    def __init__(self, path: str, now: arrow.Arrow) -> None:
+        self.path = path
+        self.now = now
+        # key: [content hash, DTSTAMP, SEQUENCE]
+        self._entries: dict[str, list] = {}
+        self._new_entries: dict[str, list] = {}
+        # id of the event: (event, content hash, applied event), reused by
+        # the watch mode for unchanged events
+        self._applied: dict[int, tuple[Event, str, Event]] = {}
+        self._applied_ids: set[int] = set()
+
+        if os.path.isfile(path):
+            with open(path, encoding="utf_8") as file:
+                data = json.load(file)
+            # Manifests before the version field are version 1
+            version = data.get("version", 1)
+            if version != MANIFEST_VERSION:
+                raise ValueError(
+                    f"{path} is version {version}, but {MANIFEST_VERSION} is "
+                    "required; update it with tools/migrate_manifest.py"
+                )
+            self._entries = data["events"]
+
+    def apply(self, events: list[Event]) -> list[Event]:
+        """
+        Replace DTSTAMP and SEQUENCE of the events with the recorded ones.
+
+        Args:
+            events: Events generated from the CSV files
+
+        Returns:
+            Events with the stable DTSTAMP and SEQUENCE
+        """
+        result: list[Event] = []
+        for event in events:
+            key = self.get_key(event)
+            self._applied_ids.add(id(event))
+            applied = self._applied.get(id(event))
+            if applied is not None and applied[0] is event:
+                content_hash = applied[1]
+            else:
+                applied = None
+                content_hash = self.get_hash(event)
+            entry = self._entries.get(key)
+
+            if entry is None:
+                # New event: the timestamp of the row is the creation time
+                timestamp = event.timestamp
+                sequence = 0
+            elif entry[0] == content_hash:
+                timestamp = arrow.get(entry[1])
+                sequence = entry[2]
+            else:
+                # Changed event: use the timestamp of the row if it was updated,
+                # otherwise (e.g. changes of generated texts) the generation time
+                stamp = arrow.get(entry[1])
+                timestamp = event.timestamp if event.timestamp > stamp else self.now
+                sequence = entry[2] + 1
+
+            self._new_entries[key] = [
+                content_hash,
+                timestamp.to("utc").isoformat(),
+                sequence,
+            ]
+            if (
+                applied is not None
+                and applied[2].timestamp == timestamp
+                and applied[2].sequence == sequence
+            ):
+                applied_event = applied[2]
+            else:
+                applied_event = event.with_stamp(timestamp, sequence)
+                self._applied[id(event)] = (event, content_hash, applied_event)
+            result.append(applied_event)
+
+        return result
+
+    def reset(self) -> None:
+        """
+        Start applying another set of events to the same recorded entries.
+
+        Content hashes of the events applied before are reused, so applying
+        mostly unchanged events again is fast.
+        """
+        # Forget the events which were not applied in the last run
+        self._applied = {
+            key: value
+            for key, value in self._applied.items()
+            if key in self._applied_ids
+        }
+        self._applied_ids = set()
+        self._new_entries = {}
+
+    def write(self) -> None:
+        """
+        Write the entries of the events applied in this run.
+
+        Removed events are dropped from the manifest.
+        """
+        write_manifest(self.path, self._new_entries)
+
+    def get_key(self, event: Event) -> str:
+        return get_unique_key(event.uid, self._new_entries)
+
+    def get_hash(self, event: Event) -> str:
+        # The content without DTSTAMP and SEQUENCE, which are managed here.
+        # It is rendered once and shared with the stamped copy of the event.
+        content = "".join(
+            event.param("BEGIN", "VEVENT")
+            + event.param("UID", event.uid)
+            + event.generate_content(is_english)
+            for is_english in (False, True)
+        )
+        return hashlib.sha256(content.encode("utf_8")).hexdigest()[:16]
+
+
+def get_unique_key(uid: str, keys: Container[str]) -> str:
+    """
+    Get the key of a record among the keys of the records before it.
+
+    Some rows share the same UID; they are kept apart by their order: the
+    first one is "<uid>", the next ones are "<uid>#2", "<uid>#3" and so on.
+    The manifest, the watch mode and nijical diff all use these keys.
+    """
+    key = uid
+    count = 1
+    while key in keys:
+        count += 1
+        key = f"{uid}#{count}"
+    return key
+
+
+def write_manifest(path: str, entries: dict[str, list]) -> None:
+    # One event per line to keep the diff of update PRs small
+    lines = [
+        json.dumps(key) + ":" + json.dumps(entry, separators=(",", ":"))
+        for key, entry in sorted(entries.items())
+    ]
+    with open(path, mode="w", encoding="utf_8") as file:
+        file.write(
+            f'{{"version":{MANIFEST_VERSION},"events":{{\n'
+            + ",\n".join(lines)
+            + "\n}}\n"
+        )
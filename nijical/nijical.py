@@ -1,9 +1,24 @@
 import arrow
+import hashlib
+import os
 import pandas as pd
-from .calendar import Calendar
+from .columns import EVENT_COLUMNS, TALENT_COLUMNS, TICKET_COLUMNS
+from .dataset import Dataset
 from .event import Event, EventType
+from .export import Exporter, ExportFormat
+from .folding import OutputProfile
+from .geo import GeoIndex
+from .manifest import StampManifest
+from .partition import Partition, assign_calendars, write_partition_manifest
+from .search import SearchIndex
+from .shard import MonthShards
+from .store import EventStore
 from .talent import Talent
 from .ticket import Ticket
+from .tier import ColdTier
+from .writer import FileWriter
+
+NIJISANJI = "にじさんじ"
 
 
 class NijiCal:
@@ -11,6 +26,18 @@ class NijiCal:
     event_data_path: str
     ticket_data_path: str
     url_prefix: str
+    # Directory to write the calendars and the data for the web pages
+    output_root: str
+    # Current time for DTSTAMP of changed events and the anniversary horizon
+    now: arrow.Arrow
+    # Flavor of the written .ics files
+    output_profile: OutputProfile
+    # Name of the pseudo-talent of the whole organization in talents.csv
+    organization: str
+    # Formats to write each calendar in
+    formats: list[ExportFormat]
+    # Keep the unchanged calendars of graduated talents instead of rewriting
+    use_cold_tier: bool
 
     def __init__(
         self,
@@ -18,11 +45,23 @@ class NijiCal:
         event_data_path: str,
         ticket_data_path: str,
         url_prefix: str,
+        output_root: str = "docs",
+        now: arrow.Arrow | None = None,
+        output_profile: OutputProfile = OutputProfile.GOOGLE,
+        organization: str = NIJISANJI,
+        formats: list[ExportFormat] | None = None,
+        use_cold_tier: bool = True,
     ) -> None:
         self.talent_data_path = talent_data_path
         self.event_data_path = event_data_path
         self.ticket_data_path = ticket_data_path
         self.url_prefix = url_prefix
+        self.output_root = output_root
+        self.now = now if now is not None else arrow.utcnow()
+        self.output_profile = output_profile
+        self.organization = organization
+        self.formats = formats if formats is not None else [ExportFormat.ICS]
+        self.use_cold_tier = use_cold_tier
 
     def _validate_and_get_column_indices(
         self, columns: list[str], expected_columns: list[str], csv_name: str
@@ -78,70 +117,209 @@ class NijiCal:
                     )
                     raise ValueError(error_msg)
 
-    def generate_all(self) -> int:
+    def load_dataset(self, manifest: StampManifest | None = None) -> Dataset:
+        """
+        Load and validate the talents and events from the CSV files.
+
+        Args:
+            manifest: Manifest to apply stable DTSTAMP and SEQUENCE, if any
+
+        Returns:
+            The loaded dataset
+        """
         talents = self.fetch_talents()
         tickets = self.fetch_tickets()
         live_events = self.fetch_events(talents, tickets)
         talent_events = self.generate_talent_events(talents)
-        talent_events.append(self.generate_nijisanji_day_event(talents))
+        nijisanji_day_event = self.generate_nijisanji_day_event(talents)
+        if nijisanji_day_event is not None:
+            talent_events.append(nijisanji_day_event)
 
         # Validate event dates
         self._validate_event_dates(live_events)
         self._validate_event_dates(talent_events)
 
-        # generate live event calendar
-        live_calendar = Calendar(events=live_events)
-        data = live_calendar.generate_ical(name="にじさんじイベント", is_english=False)
-        with open("docs/ja/events.ics", mode="w", encoding="utf_8") as file:
-            file.write(data)
+        # Keep DTSTAMP and SEQUENCE of unchanged events
+        if manifest is not None:
+            live_events = manifest.apply(live_events)
+            talent_events = manifest.apply(talent_events)
 
-        data = live_calendar.generate_ical(name="Nijisanji Events", is_english=True)
-        with open("docs/en/events.ics", mode="w", encoding="utf_8") as file:
-            file.write(data)
-
-        # generate birthday & anniversary calendar
-        birthday_calendar = Calendar(events=talent_events)
-        data = birthday_calendar.generate_ical(
-            name="にじさんじ誕生日", is_english=False
+        return Dataset(
+            talents=talents,
+            live_events=live_events,
+            talent_events=talent_events,
+            version=self.get_data_version(),
         )
-        with open("docs/ja/birthdays.ics", mode="w", encoding="utf_8") as file:
-            file.write(data)
 
-        data = birthday_calendar.generate_ical(
-            name="Nijisanji Birthdays", is_english=True
+    def get_data_version(self) -> str:
+        """
+        Get a hash of the CSV files, which changes whenever any of them changes.
+        """
+        version = hashlib.sha256()
+        for path in (
+            self.talent_data_path,
+            self.event_data_path,
+            self.ticket_data_path,
+        ):
+            with open(path, mode="rb") as file:
+                version.update(file.read())
+        return version.hexdigest()[:16]
+
+    def generate_all(self, partition: Partition | None = None) -> int:
+        """
+        Generate the calendars, or a slice of them for a partition.
+
+        Args:
+            partition: Partition to generate, or None for all calendars
+
+        Returns:
+            Exit code
+        """
+        for directory in ("ja", "en", "data"):
+            os.makedirs(f"{self.output_root}/{directory}", exist_ok=True)
+
+        manifest = StampManifest(f"{self.output_root}/data/manifest.json", self.now)
+        dataset = self.load_dataset(manifest)
+        calendar_names: set[str] | None = None
+        if partition is not None:
+            calendar_names = assign_calendars(dataset, partition.count)[
+                partition.index - 1
+            ]
+
+        shards = MonthShards(f"{self.output_root}/data/shards", self.now)
+        self.write_calendars(dataset, shards, calendar_names)
+
+        # Files shared by all the calendars are written by the first partition
+        is_primary = partition is None or partition.is_primary
+        if is_primary:
+            self.write_indices(dataset)
+
+        if partition is not None:
+            write_partition_manifest(
+                self.output_root, partition, dataset, calendar_names, self.formats
+            )
+
+        # The manifest is written last, after all the calendar files are
+        # written, so a failed run doesn't record stamps of unwritten events
+        if is_primary:
+            manifest.write()
+
+        return 0
+
+    def write_calendars(
+        self,
+        dataset: Dataset,
+        shards: MonthShards,
+        calendar_names: set[str] | None = None,
+    ) -> None:
+        """
+        Write the calendar files and month shards of the calendars.
+
+        Args:
+            dataset: Dataset to generate the calendars from
+            shards: Writer of the month shards
+            calendar_names: Names of the calendars to write, or None for all
+        """
+
+        def is_target(calendar_name: str) -> bool:
+            return calendar_names is None or calendar_name in calendar_names
+
+        # Shared by the calendars, so an event is serialized once per language
+        exporter = Exporter(self.formats, self.url_prefix, self.output_profile)
+        cold_tier = ColdTier(
+            self.output_root,
+            shards,
+            self.formats,
+            self.url_prefix,
+            self.output_profile,
+            self.now,
         )
-        with open("docs/en/birthdays.ics", mode="w", encoding="utf_8") as file:
-            file.write(data)
 
-        # generate talent individual calendars
-        all_calendar = Calendar(events=live_events + talent_events)
-        for talent in talents.values():
-            if talent.name == "にじさんじ":
-                continue
+        # Render the next calendar while the files of the previous one are
+        # being written
+        with FileWriter() as writer:
+            # generate live event calendar
+            if is_target("events"):
+                self.write_calendar(
+                    dataset, exporter, writer, "events", dataset.live_events
+                )
 
-            file_name = talent.eng_name.lower().replace(" ", "_") + ".ics"
+            # generate birthday & anniversary calendar
+            if is_target("birthdays"):
+                self.write_calendar(
+                    dataset, exporter, writer, "birthdays", dataset.talent_events
+                )
 
-            data = all_calendar.generate_ical(
-                name=talent.name,
-                is_english=False,
-                talent=talent,
-            )
-            with open(f"docs/ja/{file_name}", mode="w", encoding="utf_8") as file:
-                file.write(data)
+            # generate month shards for the calendar viewer
+            all_events = dataset.all_events
+            if is_target("events") or is_target("birthdays"):
+                shards.write("events", all_events, writer)
 
-            data = all_calendar.generate_ical(
-                name=talent.eng_name, is_english=True, talent=talent
+            # generate talent individual calendars
+            for talent in dataset.talents.values():
+                if talent.is_organization:
+                    continue
+
+                calendar_name = dataset.get_talent_calendar_name(talent)
+                if not is_target(calendar_name):
+                    continue
+
+                # Filter once and share the result among languages and shards
+                events = dataset.get_talent_events(talent)
+
+                inputs: str | None = None
+                if self.use_cold_tier and cold_tier.is_cold(talent):
+                    inputs = cold_tier.get_inputs(talent, events)
+                    if cold_tier.is_frozen(calendar_name, inputs):
+                        continue
+
+                self.write_calendar(dataset, exporter, writer, calendar_name, events)
+                shards.write(calendar_name, events, writer, inputs)
+
+    def write_calendar(
+        self,
+        dataset: Dataset,
+        exporter: Exporter,
+        writer: FileWriter,
+        calendar_name: str,
+        events: list[Event],
+    ) -> None:
+        for lang, is_english in (("ja", False), ("en", True)):
+            contents = exporter.export(
+                calendar_name,
+                dataset.get_calendar_title(calendar_name, is_english),
+                events,
+                is_english,
             )
-            with open(f"docs/en/{file_name}", mode="w", encoding="utf_8") as file:
-                file.write(data)
+            for export_format, data in contents.items():
+                writer.write(
+                    f"{self.output_root}/{lang}/{calendar_name}.{export_format.value}",
+                    data,
+                )
+
+    def write_indices(self, dataset: Dataset) -> None:
+        """
+        Write the indices for the web pages and the calendar list.
+        """
+        talents = dataset.talents
+        live_events = dataset.live_events
+        all_events = dataset.all_events
+
+        # generate search index for the web pages
+        SearchIndex(f"{self.output_root}/data/search").write(talents, all_events)
+
+        # generate geo index for the event map
+        GeoIndex(f"{self.output_root}/data/geo").write(talents, live_events)
 
         # generate calender list for GitHub Pages
         sorted_talents = sorted(
             talents.values(), key=lambda talent: talent.first_tweet_datetime
         )
-        with open("docs/ja/calendars.md", mode="w", encoding="utf_8_sig") as ja_file:
+        with open(
+            f"{self.output_root}/ja/calendars.md", mode="w", encoding="utf_8_sig"
+        ) as ja_file:
             with open(
-                "docs/en/calendars.md", mode="w", encoding="utf_8_sig"
+                f"{self.output_root}/en/calendars.md", mode="w", encoding="utf_8_sig"
             ) as en_file:
                 ja_file.write(
                     "<form action='#' class='search-form' onsubmit='return false;'><input id='liver-filter-input' placeholder='検索'/></form>\n"
@@ -160,7 +338,7 @@ class NijiCal:
                 )
 
                 for talent in sorted_talents:
-                    if talent.name == "にじさんじ":
+                    if talent.is_organization:
                         continue
 
                     file_name = talent.eng_name.lower().replace(" ", "_") + ".ics"
@@ -185,35 +363,13 @@ class NijiCal:
                 ja_file.write("</tbody></table></div>\n")
                 en_file.write("</tbody></table></div>\n")
 
-        return 0
-
     def fetch_talents(self) -> dict[str, Talent]:
         data = pd.read_csv(self.talent_data_path, encoding="utf_8_sig")
         tzinfo = "+09:00"
 
-        # Define expected columns
-        expected_columns = [
-            "名前",
-            "UID",
-            "データ更新日時",
-            "ローマ字",
-            "ふりがな",
-            "誕生日",
-            "特殊誕生日",
-            "特殊誕生日（英語）",
-            "活動開始日時",
-            "初配信日時",
-            "YouTube",
-            "X",
-            "Twitch",
-            "補足",
-            "補足（英語）",
-            "卒業",
-        ]
-
         # Validate columns and get indices
         col_map = self._validate_and_get_column_indices(
-            data.columns.tolist(), expected_columns, "talents.csv"
+            data.columns.tolist(), TALENT_COLUMNS, "talents.csv"
         )
 
         talents: dict[str, Talent] = {}
@@ -270,6 +426,7 @@ class NijiCal:
                 eng_description=row[col_map["補足（英語）"]],
                 graduation_date=graduation_date,
                 timestamp=timestamp,
+                is_organization=row[col_map["名前"]] == self.organization,
             )
             talents[talent.name] = talent
 
@@ -281,27 +438,9 @@ class NijiCal:
         data = pd.read_csv(self.event_data_path, encoding="utf_8_sig")
         tzinfo = "+09:00"
 
-        # Define expected columns
-        expected_columns = [
-            "イベント名",
-            "UID",
-            "データ更新日時",
-            "イベント名（英語）",
-            "開始日時",
-            "終了日時",
-            "場所",
-            "場所（英語）",
-            "geo",
-            "説明文",
-            "説明文（英語）",
-            "URL",
-            "参加者",
-            "ハッシュタグ",
-        ]
-
         # Validate columns and get indices
         col_map = self._validate_and_get_column_indices(
-            data.columns.tolist(), expected_columns, "events.csv"
+            data.columns.tolist(), EVENT_COLUMNS, "events.csv"
         )
 
         events: list[Event] = []
@@ -320,6 +459,11 @@ class NijiCal:
 
             event_talents: list[Talent] = []
             for talent_name in talent_names:
+                if talent_name not in talents:
+                    raise ValueError(
+                        f"Error in events.csv: Unknown talent '{talent_name}' "
+                        f"in event UID {uid}"
+                    )
                 event_talents.append(talents[talent_name])
 
             event_tickets: list[Ticket] = []
@@ -438,23 +582,9 @@ class NijiCal:
         data = pd.read_csv(self.ticket_data_path, encoding="utf_8_sig")
         tzinfo = "+09:00"
 
-        # Define expected columns
-        expected_columns = [
-            "タイトル",
-            "UID",
-            "更新日時",
-            "タイトル（英語）",
-            "イベントUID",
-            "イベント名（自動、確認用）",
-            "開始日時",
-            "終了日時",
-            "URL",
-            "色分け用",
-        ]
-
         # Validate columns and get indices
         col_map = self._validate_and_get_column_indices(
-            data.columns.tolist(), expected_columns, "tickets.csv"
+            data.columns.tolist(), TICKET_COLUMNS, "tickets.csv"
         )
 
         tickets: dict[str, list[Talent]] = {}
@@ -499,17 +629,24 @@ class NijiCal:
         events: list[Event] = []
 
         for talent in talents.values():
-            if talent.name == "にじさんじ":
+            if talent.is_organization:
                 continue
 
-            birthday_event = self.generate_birthday_event(talent)
-            if birthday_event is not None:
-                events.append(birthday_event)
-            events += self.generate_anniversary_events(talent)
+            events += self.generate_events_for_talent(talent)
+
+        return events
+
+    def generate_events_for_talent(self, talent: Talent) -> list[Event]:
+        events: list[Event] = []
+
+        birthday_event = self.generate_birthday_event(talent)
+        if birthday_event is not None:
+            events.append(birthday_event)
+        events += self.generate_anniversary_events(talent)
 
-            graduation_event = self.generate_graduation_event(talent)
-            if graduation_event is not None:
-                events.append(graduation_event)
+        graduation_event = self.generate_graduation_event(talent)
+        if graduation_event is not None:
+            events.append(graduation_event)
 
         return events
 
@@ -623,7 +760,7 @@ class NijiCal:
         # anniversaries
         event_date = talent.first_tweet_datetime.to("utc").shift(years=1)
         start_year = event_date.year
-        end_year = arrow.utcnow().year + 10  # generate events until 10 years later
+        end_year = self.now.year + 10  # generate events until 10 years later
         if talent.graduation_date is not None:
             end_year = talent.graduation_date.year
             end_date = arrow.get(
@@ -709,8 +846,14 @@ class NijiCal:
             event_type=EventType.GRADUATION,
         )
 
-    def generate_nijisanji_day_event(self, talents: list[Talent]) -> Event:
-        nijisanji = talents["にじさんじ"]
+    def generate_nijisanji_day_event(
+        self, talents: dict[str, Talent]
+    ) -> Event | None:
+        # Only for the roster of Nijisanji
+        if self.organization != NIJISANJI or NIJISANJI not in talents:
+            return None
+
+        nijisanji = talents[NIJISANJI]
         uid = nijisanji.uid[:-6] + "012019"
         title = "にじさんじの日"
         eng_title = "Nijisanji Day"
@@ -741,12 +884,20 @@ class NijiCal:
         suffix = q % 10 != 1 and ordinals.get(mod) or "th"
         return f"{num}{suffix}"
 
-    def generate_tweet_for_date(self, date: arrow.Arrow) -> (str, str):
-        talents = self.fetch_talents()
-        tickets = self.fetch_tickets()
-        live_events = self.fetch_events(talents, tickets)
-        talent_events = self.generate_talent_events(talents)
-        talent_events.append(self.generate_nijisanji_day_event(talents))
+    def generate_tweet_for_date(
+        self, date: arrow.Arrow, store: EventStore | None = None
+    ) -> (str, str):
+        if store is not None:
+            # Only the candidates of the date are loaded with the indexes
+            live_events, talent_events = store.get_events_for_date(date)
+        else:
+            talents = self.fetch_talents()
+            tickets = self.fetch_tickets()
+            live_events = self.fetch_events(talents, tickets)
+            talent_events = self.generate_talent_events(talents)
+            nijisanji_day_event = self.generate_nijisanji_day_event(talents)
+            if nijisanji_day_event is not None:
+                talent_events.append(nijisanji_day_event)
 
         live_events_of_day = self.filter_event_for_date(live_events, date)
         talent_events_of_day = self.filter_event_for_date(talent_events, date)
@@ -0,0 +1,112 @@
+import csv
+import heapq
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import TextIO
+from .event import Event, EventType
+from .talent import Talent
+
+# Columns of the CSV report
+OVERLAP_COLUMNS = [
+    "talent",
+    "minutes",
+    "first_uid",
+    "first_summary",
+    "first_begin",
+    "first_end",
+    "second_uid",
+    "second_summary",
+    "second_begin",
+    "second_end",
+]
+
+
+@dataclass(frozen=True)
+class Overlap:
+    """
+    Two events of a talent at the same time. `first` begins before or at
+    the same time as `second`.
+    """
+
+    talent: Talent
+    first: Event
+    second: Event
+
+    @property
+    def minutes(self) -> int:
+        end = min(self.first.end, self.second.end)
+        return int((end - self.second.begin).total_seconds() // 60)
+
+    def to_dict(self) -> dict:
+        result = {"talent": self.talent.name, "minutes": self.minutes}
+        for key, event in (("first", self.first), ("second", self.second)):
+            result[f"{key}_uid"] = event.uid
+            result[f"{key}_summary"] = event.summary
+            result[f"{key}_begin"] = event.begin.to("+09:00").isoformat()
+            result[f"{key}_end"] = event.end.to("+09:00").isoformat()
+        return result
+
+
+def find_overlaps(
+    events: list[Event], max_duration: timedelta = timedelta(hours=24)
+) -> list[Overlap]:
+    """
+    Find the events which overlap with another event of the same talent.
+
+    Only timed live events are checked: all-day events, ticket sales and
+    events longer than `max_duration` (cafes, exhibitions and pop-up stores
+    which run beside the other events) are ignored, as is the organization.
+    Events which only touch, one ending when the other begins, don't overlap.
+
+    The events of each talent are swept in the order of their begin times
+    with a heap of the events still going on, so a talent of n events takes
+    O(n log n) plus the number of overlaps instead of comparing every pair.
+
+    Args:
+        events: Events from NijiCal.fetch_events
+        max_duration: Longest event to check
+
+    Returns:
+        Overlaps in the order of the begin time of the second event
+    """
+    events_by_talent: dict[str, tuple[Talent, list[Event]]] = {}
+    for event in events:
+        if event.event_type != EventType.EVENT or event.all_day:
+            continue
+        if event.end - event.begin > max_duration:
+            continue
+        for talent in event.talents:
+            if talent.is_organization:
+                continue
+            events_by_talent.setdefault(talent.uid, (talent, []))[1].append(event)
+
+    overlaps: list[Overlap] = []
+    for talent, talent_events in events_by_talent.values():
+        talent_events.sort(key=lambda ev: (ev.begin, ev.end, ev.uid))
+        # (end, uid, event) of the events which haven't ended yet
+        active: list[tuple] = []
+        for event in talent_events:
+            while len(active) > 0 and active[0][0] <= event.begin:
+                heapq.heappop(active)
+            for _, _, other in sorted(active, key=lambda item: item[2].begin):
+                if other.uid != event.uid:
+                    overlaps.append(Overlap(talent, other, event))
+            heapq.heappush(active, (event.end, event.uid, event))
+
+    overlaps.sort(
+        key=lambda overlap: (
+            overlap.second.begin,
+            overlap.first.begin,
+            overlap.talent.name,
+            overlap.first.uid,
+            overlap.second.uid,
+        )
+    )
+    return overlaps
+
+
+def write_overlaps_csv(overlaps: list[Overlap], file: TextIO) -> None:
+    writer = csv.DictWriter(file, fieldnames=OVERLAP_COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    for overlap in overlaps:
+        writer.writerow(overlap.to_dict())
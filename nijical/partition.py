@@ -0,0 +1,243 @@
+import hashlib
+import heapq
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from .dataset import Dataset
+from .export import ExportFormat
+
+# Directory of the partition manifests under the output root
+MANIFEST_DIRECTORY = "data/partitions"
+
+
+@dataclass(frozen=True)
+class Partition:
+    """
+    One of `count` slices of the calendars, for `run.py --shard index/count`.
+
+    The first partition also writes the files shared by all calendars: the
+    DTSTAMP manifest, the calendar lists and the search and geo indices.
+    """
+
+    # 1-based
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, value: str) -> "Partition":
+        """
+        Parse "i/N".
+
+        Raises:
+            ValueError: If the value is not "i/N" with 1 <= i <= N
+        """
+        index, separator, count = value.partition("/")
+        if separator == "" or not index.isdigit() or not count.isdigit():
+            raise ValueError(f"Invalid shard '{value}': expected i/N")
+        partition = cls(int(index), int(count))
+        if not 1 <= partition.index <= partition.count:
+            raise ValueError(f"Invalid shard '{value}': expected 1 <= i <= N")
+        return partition
+
+    @property
+    def is_primary(self) -> bool:
+        return self.index == 1
+
+    @property
+    def manifest_path(self) -> str:
+        return f"{MANIFEST_DIRECTORY}/{self.index}-of-{self.count}.json"
+
+
+def get_stable_hash(value: str) -> int:
+    """
+    Hash which is the same in every process, unlike hash() of str.
+    """
+    return int(hashlib.sha256(value.encode("utf_8")).hexdigest()[:16], 16)
+
+
+def assign_calendars(dataset: Dataset, count: int) -> list[set[str]]:
+    """
+    Split the calendars into `count` sets of about the same number of events.
+
+    The calendars are assigned to the least loaded partition in the order of
+    their event counts (longest processing time first), and calendars of the
+    same count are ordered by a hash of the talent UID, so every worker gets
+    the same result from the same data. "events" and "birthdays" go together
+    because they share the month shards of "events".
+
+    Returns:
+        Calendar names of each partition, in the order of the partitions
+    """
+    # Expected number of events of each talent: their own events, plus the
+    # organization-wide ones which most of the talents have
+    talent_counts: dict[str, int] = {}
+    organization_count = 0
+    for event in dataset.all_events:
+        for talent in event.talents:
+            if talent.is_organization:
+                organization_count += 1
+            else:
+                talent_counts[talent.name] = talent_counts.get(talent.name, 0) + 1
+
+    # (-weight, hash, calendar names)
+    units: list[tuple[int, int, list[str]]] = [
+        (-len(dataset.all_events), get_stable_hash("events"), ["events", "birthdays"])
+    ]
+    for talent in dataset.talents.values():
+        if talent.is_organization:
+            continue
+        weight = talent_counts.get(talent.name, 0) + organization_count
+        calendar_name = dataset.get_talent_calendar_name(talent)
+        units.append((-weight, get_stable_hash(talent.uid), [calendar_name]))
+    units.sort()
+
+    partitions: list[set[str]] = [set() for _ in range(count)]
+    # (load, index) of the partitions
+    loads = [(0, index) for index in range(count)]
+    for weight, _, calendar_names in units:
+        load, index = heapq.heappop(loads)
+        partitions[index].update(calendar_names)
+        heapq.heappush(loads, (load - weight, index))
+    return partitions
+
+
+def get_file_hash(path: str) -> str:
+    with open(path, mode="rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+
+def write_partition_manifest(
+    output_root: str,
+    partition: Partition,
+    dataset: Dataset,
+    calendar_names: set[str],
+    formats: list[ExportFormat],
+) -> None:
+    """
+    Write the files and directories which the partition generated, with the
+    hashes of the files, to `<output_root>/data/partitions/<i>-of-<N>.json`.
+    """
+    files: list[str] = []
+    directories: list[str] = []
+    for calendar_name in sorted(calendar_names):
+        for lang in ("ja", "en"):
+            files += [
+                f"{lang}/{calendar_name}.{export_format.value}"
+                for export_format in formats
+            ]
+            # The month shards of "birthdays" are in "events"
+            if calendar_name != "birthdays":
+                directories.append(f"data/shards/{lang}/{calendar_name}")
+
+    if partition.is_primary:
+        files += ["data/manifest.json", "ja/calendars.md", "en/calendars.md"]
+        directories += ["data/search", "data/geo"]
+
+    for directory in directories:
+        for parent, _, file_names in os.walk(f"{output_root}/{directory}"):
+            relative = os.path.relpath(parent, output_root).replace(os.sep, "/")
+            files += [f"{relative}/{file_name}" for file_name in file_names]
+
+    manifest = {
+        "version": dataset.version,
+        "index": partition.index,
+        "count": partition.count,
+        "formats": [export_format.value for export_format in formats],
+        "calendars": sorted(calendar_names),
+        "all_calendars": sorted(dataset.get_calendar_names()),
+        "directories": directories,
+        "files": {
+            path: get_file_hash(f"{output_root}/{path}") for path in sorted(files)
+        },
+    }
+
+    path = f"{output_root}/{partition.manifest_path}"
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, mode="w", encoding="utf_8") as file:
+        json.dump(manifest, file, ensure_ascii=False, indent=1)
+
+
+def load_partition_manifest(partition_root: str) -> dict:
+    directory = f"{partition_root}/{MANIFEST_DIRECTORY}"
+    names = os.listdir(directory) if os.path.isdir(directory) else []
+    if len(names) != 1:
+        raise ValueError(
+            f"{partition_root}: expected one manifest in {MANIFEST_DIRECTORY}, "
+            f"found {len(names)}"
+        )
+    with open(f"{directory}/{names[0]}", encoding="utf_8") as file:
+        return json.load(file)
+
+
+def verify_partitions(partition_roots: list[str]) -> list[str]:
+    """
+    Check that the partitions are of the same data and cover every calendar
+    and every file exactly once, and that the files are intact.
+
+    Args:
+        partition_roots: Output roots of all the partitions
+
+    Returns:
+        Problems found, empty if the partitions can be merged
+    """
+    try:
+        manifests = [load_partition_manifest(root) for root in partition_roots]
+    except ValueError as error:
+        return [str(error)]
+
+    errors: list[str] = []
+    first = manifests[0]
+    for key in ("version", "count", "formats", "all_calendars"):
+        if any(manifest[key] != first[key] for manifest in manifests):
+            errors.append(f"The partitions have different {key}")
+    indices = sorted(manifest["index"] for manifest in manifests)
+    if indices != list(range(1, first["count"] + 1)):
+        errors.append(f"Expected partitions 1 to {first['count']}, found {indices}")
+    if errors:
+        return errors
+
+    for key, expected in [
+        ("calendars", first["all_calendars"]),
+        ("directories", None),
+        ("files", None),
+    ]:
+        owners: dict[str, list[int]] = {}
+        for manifest in manifests:
+            for item in manifest[key]:
+                owners.setdefault(item, []).append(manifest["index"])
+        for item, indices in sorted(owners.items()):
+            if len(indices) > 1:
+                errors.append(f"{item} is in partitions {indices}")
+        for item in expected or []:
+            if item not in owners:
+                errors.append(f"{item} is not in any partition")
+
+    for root, manifest in zip(partition_roots, manifests):
+        for calendar_name in manifest["calendars"]:
+            for lang in ("ja", "en"):
+                for extension in manifest["formats"]:
+                    path = f"{lang}/{calendar_name}.{extension}"
+                    if path not in manifest["files"]:
+                        errors.append(f"{root}: {path} is missing")
+        for path, file_hash in manifest["files"].items():
+            full_path = f"{root}/{path}"
+            if not os.path.isfile(full_path) or get_file_hash(full_path) != file_hash:
+                errors.append(f"{root}: {path} is missing or modified")
+
+    return errors
+
+
+def merge_partitions(partition_roots: list[str], output_root: str) -> None:
+    """
+    Copy the files of the partitions to the output root. Directories owned
+    by a partition are replaced as a whole, so removed files don't remain.
+    """
+    for root in partition_roots:
+        manifest = load_partition_manifest(root)
+        for directory in manifest["directories"]:
+            shutil.rmtree(f"{output_root}/{directory}", ignore_errors=True)
+        for path in manifest["files"]:
+            destination = f"{output_root}/{path}"
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            shutil.copyfile(f"{root}/{path}", destination)
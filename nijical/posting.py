@@ -0,0 +1,481 @@
+import hashlib
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Protocol
+
+API_URL = "https://api.twitter.com/2/tweets"
+
+
+def create_oauth_header(auth, method: str, url: str, body: str = None):
+    """
+    Create OAuth 1.0a authorization header.
+
+    Args:
+        auth: OAuth1 instance
+        method: HTTP method
+        url: Request URL
+        body: Optional request body
+
+    Returns:
+        str: Authorization header value
+    """
+    from requests import Request
+
+    headers = {"Content-Type": "application/json"} if body else {}
+    body_bytes = body.encode("utf-8") if body else None
+    req = Request(method, url, data=body_bytes, headers=headers)
+    prepared = req.prepare()
+    auth(prepared)
+
+    # Convert bytes to string if needed
+    auth_value = prepared.headers.get("Authorization", "")
+    if isinstance(auth_value, bytes):
+        return auth_value.decode("utf-8")
+    return str(auth_value)
+
+
+@dataclass(frozen=True)
+class PostResponse:
+    status: int
+    # Header names are lowercase
+    headers: dict[str, str] = field(default_factory=dict)
+    text: str = ""
+
+    def json(self) -> dict:
+        return json.loads(self.text)
+
+
+class Transport(Protocol):
+    def post(self, auth, text: str) -> PostResponse:
+        """
+        Send a POST /2/tweets request and return the response as it is.
+        """
+        ...
+
+
+def is_cloudflare_challenge(response: PostResponse) -> bool:
+    """
+    Whether the response is a Cloudflare challenge page instead of the API.
+
+    Cloudflare marks challenges with cf-mitigated; older challenge pages are
+    detected by an HTML body from Cloudflare, which the API never returns.
+    """
+    if response.headers.get("cf-mitigated") == "challenge":
+        return True
+    if response.status not in (403, 429, 503):
+        return False
+    content_type = response.headers.get("content-type", "")
+    return "text/html" in content_type and "cf-ray" in response.headers
+
+
+class PostingError(Exception):
+    pass
+
+
+class PostingTimeout(PostingError):
+    """
+    The post may have been sent but no response came: a read timeout or a
+    connection closed after the request was sent.
+
+    The tweet may have been created, so the post is not retried; posting it
+    again would create a duplicate or fail as duplicate content.
+    """
+
+
+class HttpTransport:
+    """
+    Post with a pooled requests.Session signed with OAuth1.
+
+    If Cloudflare answers with a challenge, the request and all the
+    following ones are sent with the fallback transport instead. Errors
+    while connecting, before any of the request is sent, are raised as they
+    are and can be retried; a read timeout and every other connection error
+    raise PostingTimeout.
+    """
+
+    url: str
+    fallback: Transport | None
+
+    def __init__(
+        self, fallback: Transport | None = None, url: str = API_URL, session=None
+    ) -> None:
+        import requests
+
+        self.url = url
+        self.fallback = fallback
+        self.session = session if session is not None else requests.Session()
+        self.is_challenged = False
+
+    def __enter__(self) -> "HttpTransport":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.session.close()
+        if self.fallback is not None and hasattr(self.fallback, "close"):
+            self.fallback.close()
+
+    def post(self, auth, text: str) -> PostResponse:
+        if self.is_challenged:
+            return self.fallback.post(auth, text)
+
+        from requests.exceptions import ConnectionError, ConnectTimeout, ReadTimeout
+
+        try:
+            response = self.session.post(
+                self.url, json={"text": text}, auth=auth, timeout=30
+            )
+        except ConnectTimeout:
+            raise
+        except (ConnectionError, ReadTimeout) as error:
+            if self.is_before_sending(error):
+                raise
+            raise PostingTimeout(
+                f"No response to the post, it may have been created: {error}"
+            ) from error
+        headers = {name.lower(): value for name, value in response.headers.items()}
+        result = PostResponse(response.status_code, headers, response.text)
+
+        if self.fallback is not None and is_cloudflare_challenge(result):
+            cf_ray = headers.get("cf-ray", "N/A")
+            print(f"⚠️  Cloudflare challenge (cf-ray: {cf_ray}), using Playwright")
+            self.is_challenged = True
+            return self.fallback.post(auth, text)
+
+        return result
+
+    def is_before_sending(self, error: Exception) -> bool:
+        """
+        Whether the connection failed before any of the request was sent.
+
+        A refused connection or a failed name lookup is wrapped in
+        MaxRetryError by urllib3; a connection closed while the request was
+        sent or the response was read ("Connection aborted") is not.
+        """
+        from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+        reason = error.args[0] if error.args else None
+        return isinstance(reason, MaxRetryError) and isinstance(
+            reason.reason, NewConnectionError
+        )
+
+
+class PlaywrightTransport:
+    """
+    Post through a real browser context to get through Cloudflare protection.
+
+    The browser is launched on the first post unless it is given, and
+    Chromium is installed then if it is not installed yet. Errors of the
+    browser raise PostingError.
+    """
+
+    user_agent = (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+        "(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+    )
+
+    def __init__(self, browser=None, url: str = API_URL) -> None:
+        self.browser = browser
+        self.url = url
+        self.playwright = None
+
+    def close(self) -> None:
+        if self.playwright is not None:
+            self.browser.close()
+            self.playwright.stop()
+            self.browser = None
+            self.playwright = None
+
+    def get_browser(self):
+        if self.browser is not None:
+            return self.browser
+
+        from playwright.sync_api import Error, sync_playwright
+
+        self.playwright = sync_playwright().start()
+        try:
+            self.browser = self.playwright.chromium.launch(headless=True)
+        except Error:
+            print("Installing Chromium for Playwright")
+            command = ["playwright", "install", "--with-deps", "chromium"]
+            subprocess.run([sys.executable, "-m", *command], check=True)
+            self.browser = self.playwright.chromium.launch(headless=True)
+        return self.browser
+
+    def post(self, auth, text: str) -> PostResponse:
+        from playwright.sync_api import Error
+
+        try:
+            return self._post(auth, text)
+        except (Error, subprocess.CalledProcessError) as error:
+            # The request may have been sent, so it is not retried
+            raise PostingError(
+                f"Failed to post through the browser: {error}"
+            ) from error
+
+    def _post(self, auth, text: str) -> PostResponse:
+        context = self.get_browser().new_context(user_agent=self.user_agent)
+        try:
+            body_str = json.dumps({"text": text})
+            headers = {
+                "Authorization": create_oauth_header(auth, "POST", self.url, body_str),
+                "Content-Type": "application/json",
+            }
+
+            page = context.new_page()
+            response = page.request.post(self.url, data=body_str, headers=headers)
+
+            # Check for Cloudflare in response headers (both success and failure)
+            response_headers = {
+                name.lower(): value for name, value in response.headers.items()
+            }
+            if "cf-ray" in response_headers or "cf-cache-status" in response_headers:
+                if response.status == 201:
+                    print("✅ Cloudflare challenge passed successfully")
+                else:
+                    print("⚠️  Cloudflare detected but request failed")
+                print(f"cf-ray: {response_headers.get('cf-ray', 'N/A')}")
+                cache_status = response_headers.get("cf-cache-status", "N/A")
+                print(f"cf-cache-status: {cache_status}")
+
+            return PostResponse(response.status, response_headers, response.text())
+        finally:
+            context.close()
+
+
+class TokenBucket:
+    """
+    Pace the posts: `capacity` posts at once, then one post per 1 / `rate`
+    seconds. The rate limit headers of the responses drain the bucket when
+    the server has fewer requests left than the bucket thinks.
+    """
+
+    capacity: float
+    rate: float
+
+    def __init__(
+        self, capacity: float, rate: float, clock: Callable[[], float] = time.time
+    ) -> None:
+        self.capacity = capacity
+        self.rate = rate
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        # Time until which no request should be sent
+        self.blocked_until = 0.0
+
+    def get_wait(self) -> float:
+        """
+        Take a token and get the seconds to wait before using it.
+        """
+        now = self.clock()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated) * self.rate
+        )
+        self.updated = now
+
+        self.tokens -= 1
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        return max(wait, self.blocked_until - now)
+
+    def update(self, remaining: int | None, reset: float | None) -> None:
+        """
+        Apply x-rate-limit-remaining and x-rate-limit-reset of a response.
+        """
+        if remaining is None:
+            return
+
+        self.tokens = min(self.tokens, remaining)
+        if remaining <= 0 and reset is not None:
+            self.block_until(reset)
+
+    def block_until(self, until: float) -> None:
+        self.blocked_until = max(self.blocked_until, until)
+
+
+class PostingState:
+    """
+    Tweet IDs of the posted threads, saved after every post so that a failed
+    run can resume a thread without posting the same tweets again.
+
+    Each thread stores the hashes of its texts; posted tweets are skipped
+    only while the texts are the same as the ones posted before.
+    """
+
+    path: str | None
+
+    def __init__(self, path: str | None) -> None:
+        self.path = path
+        self._threads: dict[str, dict[str, list[str]]] = {}
+
+        if path is not None and os.path.isfile(path):
+            with open(path, encoding="utf_8") as file:
+                self._threads = json.load(file)
+
+    def get_posted_ids(self, key: str, texts: list[str]) -> list[str]:
+        thread = self._threads.get(key, {"hashes": [], "ids": []})
+        ids: list[str] = []
+        for text, text_hash, tweet_id in zip(texts, thread["hashes"], thread["ids"]):
+            if self.get_hash(text) != text_hash:
+                break
+            ids.append(tweet_id)
+        return ids
+
+    def add(self, key: str, texts: list[str], ids: list[str]) -> None:
+        self._threads[key] = {
+            "hashes": [self.get_hash(text) for text in texts[: len(ids)]],
+            "ids": ids,
+        }
+        self.save()
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+
+        # Write to a temporary file not to break the state on interruption
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, mode="w", encoding="utf_8") as file:
+            json.dump(self._threads, file, indent=2)
+            file.write("\n")
+        os.replace(temp_path, self.path)
+
+    def get_hash(self, text: str) -> str:
+        return hashlib.sha256(text.encode("utf_8")).hexdigest()[:16]
+
+
+class PostingScheduler:
+    """
+    Post the tweets of threads with pacing, retries and resumption.
+
+    Posts are paced with a token bucket which follows x-rate-limit-remaining
+    and x-rate-limit-reset. 429 waits until the reset time, and 429 without
+    the header, 5xx and connection errors before sending are retried with
+    jittered exponential backoff. Other errors stop the thread, and the posted tweets
+    are kept in the state so that the next run resumes after them. A
+    PostingTimeout of the transport is not retried, because the tweet may
+    have been created.
+    """
+
+    transport: Transport
+    state: PostingState
+    bucket: TokenBucket
+    max_retries: int
+    base_delay: float
+    max_delay: float
+    reset_jitter: float
+
+    def __init__(
+        self,
+        transport: Transport,
+        state: PostingState | None = None,
+        bucket: TokenBucket | None = None,
+        max_retries: int = 5,
+        base_delay: float = 2.0,
+        max_delay: float = 900.0,
+        reset_jitter: float = 5.0,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.transport = transport
+        self.state = state if state is not None else PostingState(None)
+        self.bucket = bucket if bucket is not None else TokenBucket(3, 0.5, clock)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.reset_jitter = reset_jitter
+        self.sleep = sleep
+        self.clock = clock
+
+    def post_thread(self, key: str, auth, texts: list[str]) -> list[str]:
+        """
+        Post the tweets which are not posted yet.
+
+        Args:
+            key: Key of the thread in the state, e.g. "ja:2025-01-01"
+            auth: OAuth1 authentication of the account
+            texts: Texts of the tweets in order
+
+        Returns:
+            IDs of all the tweets of the thread
+
+        Raises:
+            PostingError: If a tweet can't be posted; the rest is not posted
+        """
+        ids = self.state.get_posted_ids(key, texts)
+        if ids:
+            print(f"Resuming {key} after {len(ids)} posted tweet(s)", file=sys.stderr)
+
+        for text in texts[len(ids) :]:
+            ids.append(self.post(auth, text))
+            self.state.add(key, texts, ids)
+
+        return ids
+
+    def post(self, auth, text: str) -> str:
+        attempt = 0
+        while True:
+            wait = self.bucket.get_wait()
+            if wait > 0:
+                self.sleep(wait)
+
+            try:
+                response = self.transport.post(auth, text)
+            except (OSError, ConnectionError) as error:
+                # Network errors: retry with backoff
+                response = None
+                reason = str(error)
+
+            if response is not None:
+                remaining = self.get_header_number(response, "x-rate-limit-remaining")
+                reset = self.get_header_number(response, "x-rate-limit-reset")
+                self.bucket.update(remaining, reset)
+
+                if response.status == 201:
+                    return self.get_tweet_id(response)
+
+                reason = f"Status: {response.status}, Response: {response.text}"
+                if response.status != 429 and response.status < 500:
+                    raise PostingError(f"Failed to create tweet: {reason}")
+
+                if response.status == 429 and reset is not None:
+                    # Wait for the reset with some jitter not to hit it exactly
+                    jitter = random.uniform(0, self.reset_jitter)
+                    self.bucket.block_until(reset + jitter)
+
+            attempt += 1
+            if attempt > self.max_retries:
+                raise PostingError(f"Failed to create tweet: {reason}")
+
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+            # Full jitter
+            delay = random.uniform(0, delay)
+            print(
+                f"Retrying in {delay:.1f} s ({attempt}/{self.max_retries}): {reason}",
+                file=sys.stderr,
+            )
+            self.bucket.block_until(self.clock() + delay)
+
+    def get_tweet_id(self, response: PostResponse) -> str:
+        try:
+            return str(response.json()["data"]["id"])
+        except (ValueError, KeyError, TypeError) as error:
+            # The tweet was created, so the post is not retried
+            raise PostingError(
+                f"Tweet created without an ID in the response: {response.text}"
+            ) from error
+
+    def get_header_number(self, response: PostResponse, name: str) -> int | None:
+        value = response.headers.get(name)
+        if value is None:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            return None
@@ -0,0 +1,113 @@
+import argparse
+import cProfile
+import io
+import os
+import pstats
+import sys
+import tracemalloc
+
+
+class Profiler:
+    """
+    Profile the code in the `with` block and write the results.
+
+    `<output>.prof` is the raw cProfile data for snakeviz or pstats, and
+    `<output>.txt` is a report of the top functions by cumulative and own
+    time, the callers of the hot paths, and with `memory`, the peak memory
+    and the top allocation sites of tracemalloc.
+
+    Nothing is done if `output` is None, so the scripts can always wrap their
+    workload with it.
+    """
+
+    # Functions which are usually the hot paths of the generation
+    hot_paths = [r"generate_ical", r"arrow/api\.py.*\(get\)", r"has_talent"]
+
+    output: str | None
+    memory: bool
+    top: int
+
+    def __init__(self, output: str | None, memory: bool = False, top: int = 30):
+        self.output = output
+        self.memory = memory
+        self.top = top
+        self._profile: cProfile.Profile | None = None
+
+    @staticmethod
+    def add_arguments(parser: argparse.ArgumentParser) -> None:
+        parser.add_argument(
+            "--profile",
+            metavar="OUTPUT",
+            help="write cProfile results to OUTPUT.prof and OUTPUT.txt",
+        )
+        parser.add_argument(
+            "--profile-memory",
+            action="store_true",
+            help="also trace memory allocations with tracemalloc",
+        )
+
+    @classmethod
+    def from_args(cls, args: argparse.Namespace) -> "Profiler":
+        return cls(args.profile, memory=args.profile_memory)
+
+    def __enter__(self) -> "Profiler":
+        if self.output is None:
+            return self
+
+        if self.memory:
+            tracemalloc.start()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *args) -> None:
+        if self._profile is None:
+            return
+
+        self._profile.disable()
+        snapshot = None
+        peak = 0
+        if self.memory:
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+        directory = os.path.dirname(self.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._profile.dump_stats(f"{self.output}.prof")
+        with open(f"{self.output}.txt", mode="w", encoding="utf_8") as file:
+            file.write(self.generate_report(self._profile, snapshot, peak))
+
+        print(f"Wrote profile to {self.output}.prof and .txt", file=sys.stderr)
+        self._profile = None
+
+    def generate_report(
+        self,
+        profile: cProfile.Profile,
+        snapshot: tracemalloc.Snapshot | None,
+        peak: int,
+    ) -> str:
+        stream = io.StringIO()
+        stats = pstats.Stats(profile, stream=stream).strip_dirs()
+
+        stream.write(f"Top {self.top} functions by cumulative time\n")
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+
+        stream.write(f"Top {self.top} functions by own time\n")
+        stats.sort_stats(pstats.SortKey.TIME).print_stats(self.top)
+
+        # Keep the directories to match the module of arrow.get
+        full_stats = pstats.Stats(profile, stream=stream)
+        full_stats.sort_stats(pstats.SortKey.CUMULATIVE)
+        for pattern in self.hot_paths:
+            stream.write(f"Callers of {pattern}\n")
+            full_stats.print_callers(pattern)
+
+        if snapshot is not None:
+            stream.write(f"Peak memory: {peak / 1024 / 1024:.1f} MiB\n\n")
+            stream.write(f"Top {self.top} allocation sites\n")
+            for stat in snapshot.statistics("lineno")[: self.top]:
+                stream.write(f"{stat}\n")
+
+        return stream.getvalue()
@@ -0,0 +1,161 @@
+import arrow
+import json
+import os
+import unicodedata
+from datetime import timedelta
+from .event import Event
+from .talent import Talent
+
+
+class SearchIndex:
+    """
+    Write a prebuilt bigram index for searching talents and events on the web.
+
+    `<root>/talents.json` has the talent documents and their bigrams.
+    For events, `<root>/events.json` has the searchable texts, and the postings
+    are split into `<root>/events-NN.json` buckets by the hash of the bigram,
+    so a query only loads the buckets of its bigrams. The texts include both
+    languages, and only the documents to display are written per language
+    to `<root>/<lang>/events.json`.
+    """
+
+    bucket_count = 16
+
+    root: str
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+
+    def write(self, talents: dict[str, Talent], events: list[Event]) -> None:
+        talent_list = [
+            talent for talent in talents.values() if not talent.is_organization
+        ]
+        talent_ids = {talent.name: idx for idx, talent in enumerate(talent_list)}
+
+        # talents
+        docs = []
+        texts = []
+        for talent in talent_list:
+            docs.append(
+                [
+                    talent.name,
+                    talent.eng_name,
+                    talent.furigana,
+                    talent.eng_name.lower().replace(" ", "_"),
+                    talent.first_tweet_datetime.isoformat(),
+                    talent.graduation_date.isoformat()
+                    if talent.graduation_date is not None
+                    else None,
+                ]
+            )
+            texts.append(
+                self.normalize(f"{talent.name} {talent.eng_name} {talent.furigana}")
+            )
+
+        os.makedirs(self.root, exist_ok=True)
+        self._write_json(
+            f"{self.root}/talents.json",
+            {"docs": docs, "texts": texts, "grams": self.generate_postings(texts)},
+        )
+
+        # events
+        texts = []
+        for event in events:
+            names = " ".join(
+                f"{talent.name} {talent.eng_name} {talent.furigana}"
+                for talent in event.talents
+            )
+            texts.append(
+                self.normalize(
+                    " ".join(
+                        value
+                        for value in (
+                            event.summary,
+                            event.eng_summary,
+                            event.hashtag,
+                            event.location,
+                            event.eng_location,
+                            names,
+                        )
+                        if type(value) is str
+                    )
+                )
+            )
+        self._write_json(
+            f"{self.root}/events.json", {"texts": texts, "buckets": self.bucket_count}
+        )
+
+        buckets: list[dict[str, list[int]]] = [{} for _ in range(self.bucket_count)]
+        for gram, ids in self.generate_postings(texts).items():
+            buckets[self.get_bucket(gram)][gram] = ids
+        for idx, bucket in enumerate(buckets):
+            self._write_json(f"{self.root}/events-{idx:02d}.json", bucket)
+
+        for lang, is_english in (("ja", False), ("en", True)):
+            docs = []
+            for event in events:
+                location = event.eng_location if is_english else event.location
+                docs.append(
+                    [
+                        event.uid,
+                        event.eng_summary if is_english else event.summary,
+                        self.format_date(event.begin, event.all_day),
+                        self.format_date(self.get_end(event), event.all_day),
+                        event.all_day,
+                        event.yearly,
+                        location if type(location) is str else "",
+                        [
+                            talent_ids[talent.name]
+                            for talent in event.talents
+                            if talent.name in talent_ids
+                        ],
+                        any(talent.is_organization for talent in event.talents),
+                    ]
+                )
+
+            os.makedirs(f"{self.root}/{lang}", exist_ok=True)
+            self._write_json(f"{self.root}/{lang}/events.json", {"docs": docs})
+
+    def generate_postings(self, texts: list[str]) -> dict[str, list[int]]:
+        postings: dict[str, list[int]] = {}
+        for doc_id, text in enumerate(texts):
+            for gram in self.generate_grams(text):
+                postings.setdefault(gram, []).append(doc_id)
+        return postings
+
+    def generate_grams(self, text: str) -> set[str]:
+        # Queries are split by spaces, so bigrams over spaces are never used
+        return {
+            text[i : i + 2]
+            for i in range(len(text) - 1)
+            if not text[i].isspace() and not text[i + 1].isspace()
+        }
+
+    def get_bucket(self, gram: str) -> int:
+        # 32-bit FNV-1a over code points; search.js and calendar.js use the same hash
+        value = 0x811C9DC5
+        for char in gram:
+            value ^= ord(char)
+            value = (value * 0x01000193) & 0xFFFFFFFF
+        return value % self.bucket_count
+
+    def normalize(self, text: str) -> str:
+        return unicodedata.normalize("NFKC", text).lower()
+
+    def get_end(self, event: Event) -> arrow.Arrow:
+        if not event.all_day:
+            return event.end
+
+        # The end date of all-day events is exclusive, and the same as the
+        # begin date for one day events
+        days = max((event.end - event.begin).days, 1)
+        return event.begin + timedelta(days=days)
+
+    def format_date(self, date: arrow.Arrow, all_day: bool) -> str:
+        if all_day:
+            return date.format("YYYY-MM-DD")
+        return date.to("+09:00").isoformat()
+
+    def _write_json(self, path: str, data) -> None:
+        with open(path, mode="w", encoding="utf_8") as file:
+            json.dump(data, file, ensure_ascii=False, separators=(",", ":"))
@@ -0,0 +1,338 @@
+import asyncio
+import hashlib
+import os
+import re
+import signal
+import sys
+import time
+import traceback
+from collections import OrderedDict
+from typing import Callable
+from email.utils import formatdate, parsedate_to_datetime
+from .caldav import CalDavService, match_entity_tag
+from .dataset import Dataset
+from .folding import OutputProfile
+
+
+class RenderedCalendar:
+    body: bytes
+    etag: str
+    last_modified: int
+
+    def __init__(self, body: bytes, last_modified: int) -> None:
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:16] + '"'
+        self.last_modified = last_modified
+
+
+class RenderCache:
+    """
+    Bounded LRU cache of rendered calendars.
+
+    Keys include the dataset version, so entries of old data are never hit
+    and are eventually evicted.
+    """
+
+    max_size: int
+
+    def __init__(self, max_size: int) -> None:
+        self.max_size = max_size
+        self._entries: OrderedDict[tuple[str, str, str], RenderedCalendar] = (
+            OrderedDict()
+        )
+
+    def get(self, key: tuple[str, str, str]) -> RenderedCalendar | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple[str, str, str], entry: RenderedCalendar) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+class CalendarServer:
+    """
+    Serve /<lang>/<calendar>.ics by rendering calendars of a dataset on demand.
+
+    Responses have ETag and Last-Modified headers, and conditional requests
+    with If-None-Match or If-Modified-Since get 304 without the body.
+    If `caldav` is set, the calendars are also served over CalDAV under
+    /caldav/.
+
+    If `loader` is set, the dataset is loaded again on SIGHUP and, with
+    `watch_paths`, whenever one of the files changes. The old data is kept
+    if loading fails.
+    """
+
+    path_pattern = re.compile(r"^/(ja|en)/([0-9a-z_.\-]+)\.ics$")
+
+    dataset: Dataset
+    loaded_at: int
+    caldav: CalDavService | None
+    profile: OutputProfile
+    loader: Callable[[], Dataset] | None
+    watch_paths: list[str]
+
+    # Seconds between checks of the watched files
+    watch_interval = 1.0
+    # Seconds to wait for the files to stop changing
+    debounce = 0.3
+
+    def __init__(
+        self,
+        dataset: Dataset,
+        cache_size: int = 64,
+        caldav: bool = False,
+        profile: OutputProfile = OutputProfile.GOOGLE,
+        loader: Callable[[], Dataset] | None = None,
+        watch_paths: list[str] | None = None,
+    ) -> None:
+        self.dataset = dataset
+        self.profile = profile
+        self.cache = RenderCache(cache_size)
+        self.loaded_at = int(time.time())
+        self.caldav = CalDavService(dataset) if caldav else None
+        self.loader = loader
+        self.watch_paths = watch_paths or []
+        self._reload_lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+        # Renders in progress, shared by the requests of the same calendar
+        self._renders: dict[tuple[str, str, str], asyncio.Future] = {}
+
+    async def serve(self, host: str, port: int) -> None:
+        server = await asyncio.start_server(self.handle, host, port)
+        if self.loader is not None:
+            if hasattr(signal, "SIGHUP"):
+                asyncio.get_running_loop().add_signal_handler(
+                    signal.SIGHUP, lambda: self.start_task(self.reload())
+                )
+            if self.watch_paths:
+                self.start_task(self.watch())
+
+        async with server:
+            await server.serve_forever()
+
+    def start_task(self, coroutine) -> None:
+        # Keep a reference until the task is done
+        task = asyncio.create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def set_dataset(self, dataset: Dataset) -> None:
+        self.dataset = dataset
+        self.loaded_at = int(time.time())
+        self.cache.clear()
+        if self.caldav is not None:
+            self.caldav.set_dataset(dataset)
+
+    async def reload(self) -> None:
+        async with self._reload_lock:
+            # Parsing the CSV files takes a while, so don't block the clients
+            loop = asyncio.get_running_loop()
+            try:
+                dataset = await loop.run_in_executor(None, self.loader)
+            except Exception as error:
+                # Keep the last data and wait for the fix
+                print(f"Error: {error}", file=sys.stderr)
+                return
+
+            self.set_dataset(dataset)
+            print(f"Reloaded the data {dataset.version}", file=sys.stderr)
+
+    async def watch(self) -> None:
+        states = self.get_states()
+        while True:
+            await asyncio.sleep(self.watch_interval)
+            if self.get_states() == states:
+                continue
+
+            # Wait until the files stop changing (editors save in steps)
+            while True:
+                states = self.get_states()
+                await asyncio.sleep(self.debounce)
+                if states == self.get_states():
+                    break
+            await self.reload()
+
+    def get_states(self) -> list[tuple[int, int] | None]:
+        states: list[tuple[int, int] | None] = []
+        for path in self.watch_paths:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                states.append(None)
+                continue
+            states.append((stat.st_mtime_ns, stat.st_size))
+        return states
+
+    async def handle(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request_line = await reader.readline()
+            headers: dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin_1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            parts = request_line.decode("latin_1").split()
+            if len(parts) != 3:
+                await self.respond(writer, 400, "Bad Request")
+                return
+
+            method, target, _ = parts
+            path = target.split("?")[0]
+
+            if self.caldav is not None and path.startswith(CalDavService.root):
+                try:
+                    length = int(headers.get("content-length", "0"))
+                except ValueError:
+                    await self.respond(writer, 400, "Bad Request")
+                    return
+                body = await reader.readexactly(length) if length > 0 else b""
+                # Building a collection renders all of its events
+                loop = asyncio.get_running_loop()
+                response = await loop.run_in_executor(
+                    None, self.caldav.handle, method, path, headers, body
+                )
+                response_body = response.body if method != "HEAD" else b""
+                await self.respond(
+                    writer,
+                    response.status,
+                    response.reason,
+                    response.headers,
+                    response_body,
+                    len(response.body),
+                )
+                return
+
+            if method not in ("GET", "HEAD"):
+                await self.respond(
+                    writer, 405, "Method Not Allowed", {"Allow": "GET, HEAD"}
+                )
+                return
+
+            match = self.path_pattern.match(path)
+            if match is None:
+                await self.respond(writer, 404, "Not Found")
+                return
+
+            rendered = await self.render(match.group(2), match.group(1))
+            if rendered is None:
+                await self.respond(writer, 404, "Not Found")
+                return
+
+            response_headers = {
+                "ETag": rendered.etag,
+                "Last-Modified": formatdate(rendered.last_modified, usegmt=True),
+                "Cache-Control": "no-cache",
+            }
+            if self.is_not_modified(headers, rendered):
+                await self.respond(writer, 304, "Not Modified", response_headers)
+                return
+
+            response_headers["Content-Type"] = "text/calendar; charset=utf-8"
+            body = rendered.body if method == "GET" else b""
+            await self.respond(
+                writer, 200, "OK", response_headers, body, len(rendered.body)
+            )
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception:
+            traceback.print_exc()
+            try:
+                await self.respond(writer, 500, "Internal Server Error")
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def render(self, calendar_name: str, lang: str) -> RenderedCalendar | None:
+        dataset = self.dataset
+        key = (calendar_name, lang, dataset.version)
+        rendered = self.cache.get(key)
+        if rendered is not None:
+            return rendered
+
+        # Clients tend to poll at the same time; render each calendar once
+        render = self._renders.get(key)
+        if render is None:
+            render = asyncio.ensure_future(
+                self.render_calendar(dataset, calendar_name, lang)
+            )
+            self._renders[key] = render
+            render.add_done_callback(lambda _: self._renders.pop(key, None))
+
+        # A request which goes away doesn't cancel the render of the others
+        rendered = await asyncio.shield(render)
+        if rendered is not None:
+            self.cache.put(key, rendered)
+        return rendered
+
+    async def render_calendar(
+        self, dataset: Dataset, calendar_name: str, lang: str
+    ) -> RenderedCalendar | None:
+        loaded_at = self.loaded_at
+        result = dataset.get_calendar(calendar_name, is_english=(lang == "en"))
+        if result is None:
+            return None
+
+        # Rendering a large calendar takes a while, so don't block other clients
+        name, calendar = result
+        loop = asyncio.get_running_loop()
+        data = await loop.run_in_executor(
+            None,
+            lambda: calendar.generate_ical(
+                name=name, is_english=(lang == "en"), profile=self.profile
+            ),
+        )
+
+        # The latest DTSTAMP can't be used because removing an event doesn't
+        # change it, so use the time when the dataset was loaded
+        return RenderedCalendar(data.encode("utf_8"), loaded_at)
+
+    def is_not_modified(
+        self, headers: dict[str, str], rendered: RenderedCalendar
+    ) -> bool:
+        # If-None-Match takes precedence over If-Modified-Since (RFC 9110)
+        if "if-none-match" in headers:
+            return match_entity_tag(headers["if-none-match"], rendered.etag)
+
+        if "if-modified-since" in headers:
+            try:
+                since = parsedate_to_datetime(headers["if-modified-since"])
+            except (TypeError, ValueError):
+                return False
+            return rendered.last_modified <= since.timestamp()
+
+        return False
+
+    async def respond(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        reason: str,
+        headers: dict[str, str] | None = None,
+        body: bytes = b"",
+        content_length: int | None = None,
+    ) -> None:
+        lines = [f"HTTP/1.1 {status} {reason}"]
+        for name, value in (headers or {}).items():
+            lines.append(f"{name}: {value}")
+        if status != 304:
+            length = len(body) if content_length is None else content_length
+            lines.append(f"Content-Length: {length}")
+        lines.append("Connection: close")
+
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin_1") + body)
+        await writer.drain()
@@ -0,0 +1,179 @@
+import arrow
+import hashlib
+import json
+import os
+from datetime import timedelta
+from .event import Event
+from .writer import FileWriter
+
+
+class MonthShards:
+    """
+    Write per-month JSON shards of calendar events for the web viewer.
+
+    Each calendar gets `<root>/<lang>/<calendar>/index.json`, which maps
+    month keys (YYYY-MM) to the content hash of `<root>/<lang>/<calendar>/YYYY-MM.json`.
+    The viewer fetches the index first and then only the months it shows.
+    Because the hash is used as a query string, a month file can be cached
+    forever by the browser; it only changes when its events change.
+
+    The index of a frozen calendar (see ColdTier) also has the key of the
+    inputs it was generated from under "inputs".
+    """
+
+    root: str
+    horizon_year: int
+
+    def __init__(self, root: str, now: arrow.Arrow) -> None:
+        self.root = root
+        # Same range as the viewer expands recurring events: until the end of next year
+        self.horizon_year = now.year + 1
+        self._entries: dict[
+            tuple[int, bool], tuple[Event, list[tuple[str, dict]]]
+        ] = {}
+
+    def write(
+        self,
+        calendar_name: str,
+        events: list[Event],
+        writer: FileWriter,
+        inputs: str | None = None,
+    ) -> None:
+        for lang, is_english in (("ja", False), ("en", True)):
+            months: dict[str, list[dict]] = {}
+            for event in events:
+                for month, entry in self.get_entries(event, is_english):
+                    months.setdefault(month, []).append(entry)
+
+            directory = f"{self.root}/{lang}/{calendar_name}"
+            os.makedirs(directory, exist_ok=True)
+
+            index: dict[str, str] = {}
+            for month in sorted(months):
+                entries = sorted(months[month], key=lambda e: (e["start"], e["uid"]))
+                data = json.dumps(entries, ensure_ascii=False, separators=(",", ":"))
+                index[month] = hashlib.sha256(data.encode("utf_8")).hexdigest()[:12]
+                writer.write(f"{directory}/{month}.json", data)
+
+            # Remove months which don't have any events anymore. The queued
+            # files are all in the index, so they are never removed here.
+            for file_name in os.listdir(directory):
+                month = file_name.removesuffix(".json")
+                if month != "index" and month not in index:
+                    os.remove(f"{directory}/{file_name}")
+
+            data: dict = {"months": index}
+            if inputs is not None:
+                data["inputs"] = inputs
+            writer.write(
+                f"{directory}/index.json", json.dumps(data, separators=(",", ":"))
+            )
+
+    def is_frozen(self, calendar_name: str, inputs: str) -> bool:
+        """
+        Check that the shards of both languages were written from `inputs`
+        and all the month files are there.
+        """
+        for lang in ("ja", "en"):
+            directory = f"{self.root}/{lang}/{calendar_name}"
+            try:
+                with open(f"{directory}/index.json", encoding="utf_8") as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                return False
+            if data.get("inputs") != inputs:
+                return False
+            if not all(
+                os.path.isfile(f"{directory}/{month}.json") for month in data["months"]
+            ):
+                return False
+        return True
+
+    def get_entries(self, event: Event, is_english: bool) -> list[tuple[str, dict]]:
+        """
+        Get (month key, shard entry) pairs of an event.
+
+        The entries are cached because the same event appears in the all-events
+        calendar and in the calendar of every participating talent.
+        """
+        # The cached event keeps its id from being reused by another event
+        key = (id(event), is_english)
+        cached = self._entries.get(key)
+        if cached is None or cached[0] is not event:
+            cached = (event, self._generate_entries(event, is_english))
+            self._entries[key] = cached
+        return cached[1]
+
+    def _generate_entries(self, event: Event, is_english: bool) -> list[tuple[str, dict]]:
+        location = event.eng_location if is_english else event.location
+        entry = {
+            "uid": event.uid,
+            "summary": event.eng_summary if is_english else event.summary,
+            "description": event.generate_description(is_english=is_english),
+            "location": location if type(location) is str else "",
+            "url": event.url if type(event.url) is str else "",
+            "allDay": event.all_day,
+            "geo": self.parse_geo(event.geo),
+        }
+
+        if not event.all_day:
+            begin = event.begin.to("+09:00")
+            end = event.end.to("+09:00")
+            entry["start"] = begin.isoformat()
+            entry["end"] = end.isoformat()
+            return [(month, entry) for month in self.get_months(begin, end)]
+
+        # The end date of all-day events is exclusive, and DTEND is omitted
+        # when it is the same as the begin date (one day event)
+        days = max((event.end - event.begin).days, 1)
+        if not event.yearly:
+            entry["start"] = event.begin.format("YYYY-MM-DD")
+            end = event.begin + timedelta(days=days)
+            entry["end"] = end.format("YYYY-MM-DD")
+            return [(month, entry) for month in self.get_months(event.begin, end)]
+
+        # Expand yearly events as the viewer does for recurring events
+        entries: list[tuple[str, dict]] = []
+        for year in range(event.begin.year, self.horizon_year + 1):
+            try:
+                begin = event.begin.replace(year=year)
+            except ValueError:
+                # February 29 in a non-leap year
+                continue
+
+            if type(event.repeat_until) is arrow.Arrow and event.repeat_until < begin:
+                break
+
+            start = begin.format("YYYY-MM-DD")
+            occurrence = dict(entry)
+            occurrence["uid"] = f"{event.uid}-{start}"
+            occurrence["start"] = start
+            end = begin + timedelta(days=days)
+            occurrence["end"] = end.format("YYYY-MM-DD")
+            entries += [(month, occurrence) for month in self.get_months(begin, end)]
+
+        return entries
+
+    def get_months(self, begin: arrow.Arrow, end: arrow.Arrow) -> list[str]:
+        # Add a day of margin so that viewers in other time zones find
+        # events around the month boundary
+        first = begin - timedelta(days=1)
+        last = end + timedelta(days=1)
+
+        months: list[str] = []
+        year, month = first.year, first.month
+        while (year, month) <= (last.year, last.month):
+            months.append(f"{year:04d}-{month:02d}")
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return months
+
+    def parse_geo(self, geo: str | None) -> list[float] | None:
+        if type(geo) is not str:
+            return None
+
+        try:
+            lat, lng = (float(value) for value in geo.split(","))
+        except ValueError:
+            return None
+
+        return [lat, lng]
@@ -0,0 +1,499 @@
+import arrow
+import math
+import sqlite3
+from .dataset import Dataset
+from .event import Event, EventType
+from .talent import Talent
+from .ticket import Ticket
+
+# Stored in PRAGMA user_version; a database of another version is rebuilt
+SCHEMA_VERSION = 3
+TABLES = ["event_talents", "events", "tickets", "talents", "meta"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS talents (
+    id INTEGER PRIMARY KEY,
+    uid TEXT NOT NULL,
+    name TEXT NOT NULL UNIQUE,
+    eng_name TEXT NOT NULL,
+    furigana TEXT,
+    birthday TEXT,
+    birthday_label TEXT,
+    eng_birthday_label TEXT,
+    first_tweet_datetime TEXT NOT NULL,
+    first_stream_datetime TEXT NOT NULL,
+    youtube_url TEXT,
+    twitter_url TEXT,
+    twitch_url TEXT,
+    description TEXT,
+    eng_description TEXT,
+    graduation_date TEXT,
+    timestamp TEXT NOT NULL,
+    is_organization INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS tickets (
+    id INTEGER PRIMARY KEY,
+    uid TEXT NOT NULL,
+    event_uid TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    begin TEXT,
+    end TEXT,
+    summary TEXT,
+    eng_summary TEXT,
+    url TEXT
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    uid TEXT NOT NULL,
+    -- 1 for events.csv and the ticket events, 0 for the generated talent events
+    is_live INTEGER NOT NULL,
+    event_type INTEGER NOT NULL,
+    timestamp TEXT NOT NULL,
+    begin TEXT NOT NULL,
+    end TEXT NOT NULL,
+    -- UNIX time of begin and end for range queries
+    begin_at INTEGER NOT NULL,
+    end_at INTEGER NOT NULL,
+    -- MM-DD of begin for yearly events
+    month_day TEXT NOT NULL,
+    all_day INTEGER NOT NULL,
+    yearly INTEGER NOT NULL,
+    repeat_until TEXT,
+    summary TEXT,
+    eng_summary TEXT,
+    location TEXT,
+    eng_location TEXT,
+    geo TEXT,
+    description TEXT,
+    eng_description TEXT,
+    url TEXT,
+    hashtag TEXT,
+    sequence INTEGER NOT NULL,
+    -- Comma-separated text columns which were NaN (empty cells) instead of
+    -- None; both are stored as NULL
+    nan_columns TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS event_talents (
+    event_id INTEGER NOT NULL REFERENCES events (id),
+    talent_id INTEGER NOT NULL REFERENCES talents (id),
+    position INTEGER NOT NULL,
+    PRIMARY KEY (event_id, position)
+);
+CREATE INDEX IF NOT EXISTS events_uid ON events (uid);
+CREATE INDEX IF NOT EXISTS events_begin ON events (begin_at);
+CREATE INDEX IF NOT EXISTS events_end ON events (end_at);
+CREATE INDEX IF NOT EXISTS events_month_day ON events (month_day);
+CREATE INDEX IF NOT EXISTS event_talents_talent ON event_talents (talent_id);
+CREATE INDEX IF NOT EXISTS tickets_event_uid ON tickets (event_uid);
+"""
+
+
+class EventStore:
+    """
+    SQLite store of the talents, tickets and events including the generated
+    ones.
+
+    The CSV files are parsed once and imported, then events of a talent or a
+    date are looked up with the indexes instead of loops over all events.
+    The database can also be opened with the sqlite3 command for ad-hoc
+    queries.
+
+    The store is used for the daily tweets and ad-hoc queries; the calendars
+    are still generated from the CSV files by NijiCal.generate_all.
+    """
+
+    path: str
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            # The content is imported from the CSV files, so just drop it
+            for table in TABLES:
+                self.connection.execute(f"DROP TABLE IF EXISTS {table}")
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self.connection.executescript(SCHEMA)
+        self._talents: dict[int, Talent] | None = None
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "EventStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def import_dataset(self, dataset: Dataset) -> None:
+        """
+        Replace the content of the store with the dataset.
+        """
+        with self.connection:
+            cursor = self.connection.cursor()
+            for table in TABLES:
+                cursor.execute(f"DELETE FROM {table}")
+
+            cursor.execute(
+                "INSERT INTO meta (key, value) VALUES ('version', ?)",
+                (dataset.version,),
+            )
+
+            talent_ids: dict[str, int] = {}
+            for talent in dataset.talents.values():
+                cursor.execute(
+                    "INSERT INTO talents (uid, name, eng_name, furigana, birthday, "
+                    "birthday_label, eng_birthday_label, first_tweet_datetime, "
+                    "first_stream_datetime, youtube_url, twitter_url, twitch_url, "
+                    "description, eng_description, graduation_date, timestamp, "
+                    "is_organization) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        talent.uid,
+                        talent.name,
+                        talent.eng_name,
+                        self.to_text(talent.furigana),
+                        self.to_text(talent.birthday),
+                        self.to_text(talent.birthday_label),
+                        self.to_text(talent.eng_birthday_label),
+                        self.to_text(talent.first_tweet_datetime),
+                        self.to_text(talent.first_stream_datetime),
+                        self.to_text(talent.youtube_url),
+                        self.to_text(talent.twitter_url),
+                        self.to_text(talent.twitch_url),
+                        self.to_text(talent.description),
+                        self.to_text(talent.eng_description),
+                        self.to_text(talent.graduation_date),
+                        self.to_text(talent.timestamp),
+                        talent.is_organization,
+                    ),
+                )
+                talent_ids[talent.name] = cursor.lastrowid
+
+            # Rows sharing a UID share the tickets, so they are inserted once
+            # per event UID
+            tickets: dict[str, list[Ticket]] = {}
+            for is_live, events in [
+                (True, dataset.live_events),
+                (False, dataset.talent_events),
+            ]:
+                for event in events:
+                    self.insert_event(cursor, event, is_live, talent_ids)
+                    # Only the events of events.csv have tickets
+                    if event.event_type == EventType.EVENT:
+                        tickets.setdefault(event.uid, event.tickets)
+
+            cursor.executemany(
+                "INSERT INTO tickets (uid, event_uid, timestamp, begin, end, "
+                "summary, eng_summary, url) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        ticket.uid,
+                        ticket.event_uid,
+                        self.to_text(ticket.timestamp),
+                        self.to_text(ticket.begin),
+                        self.to_text(ticket.end),
+                        self.to_text(ticket.summary),
+                        self.to_text(ticket.eng_summary),
+                        self.to_text(ticket.url),
+                    )
+                    for event_tickets in tickets.values()
+                    for ticket in event_tickets
+                ],
+            )
+
+        self._talents = None
+
+    def insert_event(
+        self,
+        cursor: sqlite3.Cursor,
+        event: Event,
+        is_live: bool,
+        talent_ids: dict[str, int],
+    ) -> None:
+        cursor.execute(
+            "INSERT INTO events (uid, is_live, event_type, timestamp, begin, end, "
+            "begin_at, end_at, month_day, all_day, yearly, repeat_until, summary, "
+            "eng_summary, location, eng_location, geo, description, "
+            "eng_description, url, hashtag, sequence, nan_columns) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, "
+            "?)",
+            (
+                event.uid,
+                is_live,
+                event.event_type.value,
+                self.to_text(event.timestamp),
+                self.to_text(event.begin),
+                self.to_text(event.end),
+                int(event.begin.timestamp()),
+                int(event.end.timestamp()),
+                event.begin.format("MM-DD"),
+                event.all_day,
+                event.yearly,
+                self.to_text(event.repeat_until),
+                self.to_text(event.summary),
+                self.to_text(event.eng_summary),
+                self.to_text(event.location),
+                self.to_text(event.eng_location),
+                self.to_text(event.geo),
+                self.to_text(event.description),
+                self.to_text(event.eng_description),
+                self.to_text(event.url),
+                self.to_text(event.hashtag),
+                event.sequence,
+                self.get_nan_columns(
+                    summary=event.summary,
+                    eng_summary=event.eng_summary,
+                    location=event.location,
+                    eng_location=event.eng_location,
+                    geo=event.geo,
+                    description=event.description,
+                    eng_description=event.eng_description,
+                    url=event.url,
+                    hashtag=event.hashtag,
+                ),
+            ),
+        )
+        event_id = cursor.lastrowid
+
+        cursor.executemany(
+            "INSERT INTO event_talents (event_id, talent_id, position) "
+            "VALUES (?, ?, ?)",
+            [
+                (event_id, talent_ids[talent.name], position)
+                for position, talent in enumerate(event.talents)
+            ],
+        )
+
+    def load_dataset(self) -> Dataset:
+        """
+        Load the whole dataset in the same order as it was imported.
+        """
+        version = self.connection.execute(
+            "SELECT value FROM meta WHERE key = 'version'"
+        ).fetchone()
+        talents = {talent.name: talent for talent in self.get_talents().values()}
+        return Dataset(
+            talents=talents,
+            live_events=self.query_events("events.is_live = 1", ()),
+            talent_events=self.query_events("events.is_live = 0", ()),
+            version=version[0] if version is not None else "",
+        )
+
+    def get_talent_events(
+        self,
+        talent_name: str,
+        begin: arrow.Arrow | None = None,
+        end: arrow.Arrow | None = None,
+    ) -> list[Event]:
+        """
+        Get the events of the talent which occur in the period.
+
+        Args:
+            talent_name: Name of the talent
+            begin: Beginning of the period, or None for no limit
+            end: End of the period (exclusive), or None for no limit
+
+        Returns:
+            Events of the talent in the order of the calendar
+        """
+        condition = (
+            "events.id IN (SELECT event_id FROM event_talents "
+            "JOIN talents ON talents.id = event_talents.talent_id "
+            "WHERE talents.name = ?)"
+        )
+        params: list = [talent_name]
+        if end is not None:
+            condition += " AND events.begin_at < ?"
+            params.append(int(end.timestamp()))
+        if begin is not None:
+            # Yearly events repeat after the beginning until repeat_until
+            condition += " AND (events.end_at >= ? OR events.yearly = 1)"
+            params.append(int(begin.timestamp()))
+
+        events = self.query_events(condition, tuple(params))
+        if begin is None:
+            return events
+        return [
+            event
+            for event in events
+            if type(event.repeat_until) is not arrow.Arrow
+            or event.repeat_until >= begin
+        ]
+
+    def get_events_for_date(
+        self, date: arrow.Arrow
+    ) -> tuple[list[Event], list[Event]]:
+        """
+        Get candidates of the events on the date.
+
+        The result can have events which are not on the date; filter them
+        with NijiCal.check_event_date.
+
+        Returns:
+            Tuple of the live events and the talent events
+        """
+        tzinfo = "+09:00"
+        date_begin = arrow.get(date.year, date.month, date.day, tzinfo=tzinfo)
+        condition = (
+            "events.month_day = ? OR (events.begin_at <= ? AND events.end_at >= ?)"
+        )
+        params = (
+            date.format("MM-DD"),
+            int(date_begin.shift(days=1).timestamp()),
+            int(date_begin.timestamp()),
+        )
+        return (
+            self.query_events(f"events.is_live = 1 AND ({condition})", params),
+            self.query_events(f"events.is_live = 0 AND ({condition})", params),
+        )
+
+    def get_talents(self) -> dict[int, Talent]:
+        if self._talents is not None:
+            return self._talents
+
+        talents: dict[int, Talent] = {}
+        for row in self.connection.execute(
+            "SELECT id, uid, name, eng_name, furigana, birthday, birthday_label, "
+            "eng_birthday_label, first_tweet_datetime, first_stream_datetime, "
+            "youtube_url, twitter_url, twitch_url, description, eng_description, "
+            "graduation_date, timestamp, is_organization FROM talents ORDER BY id"
+        ):
+            talents[row[0]] = Talent(
+                uid=row[1],
+                name=row[2],
+                eng_name=row[3],
+                furigana=self.to_cell(row[4]),
+                birthday=self.to_arrow(row[5]),
+                birthday_label=self.to_cell(row[6]),
+                eng_birthday_label=self.to_cell(row[7]),
+                first_tweet_datetime=self.to_arrow(row[8]),
+                first_stream_datetime=self.to_arrow(row[9]),
+                youtube_url=self.to_cell(row[10]),
+                twitter_url=self.to_cell(row[11]),
+                twitch_url=self.to_cell(row[12]),
+                description=self.to_cell(row[13]),
+                eng_description=self.to_cell(row[14]),
+                graduation_date=self.to_arrow(row[15]),
+                timestamp=self.to_arrow(row[16]),
+                is_organization=bool(row[17]),
+            )
+        self._talents = talents
+        return talents
+
+    def get_tickets(self, event_uids: set[str]) -> dict[str, list[Ticket]]:
+        tickets: dict[str, list[Ticket]] = {}
+        if not event_uids:
+            return tickets
+
+        placeholders = ", ".join("?" * len(event_uids))
+        for row in self.connection.execute(
+            "SELECT uid, timestamp, event_uid, begin, end, summary, eng_summary, "
+            f"url FROM tickets WHERE event_uid IN ({placeholders}) ORDER BY id",
+            tuple(event_uids),
+        ):
+            tickets.setdefault(row[2], []).append(
+                Ticket(
+                    uid=row[0],
+                    timestamp=self.to_arrow(row[1]),
+                    event_uid=row[2],
+                    begin=self.to_arrow(row[3]),
+                    end=self.to_arrow(row[4]),
+                    summary=self.to_cell(row[5]),
+                    eng_summary=self.to_cell(row[6]),
+                    url=self.to_cell(row[7]),
+                )
+            )
+        return tickets
+
+    def query_events(self, condition: str, params: tuple) -> list[Event]:
+        talents = self.get_talents()
+        rows = self.connection.execute(
+            "SELECT id, uid, event_type, timestamp, begin, end, all_day, yearly, "
+            "repeat_until, summary, eng_summary, location, eng_location, geo, "
+            "description, eng_description, url, hashtag, sequence, nan_columns "
+            f"FROM events WHERE {condition} ORDER BY id",
+            params,
+        ).fetchall()
+        event_ids = [row[0] for row in rows]
+
+        event_talents: dict[int, list[Talent]] = {}
+        # Split the IDs to stay under the limit of the number of parameters
+        for start in range(0, len(event_ids), 500):
+            chunk = event_ids[start : start + 500]
+            placeholders = ", ".join("?" * len(chunk))
+            for event_id, talent_id in self.connection.execute(
+                "SELECT event_id, talent_id FROM event_talents "
+                f"WHERE event_id IN ({placeholders}) ORDER BY event_id, position",
+                chunk,
+            ):
+                event_talents.setdefault(event_id, []).append(talents[talent_id])
+
+        tickets = self.get_tickets(
+            {row[1] for row in rows if row[2] == EventType.EVENT.value}
+        )
+
+        events: list[Event] = []
+        for row in rows:
+            event_type = EventType(row[2])
+            nan_columns = set(row[19].split(","))
+            events.append(
+                Event(
+                    uid=row[1],
+                    timestamp=self.to_arrow(row[3]),
+                    begin=self.to_arrow(row[4]),
+                    end=self.to_arrow(row[5]),
+                    all_day=bool(row[6]),
+                    yearly=bool(row[7]),
+                    repeat_until=self.to_arrow(row[8]),
+                    summary=self.to_cell(row[9], "summary" in nan_columns),
+                    eng_summary=self.to_cell(row[10], "eng_summary" in nan_columns),
+                    location=self.to_cell(row[11], "location" in nan_columns),
+                    eng_location=self.to_cell(row[12], "eng_location" in nan_columns),
+                    geo=self.to_cell(row[13], "geo" in nan_columns),
+                    description=self.to_cell(row[14], "description" in nan_columns),
+                    eng_description=self.to_cell(
+                        row[15], "eng_description" in nan_columns
+                    ),
+                    url=self.to_cell(row[16], "url" in nan_columns),
+                    hashtag=self.to_cell(row[17], "hashtag" in nan_columns),
+                    talents=event_talents.get(row[0], []),
+                    tickets=tickets.get(row[1], [])
+                    if event_type == EventType.EVENT
+                    else [],
+                    event_type=event_type,
+                    sequence=row[18],
+                )
+            )
+        return events
+
+    def to_text(self, value) -> str | None:
+        # Empty cells are NaN in pandas; store them as NULL
+        if type(value) is arrow.Arrow:
+            return value.isoformat()
+        if type(value) is str:
+            return value
+        return None
+
+    def get_nan_columns(self, **values) -> str:
+        return ",".join(
+            name
+            for name, value in values.items()
+            if type(value) is float and math.isnan(value)
+        )
+
+    def to_cell(self, value: str | None, is_nan: bool = True) -> str | float | None:
+        # Keep NaN as parsed from the CSV files, e.g. "YouTube: nan" in
+        # descriptions and "nan" in X-TITLE of events without a location
+        if value is None and is_nan:
+            return math.nan
+        return value
+
+    def to_arrow(self, value: str | None) -> arrow.Arrow | None:
+        if value is None:
+            return None
+        return arrow.get(value)
@@ -20,3 +20,6 @@ class Talent:
     eng_description: str
     graduation_date: arrow.Arrow | None
     timestamp: arrow.Arrow
+    # Pseudo-talent of the whole organization, e.g. "にじさんじ"; the events
+    # of it are shown in the calendars of all the talents
+    is_organization: bool = False
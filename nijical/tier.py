@@ -0,0 +1,87 @@
+import arrow
+import hashlib
+import json
+import os
+from .event import Event
+from .export import ExportFormat
+from .folding import OutputProfile
+from .shard import MonthShards
+from .talent import Talent
+
+# Change when the rendering changes in a way the event stamps don't show
+COLD_TIER_VERSION = 1
+
+
+class ColdTier:
+    """
+    Keep the calendars of graduated talents as they are while their inputs
+    don't change.
+
+    The calendar of a graduated talent only changes when one of their events
+    changes: their anniversaries end at the graduation and the events of the
+    organization after it don't include them. The key of the inputs is the
+    UID, DTSTAMP and SEQUENCE of each event, which the StampManifest advances
+    whenever the content of the event changes, and the settings of the
+    output. It is kept in the index of the month shards, and a calendar whose
+    key and files are all there is not rendered nor written again.
+    """
+
+    output_root: str
+    shards: MonthShards
+    formats: list[ExportFormat]
+    url_prefix: str
+    profile: OutputProfile
+    now: arrow.Arrow
+
+    def __init__(
+        self,
+        output_root: str,
+        shards: MonthShards,
+        formats: list[ExportFormat],
+        url_prefix: str,
+        profile: OutputProfile,
+        now: arrow.Arrow,
+    ) -> None:
+        self.output_root = output_root
+        self.shards = shards
+        self.formats = formats
+        self.url_prefix = url_prefix
+        self.profile = profile
+        self.now = now
+
+    def is_cold(self, talent: Talent) -> bool:
+        return talent.graduation_date is not None and talent.graduation_date < self.now
+
+    def get_inputs(self, talent: Talent, events: list[Event]) -> str:
+        """
+        Get the key of everything the calendar of a talent is generated from.
+        """
+        inputs = [
+            COLD_TIER_VERSION,
+            talent.name,
+            talent.eng_name,
+            [export_format.value for export_format in self.formats],
+            self.url_prefix,
+            self.profile.value,
+            # Yearly events are expanded in the shards until this year
+            self.shards.horizon_year,
+            [
+                [event.uid, event.timestamp.isoformat(), event.sequence]
+                for event in events
+            ],
+        ]
+        data = json.dumps(inputs, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(data.encode("utf_8")).hexdigest()[:16]
+
+    def is_frozen(self, calendar_name: str, inputs: str) -> bool:
+        """
+        Check that the files of a calendar were generated from `inputs`.
+        """
+        for lang in ("ja", "en"):
+            for export_format in self.formats:
+                extension = export_format.value
+                if not os.path.isfile(
+                    f"{self.output_root}/{lang}/{calendar_name}.{extension}"
+                ):
+                    return False
+        return self.shards.is_frozen(calendar_name, inputs)
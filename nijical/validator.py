@@ -0,0 +1,250 @@
+import arrow
+import csv
+from dataclasses import dataclass
+from enum import Enum
+from typing import Iterator
+from .columns import EVENT_COLUMNS, TALENT_COLUMNS, TICKET_COLUMNS
+
+
+class IssueLevel(Enum):
+    # The generation fails or the calendars are broken
+    ERROR = "error"
+    # The calendars can be generated, but some data is lost or ambiguous
+    WARNING = "warning"
+
+
+@dataclass(frozen=True)
+class ValidationIssue:
+    csv_name: str
+    row: int | None
+    message: str
+    level: IssueLevel = IssueLevel.ERROR
+
+    def __str__(self) -> str:
+        location = self.csv_name if self.row is None else f"{self.csv_name}:{self.row}"
+        return f"{location}: {self.level.value}: {self.message}"
+
+
+class Validator:
+    """
+    Validate the three CSV files in one pass without generating anything.
+
+    NijiCal stops at the first problem, so a broken sheet takes one workflow
+    run per error. This reads each file once, in the order of their
+    references (talents, events, tickets), and collects every problem with
+    its row number. Row numbers are the same as the spreadsheet: the header
+    is row 1.
+    """
+
+    tzinfo = "+09:00"
+
+    talent_columns = TALENT_COLUMNS
+    event_columns = EVENT_COLUMNS
+    ticket_columns = TICKET_COLUMNS
+
+    datetime_format = "YYYY/MM/DD HH:mm"
+    timestamp_format = "YYYY/MM/DD HH:mm:ss"
+
+    talent_data_path: str
+    event_data_path: str
+    ticket_data_path: str
+    issues: list[ValidationIssue]
+
+    def __init__(
+        self, talent_data_path: str, event_data_path: str, ticket_data_path: str
+    ) -> None:
+        self.talent_data_path = talent_data_path
+        self.event_data_path = event_data_path
+        self.ticket_data_path = ticket_data_path
+        self.issues = []
+
+    def validate(self) -> list[ValidationIssue]:
+        """
+        Validate all CSV files.
+
+        Returns:
+            List of the problems found. It is empty if the data is valid.
+        """
+        self.issues = []
+        talent_names = self.validate_talents()
+        event_uids = self.validate_events(talent_names)
+        self.validate_tickets(event_uids)
+        return self.issues
+
+    def validate_talents(self) -> set[str]:
+        csv_name = "talents.csv"
+        names: set[str] = set()
+        uids: dict[str, int] = {}
+
+        for row_number, row in self._read_rows(
+            self.talent_data_path, self.talent_columns, csv_name
+        ):
+            location = (csv_name, row_number)
+            self._check_required(row, ["名前", "UID", "ローマ字"], location)
+            self._check_duplicate(row, "UID", uids, location)
+
+            name = row["名前"]
+            if name in names:
+                # The later row overwrites the former one
+                self._add(location, f"Duplicate name '{name}'", IssueLevel.WARNING)
+            if name != "":
+                names.add(name)
+
+            self._parse_date(row, "データ更新日時", self.timestamp_format, location)
+            self._parse_date(row, "活動開始日時", self.datetime_format, location)
+            self._parse_date(row, "初配信日時", self.datetime_format, location)
+            if row["誕生日"] not in ("", "2/29"):
+                self._parse_date(row, "誕生日", "M/D", location)
+            if row["卒業"] != "":
+                self._parse_date(row, "卒業", "YYYY/MM/DD", location)
+
+        return names
+
+    def validate_events(self, talent_names: set[str]) -> set[str]:
+        csv_name = "events.csv"
+        uids: dict[str, int] = {}
+
+        for row_number, row in self._read_rows(
+            self.event_data_path, self.event_columns, csv_name
+        ):
+            location = (csv_name, row_number)
+            self._check_required(row, ["UID", "参加者"], location)
+            self._check_duplicate(row, "UID", uids, location)
+
+            self._parse_date(row, "データ更新日時", self.timestamp_format, location)
+            begin = self._parse_date(row, "開始日時", self.datetime_format, location)
+            end = self._parse_date(row, "終了日時", self.datetime_format, location)
+            if begin is not None and end is not None and end < begin:
+                self._add(
+                    location,
+                    f"Event '{row['イベント名']}' (UID: {row['UID']}) has end time "
+                    f"({end.format(self.datetime_format)}) before begin time "
+                    f"({begin.format(self.datetime_format)})",
+                )
+
+            if row["参加者"] != "":
+                for talent_name in row["参加者"].split(","):
+                    talent_name = talent_name.strip()
+                    if talent_name not in talent_names:
+                        self._add(location, f"Unknown talent '{talent_name}' in 参加者")
+
+        return set(uids)
+
+    def validate_tickets(self, event_uids: set[str]) -> None:
+        csv_name = "tickets.csv"
+        uids: dict[str, int] = {}
+
+        for row_number, row in self._read_rows(
+            self.ticket_data_path, self.ticket_columns, csv_name
+        ):
+            location = (csv_name, row_number)
+            self._parse_date(row, "更新日時", self.timestamp_format, location)
+
+            begin = None
+            if row["開始日時"] != "":
+                begin = self._parse_date(row, "開始日時", self.datetime_format, location)
+            end = None
+            if row["終了日時"] != "":
+                end = self._parse_date(row, "終了日時", self.datetime_format, location)
+
+            # Tickets without dates are not used for the calendars
+            if begin is None and end is None:
+                continue
+
+            self._check_required(row, ["UID", "イベントUID"], location)
+            self._check_duplicate(row, "UID", uids, location)
+
+            event_uid = row["イベントUID"]
+            if event_uid != "" and event_uid not in event_uids:
+                # The ticket is silently dropped by the generation
+                self._add(
+                    location,
+                    f"Unknown event UID '{event_uid}' in イベントUID",
+                    IssueLevel.WARNING,
+                )
+
+    def _read_rows(
+        self, path: str, expected_columns: list[str], csv_name: str
+    ) -> Iterator[tuple[int, dict[str, str]]]:
+        """
+        Read rows of a CSV file as dictionaries from column name to the value.
+
+        Nothing is yielded if the columns are different from the expected
+        columns, because the values can't be checked.
+        """
+        with open(path, encoding="utf_8_sig", newline="") as file:
+            reader = csv.reader(file)
+            columns = next(reader, [])
+
+            missing_columns = [col for col in expected_columns if col not in columns]
+            if missing_columns:
+                self._add(
+                    (csv_name, None),
+                    f"Missing expected columns: {', '.join(missing_columns)}",
+                )
+            unexpected_columns = [col for col in columns if col not in expected_columns]
+            if unexpected_columns:
+                self._add(
+                    (csv_name, None),
+                    f"Unexpected columns found: {', '.join(unexpected_columns)}",
+                )
+            if missing_columns or unexpected_columns:
+                return
+
+            for row_number, values in enumerate(reader, start=2):
+                # pandas skips blank lines
+                if not values:
+                    continue
+                values += [""] * (len(columns) - len(values))
+                yield row_number, dict(zip(columns, values))
+
+    def _add(
+        self,
+        location: tuple[str, int | None],
+        message: str,
+        level: IssueLevel = IssueLevel.ERROR,
+    ) -> None:
+        csv_name, row_number = location
+        self.issues.append(ValidationIssue(csv_name, row_number, message, level))
+
+    def _parse_date(
+        self,
+        row: dict[str, str],
+        column: str,
+        date_format: str,
+        location: tuple[str, int],
+    ) -> arrow.Arrow | None:
+        value = row[column]
+        try:
+            return arrow.get(value, date_format, tzinfo=self.tzinfo)
+        except (arrow.parser.ParserError, ValueError):
+            self._add(location, f"Invalid {column} '{value}' (expected {date_format})")
+            return None
+
+    def _check_required(
+        self, row: dict[str, str], columns: list[str], location: tuple[str, int]
+    ) -> None:
+        for column in columns:
+            if row[column].strip() == "":
+                self._add(location, f"{column} is empty")
+
+    def _check_duplicate(
+        self,
+        row: dict[str, str],
+        column: str,
+        seen: dict[str, int],
+        location: tuple[str, int],
+    ) -> None:
+        value = row[column]
+        if value == "":
+            return
+
+        # Calendar apps merge or drop events with the same UID
+        if value in seen:
+            self._add(
+                location,
+                f"Duplicate {column} '{value}' (first seen in row {seen[value]})",
+                IssueLevel.WARNING,
+            )
+        else:
+            _, seen[value] = location
@@ -0,0 +1,319 @@
+import dataclasses
+import math
+import os
+import sys
+import time
+from .dataset import Dataset
+from .event import Event, EventType
+from .manifest import StampManifest, get_unique_key
+from .nijical import NijiCal
+from .shard import MonthShards
+from .talent import Talent
+from .ticket import Ticket
+
+
+def is_same(a, b) -> bool:
+    """
+    Compare parsed values, treating NaN of empty cells as the same.
+    """
+    if a is b:
+        return True
+
+    if isinstance(a, float) and isinstance(b, float):
+        return a == b or (math.isnan(a) and math.isnan(b))
+
+    if isinstance(a, list) and isinstance(b, list):
+        return len(a) == len(b) and all(is_same(x, y) for x, y in zip(a, b))
+
+    if dataclasses.is_dataclass(a) and type(a) is type(b):
+        return all(
+            is_same(getattr(a, field.name), getattr(b, field.name))
+            for field in dataclasses.fields(a)
+        )
+
+    return type(a) is type(b) and a == b
+
+
+class Watcher:
+    """
+    Regenerate the calendars whenever the CSV files are changed.
+
+    The parsed data is kept in memory, only the changed file is parsed again,
+    and only the calendars which have changed events are written. The files
+    are polled because the standard library has no file system events.
+    """
+
+    # Seconds between checks of the files
+    interval = 0.2
+    # Seconds to wait for the file to stop changing (editors save in steps)
+    debounce = 0.3
+
+    instance: NijiCal
+
+    def __init__(self, instance: NijiCal) -> None:
+        self.instance = instance
+        root = instance.output_root
+        self.manifest = StampManifest(f"{root}/data/manifest.json", instance.now)
+
+        self.talents: dict[str, Talent] = {}
+        self.tickets: dict[str, list[Ticket]] = {}
+        # Events of events.csv without the generated ticket events
+        self.base_events: list[Event] = []
+        # name: (talent, generated events)
+        self.talent_events: dict[str, tuple[Talent, list[Event]]] = {}
+        self.dataset: Dataset | None = None
+
+    def run(self) -> int:
+        paths = [
+            self.instance.talent_data_path,
+            self.instance.event_data_path,
+            self.instance.ticket_data_path,
+        ]
+
+        self.try_update(set(paths))
+
+        states = {path: self.get_state(path) for path in paths}
+        print("Watching " + ", ".join(paths), file=sys.stderr)
+        try:
+            while True:
+                time.sleep(self.interval)
+                if all(self.get_state(path) == states[path] for path in paths):
+                    continue
+
+                # Wait until the files stop changing
+                while True:
+                    current = {path: self.get_state(path) for path in paths}
+                    time.sleep(self.debounce)
+                    if current == {path: self.get_state(path) for path in paths}:
+                        break
+
+                changed = {path for path in paths if current[path] != states[path]}
+                states = current
+                if changed:
+                    self.try_update(changed)
+        except KeyboardInterrupt:
+            pass
+
+        return 0
+
+    def try_update(self, changed_paths: set[str]) -> None:
+        if self.dataset is None:
+            # Nothing was loaded yet, so the unchanged files are needed too
+            changed_paths = {
+                self.instance.talent_data_path,
+                self.instance.event_data_path,
+                self.instance.ticket_data_path,
+            }
+
+        try:
+            self.update(changed_paths)
+        except Exception as error:
+            # Keep the last data and wait for the fix
+            print(f"Error: {error}", file=sys.stderr)
+
+    def update(self, changed_paths: set[str]) -> None:
+        started = time.perf_counter()
+        instance = self.instance
+        talents = self.talents
+        tickets = self.tickets
+        base_events = self.base_events
+
+        if instance.talent_data_path in changed_paths:
+            talents = instance.fetch_talents()
+        if instance.ticket_data_path in changed_paths:
+            tickets = instance.fetch_tickets()
+        if instance.event_data_path in changed_paths:
+            events = instance.fetch_events(talents, tickets)
+            base_events = self.reuse_events(
+                [ev for ev in events if ev.event_type == EventType.EVENT]
+            )
+
+        base_events, live_events = self.link_events(base_events, talents, tickets)
+        talent_events, generated_events = self.generate_talent_events(talents)
+
+        instance._validate_event_dates(live_events)
+        instance._validate_event_dates(talent_events)
+
+        self.manifest.reset()
+        dataset = Dataset(
+            talents=talents,
+            live_events=self.manifest.apply(live_events),
+            talent_events=self.manifest.apply(talent_events),
+            version=instance.get_data_version(),
+        )
+
+        calendar_names = self.get_changed_calendars(self.dataset, dataset)
+        if calendar_names is None or len(calendar_names) > 0:
+            # The shard entries are cached by event; a new cache per update
+            # keeps the events of the previous data from being mixed in
+            shards = MonthShards(f"{instance.output_root}/data/shards", instance.now)
+            instance.write_calendars(dataset, shards, calendar_names)
+            count = "all" if calendar_names is None else len(calendar_names)
+            self.report(f"Updated {count} calendar(s)", started)
+            instance.write_indices(dataset)
+            self.manifest.write()
+            self.report("Updated the indices", started)
+        else:
+            print("No calendars changed", file=sys.stderr)
+
+        self.talents = talents
+        self.tickets = tickets
+        self.base_events = base_events
+        self.talent_events = generated_events
+        self.dataset = dataset
+
+    def reuse_events(self, events: list[Event]) -> list[Event]:
+        """
+        Replace the parsed events with the previous ones if they are the same,
+        so cached results of the previous events are still used.
+        """
+        previous: dict[str, list[Event]] = {}
+        for event in self.base_events:
+            previous.setdefault(event.uid, []).append(event)
+
+        result: list[Event] = []
+        for event in events:
+            same = [ev for ev in previous.get(event.uid, []) if is_same(ev, event)]
+            result.append(same[0] if same else event)
+        return result
+
+    def link_events(
+        self,
+        base_events: list[Event],
+        talents: dict[str, Talent],
+        tickets: dict[str, list[Ticket]],
+    ) -> tuple[list[Event], list[Event]]:
+        """
+        Update talents and tickets of the events, and generate ticket events.
+
+        Returns:
+            Tuple of the updated events and the events with ticket events
+        """
+        linked_events: list[Event] = []
+        live_events: list[Event] = []
+        for event in base_events:
+            event_talents: list[Talent] = []
+            for talent in event.talents:
+                if talent.name not in talents:
+                    raise ValueError(
+                        f"Error in events.csv: Unknown talent '{talent.name}' "
+                        f"in event UID {event.uid}"
+                    )
+                event_talents.append(talents[talent.name])
+            event_tickets = tickets.get(event.uid, [])
+
+            if not is_same(event_talents, event.talents) or not is_same(
+                event_tickets, event.tickets
+            ):
+                event = dataclasses.replace(
+                    event, talents=event_talents, tickets=event_tickets
+                )
+            linked_events.append(event)
+
+            live_events.append(event)
+            for ticket in event_tickets:
+                live_events += self.instance.generate_ticket_events(event, ticket)
+
+        return linked_events, live_events
+
+    def generate_talent_events(
+        self, talents: dict[str, Talent]
+    ) -> tuple[list[Event], dict[str, tuple[Talent, list[Event]]]]:
+        """
+        Generate birthdays and anniversaries only for the changed talents.
+        """
+        events: list[Event] = []
+        generated: dict[str, tuple[Talent, list[Event]]] = {}
+        for talent in talents.values():
+            if talent.is_organization:
+                continue
+
+            previous = self.talent_events.get(talent.name)
+            if previous is not None and is_same(previous[0], talent):
+                talent_events = previous[1]
+            else:
+                talent_events = self.instance.generate_events_for_talent(talent)
+
+            generated[talent.name] = (talent, talent_events)
+            events += talent_events
+
+        nijisanji_day_event = self.instance.generate_nijisanji_day_event(talents)
+        if nijisanji_day_event is not None:
+            events.append(nijisanji_day_event)
+        return events, generated
+
+    def get_changed_calendars(
+        self, previous: Dataset | None, current: Dataset
+    ) -> set[str] | None:
+        """
+        Get names of the calendars which have changed events.
+
+        Returns:
+            Names of the calendars, or None if all calendars have to be written
+        """
+        if previous is None:
+            return None
+
+        # Talents were added, removed or renamed; the calendar list is changed
+        if previous.get_calendar_names() != current.get_calendar_names():
+            return None
+
+        calendar_names: set[str] = set()
+        talents = [
+            talent
+            for talent in current.talents.values()
+            if not talent.is_organization
+        ]
+        for calendar_name, previous_events, current_events in [
+            ("events", previous.live_events, current.live_events),
+            ("birthdays", previous.talent_events, current.talent_events),
+        ]:
+            old_events = self.get_events_by_key(previous_events)
+            new_events = self.get_events_by_key(current_events)
+            if [key for key in old_events if key in new_events] != [
+                key for key in new_events if key in old_events
+            ]:
+                # Events were moved
+                return None
+
+            for key in old_events.keys() | new_events.keys():
+                old = old_events.get(key)
+                new = new_events.get(key)
+                if old is not None and new is not None and is_same(old, new):
+                    continue
+
+                # Added, removed or changed event
+                calendar_names.add(calendar_name)
+                for talent in talents:
+                    if any(
+                        event is not None and event.has_talent(talent)
+                        for event in (old, new)
+                    ):
+                        calendar_names.add(current.get_talent_calendar_name(talent))
+
+        # Calendar names of the talents are changed
+        for talent in talents:
+            if talent.name not in previous.talents:
+                calendar_names.add(current.get_talent_calendar_name(talent))
+
+        return calendar_names
+
+    def get_events_by_key(self, events: list[Event]) -> dict[str, Event]:
+        """
+        Index the events by UID; duplicated UIDs are numbered in order.
+        """
+        result: dict[str, Event] = {}
+        for event in events:
+            result[get_unique_key(event.uid, result)] = event
+        return result
+
+    def get_state(self, path: str) -> tuple[int, int] | None:
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def report(self, message: str, started: float) -> None:
+        elapsed = (time.perf_counter() - started) * 1000
+        print(f"{message} in {elapsed:.0f} ms", file=sys.stderr)
@@ -0,0 +1,91 @@
+import queue
+import threading
+
+# Item which tells the thread that no more files come
+_DONE = None
+
+
+class FileWriter:
+    """
+    Write files on a background thread, so the calendars are rendered while
+    the previous ones are being written.
+
+    The files are written in the order of `write` by one thread, so the
+    output is the same as writing them in place. At most `max_pending`
+    files wait in the queue; `write` blocks when it is full, so a slow disk
+    doesn't let the rendered files pile up in memory. An error of the
+    thread is raised from the next `write` or from `close`, and the files
+    after it are not written.
+
+    Usage:
+        with FileWriter() as writer:
+            writer.write(path, data)
+    """
+
+    max_pending: int
+
+    def __init__(self, max_pending: int = 64) -> None:
+        self.max_pending = max_pending
+        self._queue: queue.Queue[tuple[str, str, str] | None] = queue.Queue(
+            maxsize=max_pending
+        )
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(
+            target=self._run, name="nijical-file-writer", daemon=True
+        )
+        self._thread.start()
+
+    def __enter__(self) -> "FileWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            # Don't hide the error of the caller with one of the thread
+            self._stop()
+
+    def write(self, path: str, data: str, encoding: str = "utf_8") -> None:
+        """
+        Queue a file to write.
+
+        Raises:
+            OSError: If writing a previous file failed
+        """
+        self._raise_error()
+        self._queue.put((path, data, encoding))
+
+    def close(self) -> None:
+        """
+        Wait for the queued files to be written.
+
+        Raises:
+            OSError: If writing a file failed
+        """
+        self._stop()
+        self._raise_error()
+
+    def _stop(self) -> None:
+        if self._thread.is_alive():
+            self._queue.put(_DONE)
+            self._thread.join()
+
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _DONE:
+                return
+            if self._error is not None:
+                # Keep taking the items so that the producer doesn't block
+                continue
+
+            path, data, encoding = item
+            try:
+                with open(path, mode="w", encoding=encoding) as file:
+                    file.write(data)
+            except BaseException as error:
+                self._error = error
@@ -1,13 +1,133 @@
+import argparse
+import arrow
 import sys
 from nijical import NijiCal
+from nijical.config import load_dataset_configs
+from nijical.export import ExportFormat
+from nijical.folding import OutputProfile
+from nijical.partition import Partition
+from nijical.profiling import Profiler
 from settings import url_prefix
 
+def parse_time(value: str) -> arrow.Arrow:
+    try:
+        return arrow.get(value)
+    except (arrow.ParserError, ValueError, TypeError) as error:
+        raise argparse.ArgumentTypeError(f"invalid time '{value}': {error}")
+
 def main() -> int:
-    talent_file = sys.argv[1]
-    event_file = sys.argv[2]
-    ticket_file = sys.argv[3]
-    instance = NijiCal(talent_file, event_file, ticket_file, url_prefix)
-    return instance.generate_all()
+    parser = argparse.ArgumentParser()
+    parser.add_argument("talent_file", nargs="?")
+    parser.add_argument("event_file", nargs="?")
+    parser.add_argument("ticket_file", nargs="?")
+    parser.add_argument(
+        "--config",
+        help="JSON file of the datasets to generate one after another in this "
+        + "process instead of the three CSV files",
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="i/N",
+        type=Partition.parse,
+        help="generate only the i-th of N slices of the calendars "
+        + "(merge them with python -m nijical merge-partitions)",
+    )
+    parser.add_argument(
+        "--now",
+        type=parse_time,
+        help="current time in ISO 8601 for DTSTAMP and the anniversary horizon; "
+        + "give every shard of a build the same time (default: now)",
+    )
+    parser.add_argument(
+        "--output-root",
+        default="docs",
+        help="directory to write the calendars to (default: docs)",
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help="keep running and regenerate the calendars when the files change",
+    )
+    parser.add_argument(
+        "--output-profile",
+        choices=[profile.value for profile in OutputProfile],
+        default=OutputProfile.GOOGLE.value,
+        help="'strict' folds long lines for clients which require it",
+    )
+    parser.add_argument(
+        "--formats",
+        type=ExportFormat.parse_list,
+        default=[ExportFormat.ICS],
+        help="comma separated formats to write each calendar in: "
+        + ", ".join(export_format.value for export_format in ExportFormat)
+        + " (default: ics)",
+    )
+    parser.add_argument(
+        "--no-cold-tier",
+        action="store_true",
+        help="rewrite the calendars of graduated talents even if nothing changed",
+    )
+    Profiler.add_arguments(parser)
+    args = parser.parse_args()
+
+    output_profile = OutputProfile(args.output_profile)
+    if args.config is not None:
+        if args.watch or args.talent_file is not None:
+            parser.error("--config can't be used with --watch or the CSV files")
+        if args.shard is not None:
+            # The calendars of each dataset are split separately
+            parser.error("--config can't be used with --shard")
+        if args.output_root != "docs":
+            parser.error("--config has the output root of each dataset")
+
+        # Build the datasets one after another in one process, which saves
+        # the start-up and imports; rosters don't share any events, so each
+        # dataset has its own Exporter and caches
+        instances = [
+            NijiCal(
+                config.talent_data_path,
+                config.event_data_path,
+                config.ticket_data_path,
+                config.url_prefix,
+                output_root=config.output_root,
+                now=args.now,
+                output_profile=output_profile,
+                organization=config.organization,
+                formats=args.formats,
+                use_cold_tier=not args.no_cold_tier,
+            )
+            for config in load_dataset_configs(args.config)
+        ]
+    elif args.ticket_file is None:
+        parser.error("the CSV files or --config is required")
+    elif args.watch and args.shard is not None:
+        parser.error("--shard can't be used with --watch")
+    else:
+        instances = [
+            NijiCal(
+                args.talent_file,
+                args.event_file,
+                args.ticket_file,
+                url_prefix,
+                output_root=args.output_root,
+                now=args.now,
+                output_profile=output_profile,
+                formats=args.formats,
+                use_cold_tier=not args.no_cold_tier,
+            )
+        ]
+
+    with Profiler.from_args(args):
+        if args.watch:
+            from nijical.watch import Watcher
+
+            return Watcher(instances[0]).run()
+
+        for instance in instances:
+            status = instance.generate_all(args.shard)
+            if status != 0:
+                return status
+        return 0
 
 if __name__ == "__main__":
     sys.exit(main())
@@ -1,3 +1,3 @@
 #!/bin/bash
 
-poetry run python run.py docs/data/talents.csv docs/data/events.csv docs/data/tickets.csv
+poetry run python run.py docs/data/talents.csv docs/data/events.csv docs/data/tickets.csv "$@"
@@ -0,0 +1,126 @@
+"""
+Benchmark of the TEXT escaping of the calendars.
+
+Compares, for every SUMMARY, LOCATION and DESCRIPTION value, the single
+str.replace of newlines used before, escape_text, and a str.translate
+table. Then renders all calendars with the current Event, which escapes
+the text of each event once, and with the previous rendering, which
+replaced newlines every time an event was rendered into a calendar.
+
+Usage:
+    python tools/benchmark_escaping.py [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nijical import NijiCal  # noqa: E402
+from nijical.dataset import Dataset  # noqa: E402
+from nijical.escape import escape_text  # noqa: E402
+from nijical.event import Event  # noqa: E402
+
+TEXT_TABLE = str.maketrans({"\\": "\\\\", ";": "\\;", ",": "\\,", "\n": "\\n"})
+
+
+def replace_newline(value: str) -> str:
+    return value.replace("\n", "\\n")
+
+
+def translate(value: str) -> str:
+    return value.translate(TEXT_TABLE)
+
+
+def generate_text_properties_before(self: Event, is_english: bool) -> str:
+    """
+    Text properties as rendered before: newlines only and no reuse.
+    """
+    summary = self.eng_summary if is_english else self.summary
+    location = self.eng_location if is_english else self.location
+    result = self.param("SUMMARY", summary)
+    if type(location) is str:
+        result += self.param("LOCATION", location)
+    if type(self.geo) is str:
+        result += (
+            f'X-APPLE-STRUCTURED-LOCATION;VALUE=URI;X-TITLE="{location}":'
+            + f"geo:{self.geo}\r\n"
+        )
+    return result + self.param(
+        "DESCRIPTION", self.generate_description(is_english=is_english)
+    )
+
+
+def measure(function, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def render_all(instance: NijiCal) -> None:
+    # Load the events again so that nothing is reused between the runs
+    dataset: Dataset = instance.load_dataset()
+    for calendar_name in dataset.get_calendar_names():
+        for is_english in (False, True):
+            title, calendar = dataset.get_calendar(calendar_name, is_english)
+            calendar.generate_ical(title, is_english=is_english)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    data = os.path.join(ROOT, "docs", "data")
+    instance = NijiCal(
+        f"{data}/talents.csv", f"{data}/events.csv", f"{data}/tickets.csv", ""
+    )
+    dataset = instance.load_dataset()
+
+    values: list[str] = []
+    for event in dataset.all_events:
+        for is_english in (False, True):
+            values.append(event.eng_summary if is_english else event.summary)
+            location = event.eng_location if is_english else event.location
+            if type(location) is str:
+                values.append(location)
+            values.append(event.generate_description(is_english=is_english))
+
+    if [escape_text(value) for value in values] != [
+        translate(value) for value in values
+    ]:
+        print("FAIL escape_text differs from the translation table")
+        return 1
+
+    size = sum(len(value) for value in values)
+    print(f"{len(values)} values, {size / 1024 / 1024:.2f} M characters")
+    for label, escape in [
+        ("replace newline (before)", replace_newline),
+        ("escape_text", escape_text),
+        ("str.translate", translate),
+    ]:
+        seconds = measure(lambda: [escape(value) for value in values], args.repeat)
+        print(f"{label:>24}: {seconds * 1000:8.1f} ms")
+
+    print("Rendering all calendars")
+    seconds = measure(lambda: render_all(instance), args.repeat)
+    generate_text_properties = Event.generate_text_properties
+    Event.generate_text_properties = generate_text_properties_before
+    try:
+        seconds_before = measure(lambda: render_all(instance), args.repeat)
+    finally:
+        Event.generate_text_properties = generate_text_properties
+    print(f"{'before':>24}: {seconds_before * 1000:8.1f} ms")
+    print(f"{'escaped and reused':>24}: {seconds * 1000:8.1f} ms")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
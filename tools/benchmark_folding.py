@@ -0,0 +1,126 @@
+"""
+Throughput benchmark of the line folding of OutputProfile.STRICT.
+
+Renders the largest talent calendars, folds them with fold_lines and with
+the previous per-line folding which re-encoded the rest of the line on every
+step, and checks that the folded text has no line over 75 octets and
+unfolds to the original text.
+
+Usage:
+    python tools/benchmark_folding.py [--calendars 5] [--repeat 5]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nijical import NijiCal  # noqa: E402
+from nijical.folding import fold_lines  # noqa: E402
+
+
+def fold_line_legacy(line: str, max_line_len: int = 75) -> str:
+    """
+    Folding of a line formerly in Event.param, kept for comparison.
+    """
+    encoding = "utf-8"
+    text_data = line
+    byte_data = line.encode(encoding)
+    if len(byte_data) <= max_line_len:
+        return f"{line}\r\n"
+
+    result = ""
+    while len(byte_data) > 0:
+        this_line = byte_data[:max_line_len].decode(encoding, errors="ignore")
+        next_line = text_data[len(this_line) :]
+
+        # Avoid the next line from starting with a space
+        while len(next_line) > 0 and next_line[0] == " ":
+            next_line = this_line[-1] + next_line
+            this_line = this_line[:-1]
+
+        if result != "":
+            result += " "
+
+        result += f"{this_line}\r\n"
+        text_data = next_line
+        byte_data = next_line.encode(encoding)
+
+    return result
+
+
+def fold_legacy(text: str) -> str:
+    return "".join(fold_line_legacy(line) for line in text.split("\r\n")[:-1])
+
+
+def unfold(text: str) -> str:
+    return text.replace("\r\n ", "")
+
+
+def measure(fold, texts: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for text in texts:
+            fold(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calendars", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    data = os.path.join(ROOT, "docs", "data")
+    instance = NijiCal(
+        f"{data}/talents.csv", f"{data}/events.csv", f"{data}/tickets.csv", ""
+    )
+    dataset = instance.load_dataset()
+
+    # Talent calendars and the birthday calendar
+    calendar_names = [
+        name for name in dataset.get_calendar_names() if name != "events"
+    ]
+    largest = sorted(
+        calendar_names, key=lambda name: -len(dataset.get_calendar_events(name))
+    )[: args.calendars]
+    texts: list[str] = []
+    for name in largest:
+        for is_english in (False, True):
+            title, calendar = dataset.get_calendar(name, is_english)
+            texts.append(calendar.generate_ical(title, is_english=is_english))
+
+    size = sum(len(text.encode("utf_8")) for text in texts)
+    print(
+        f"{len(texts)} calendars of {', '.join(largest)}: "
+        + f"{size / 1024 / 1024:.2f} MiB"
+    )
+
+    is_valid = True
+    for text in texts:
+        folded = fold_lines(text)
+        lines = folded.split("\r\n")
+        if any(len(line.encode("utf_8")) > 75 for line in lines):
+            print("FAIL a folded line is longer than 75 octets")
+            is_valid = False
+        if unfold(folded) != text:
+            print("FAIL the folded text doesn't unfold to the original")
+            is_valid = False
+
+    for label, fold in [("fold_lines", fold_lines), ("legacy", fold_legacy)]:
+        seconds = measure(fold, texts, args.repeat)
+        print(
+            f"{label:>10}: {seconds * 1000:8.1f} ms, "
+            + f"{size / 1024 / 1024 / seconds:7.1f} MiB/s"
+        )
+
+    return 0 if is_valid else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
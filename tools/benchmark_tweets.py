@@ -0,0 +1,286 @@
+"""
+End-to-end benchmark of the daily tweet path of tweet_todays_events.py.
+
+Generates a "festival day" dataset with the real talents and --events events
+on one date, then measures each phase of the tweet path:
+
+    load      NijiCal.load_dataset and EventStore.import_dataset
+    generate  generate_tweet_for_date for today and tomorrow
+    split     generate_tweets: the headers and split_text_for_tweets
+    sign      create_oauth_header of every tweet
+    post      PostingScheduler over HttpTransport to tools/stub_x_api.py
+
+The stub runs in this process on a free port, without rate limits unless
+--limit is given. Each repetition posts to a new stub, so the texts are not
+rejected as duplicates of the previous repetition. The posts are not paced
+by the token bucket of the scheduler unless --paced is given, so "post"
+is the cost of the requests rather than the wait between them.
+
+Usage:
+    python tools/benchmark_tweets.py [--events 300] [--repeat 3]
+"""
+
+import argparse
+import csv
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import arrow
+from requests_oauthlib import OAuth1
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+import tweet_todays_events  # noqa: E402
+from nijical import NijiCal  # noqa: E402
+from nijical.posting import (  # noqa: E402
+    HttpTransport,
+    PostingScheduler,
+    PostingState,
+    PostResponse,
+    TokenBucket,
+    create_oauth_header,
+)
+from nijical.store import EventStore  # noqa: E402
+from stub_x_api import create_server  # noqa: E402
+from tweet_todays_events import generate_tweets  # noqa: E402
+
+PHASES = ["load", "generate", "split", "sign", "post"]
+
+
+def write_festival_events(
+    path: str, instance: NijiCal, date: arrow.Arrow, count: int, seed: int
+) -> None:
+    """
+    Write events.csv with `count` events on `date` by random talents.
+    """
+    # Participants are split at commas and stripped, so names with spaces
+    # around them in talents.csv can't be referred to
+    names = [
+        talent.name
+        for talent in instance.fetch_talents().values()
+        if not talent.is_organization and talent.name == talent.name.strip()
+    ]
+
+    rng = random.Random(seed)
+    columns = [
+        "イベント名",
+        "UID",
+        "データ更新日時",
+        "イベント名（英語）",
+        "開始日時",
+        "終了日時",
+        "場所",
+        "場所（英語）",
+        "geo",
+        "説明文",
+        "説明文（英語）",
+        "URL",
+        "参加者",
+        "ハッシュタグ",
+    ]
+    with open(path, mode="w", encoding="utf_8", newline="") as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for index in range(count):
+            begin = date.shift(hours=rng.randrange(10, 22), minutes=rng.choice([0, 30]))
+            end = begin.shift(hours=rng.randrange(1, 4))
+            talents = rng.sample(names, rng.randrange(1, 6))
+            writer.writerow(
+                [
+                    f"フェス企画{index + 1}「{talents[0]}の部屋」",
+                    f"00000000-0000-4000-8000-{index:012d}",
+                    " 2025/01/01 00:00:00",
+                    f"Festival Stage {index + 1}",
+                    begin.format("YYYY/MM/DD HH:mm"),
+                    end.format("YYYY/MM/DD HH:mm"),
+                    f"ホール{index % 8 + 1}",
+                    f"Hall {index % 8 + 1}",
+                    "",
+                    "",
+                    "",
+                    f"https://example.com/festival/{index + 1}",
+                    ", ".join(talents),
+                    f"フェス{index + 1}" if index % 3 == 0 else "",
+                ]
+            )
+
+
+class Timer:
+    def __init__(self) -> None:
+        self.seconds: dict[str, list[float]] = {phase: [] for phase in PHASES}
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        yield
+        self.seconds[name].append(time.perf_counter() - started)
+
+
+class CountingParser:
+    """
+    parse_tweet of tweet_todays_events which counts its calls.
+    """
+
+    def __init__(self, parse_tweet) -> None:
+        self.parse_tweet = parse_tweet
+        self.count = 0
+
+    def __call__(self, text: str):
+        self.count += 1
+        return self.parse_tweet(text)
+
+
+class TimedTransport:
+    """
+    Transport which records the seconds of each request.
+    """
+
+    def __init__(self, transport: HttpTransport) -> None:
+        self.transport = transport
+        self.seconds: list[float] = []
+
+    def post(self, auth, text: str) -> PostResponse:
+        started = time.perf_counter()
+        response = self.transport.post(auth, text)
+        self.seconds.append(time.perf_counter() - started)
+        return response
+
+
+def run_once(
+    instance: NijiCal,
+    today: arrow.Arrow,
+    timer: Timer,
+    args: argparse.Namespace,
+    state_path: str,
+) -> tuple[int, list[float]]:
+    """
+    Run the tweet path once.
+
+    Returns:
+        Number of tweets, and the seconds of each request to the stub
+    """
+    with EventStore(":memory:") as store:
+        with timer.phase("load"):
+            store.import_dataset(instance.load_dataset())
+
+        with timer.phase("generate"):
+            ja_today, en_today = instance.generate_tweet_for_date(today, store)
+            ja_tomorrow, en_tomorrow = instance.generate_tweet_for_date(
+                today.shift(days=1), store
+            )
+
+    with timer.phase("split"):
+        ja_tweets, en_tweets = generate_tweets(
+            today, ja_today, en_today, ja_tomorrow, en_tomorrow
+        )
+
+    auth = OAuth1("consumer-key", "consumer-secret", "access-token", "token-secret")
+    with timer.phase("sign"):
+        for text in ja_tweets + en_tweets:
+            create_oauth_header(auth, "POST", "https://api.x.com/2/tweets", text)
+
+    server = create_server(0, args.limit, args.window, args.fail_every, False)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/2/tweets"
+    try:
+        with HttpTransport(url=url) as http:
+            transport = TimedTransport(http)
+            bucket = None if args.paced else TokenBucket(float("inf"), 1.0)
+            scheduler = PostingScheduler(
+                transport,
+                PostingState(state_path),
+                bucket=bucket,
+                reset_jitter=0.5,
+                base_delay=0.2,
+            )
+            with timer.phase("post"):
+                scheduler.post_thread("ja:benchmark", auth, ja_tweets)
+                scheduler.post_thread("en:benchmark", auth, en_tweets)
+    finally:
+        server.shutdown()
+        server.server_close()
+        os.remove(state_path)
+
+    return len(ja_tweets) + len(en_tweets), transport.seconds
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=300, help="events on the day")
+    parser.add_argument("--date", default="2030/02/03", help="festival day")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--limit", type=int, default=100000, help="posts per window of the stub"
+    )
+    parser.add_argument("--window", type=float, default=900.0, help="seconds")
+    parser.add_argument(
+        "--fail-every", type=int, default=0, help="stub returns 503 every N requests"
+    )
+    parser.add_argument(
+        "--paced", action="store_true", help="pace the posts as in production"
+    )
+    args = parser.parse_args()
+
+    data = os.path.join(ROOT, "docs", "data")
+    today = arrow.get(args.date, "YYYY/MM/DD", tzinfo="+09:00")
+    parser_counter = CountingParser(tweet_todays_events.parse_tweet)
+    tweet_todays_events.parse_tweet = parser_counter
+
+    timer = Timer()
+    tweet_counts: list[int] = []
+    request_seconds: list[float] = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        event_path = os.path.join(temp_dir, "events.csv")
+        instance = NijiCal(
+            f"{data}/talents.csv", event_path, f"{data}/tickets.csv", ""
+        )
+        write_festival_events(event_path, instance, today, args.events, args.seed)
+        for _ in range(args.repeat):
+            tweet_count, seconds = run_once(
+                instance,
+                today,
+                timer,
+                args,
+                os.path.join(temp_dir, "posting_state.json"),
+            )
+            tweet_counts.append(tweet_count)
+            request_seconds += seconds
+
+    print(
+        f"{args.events} events on {today.format('YYYY-MM-DD')}: "
+        + f"{tweet_counts[0]} tweets, "
+        + f"{parser_counter.count // args.repeat} parse_tweet calls per run"
+    )
+    totals = [
+        sum(timer.seconds[phase][i] for phase in PHASES) for i in range(args.repeat)
+    ]
+    rows = [(phase, timer.seconds[phase]) for phase in PHASES] + [("total", totals)]
+    for label, values in rows:
+        print(
+            f"{label:>8}: median {statistics.median(values) * 1000:8.1f} ms, "
+            + f"best {min(values) * 1000:8.1f} ms"
+        )
+    request_seconds.sort()
+    print(
+        f"{len(request_seconds)} requests in {args.repeat} runs: "
+        + f"p50 {request_seconds[len(request_seconds) // 2] * 1000:.1f} ms, "
+        + f"p95 {request_seconds[int(len(request_seconds) * 0.95)] * 1000:.1f} ms"
+    )
+
+    if len(set(tweet_counts)) != 1:
+        print("FAIL the runs made different tweets")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
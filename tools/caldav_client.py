@@ -0,0 +1,290 @@
+"""
+Scripted CalDAV client to check `python -m nijical serve --caldav` locally.
+
+With --events, the client also removes one event of the calendar from
+events.csv, changes another and adds a copy of it, waits until the server
+reloads the data, and checks that an incremental sync returns exactly the
+added, changed and removed hrefs. The file is restored at the end. The
+server reloads with --watch, or with SIGHUP sent to --pid.
+
+Usage:
+    python -m nijical serve --caldav --watch docs/data/talents.csv docs/data/events.csv docs/data/tickets.csv
+    python tools/caldav_client.py [--url http://127.0.0.1:8000] [--calendar ja/tsukino_mito]
+        [--events docs/data/events.csv [--pid PID]]
+"""
+
+import argparse
+import csv
+import http.client
+import io
+import os
+import signal
+import sys
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from urllib.parse import urlparse
+
+DAV = "DAV:"
+CALDAV = "urn:ietf:params:xml:ns:caldav"
+
+PROPFIND = """<?xml version="1.0" encoding="utf-8"?>
+<D:propfind xmlns:D="DAV:" xmlns:C="urn:ietf:params:xml:ns:caldav">
+  <D:prop><D:resourcetype/><D:displayname/><D:sync-token/></D:prop>
+</D:propfind>"""
+
+SYNC_COLLECTION = """<?xml version="1.0" encoding="utf-8"?>
+<D:sync-collection xmlns:D="DAV:" xmlns:C="urn:ietf:params:xml:ns:caldav">
+  <D:sync-token>{token}</D:sync-token>
+  <D:sync-level>1</D:sync-level>
+  <D:prop><D:getetag/></D:prop>
+</D:sync-collection>"""
+
+MULTIGET = """<?xml version="1.0" encoding="utf-8"?>
+<C:calendar-multiget xmlns:D="DAV:" xmlns:C="urn:ietf:params:xml:ns:caldav">
+  <D:prop><D:getetag/><C:calendar-data/></D:prop>
+  {hrefs}
+</C:calendar-multiget>"""
+
+
+def tag(namespace: str, name: str) -> str:
+    return f"{{{namespace}}}{name}"
+
+
+class Client:
+    def __init__(self, url: str) -> None:
+        parsed = urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or 80
+
+    def request(
+        self, method: str, path: str, body: str = "", headers: dict | None = None
+    ) -> tuple[int, dict[str, str], bytes]:
+        connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        request_headers = {"Content-Type": "application/xml; charset=utf-8"}
+        request_headers.update(headers or {})
+        connection.request(method, path, body.encode("utf_8"), request_headers)
+        response = connection.getresponse()
+        data = response.read()
+        connection.close()
+        return response.status, dict(response.getheaders()), data
+
+
+def get_etags(multistatus: ET.Element) -> dict[str, str | None]:
+    """
+    Get ETags of the responses; None for removed resources.
+    """
+    etags: dict[str, str | None] = {}
+    for response in multistatus.findall(tag(DAV, "response")):
+        href = response.findtext(tag(DAV, "href"))
+        etag = response.findtext(f".//{tag(DAV, 'getetag')}")
+        etags[href] = etag
+    return etags
+
+
+def check(condition: bool, message: str) -> bool:
+    print(("OK   " if condition else "FAIL ") + message)
+    return condition
+
+
+def get_sync_token(client: Client, path: str) -> str | None:
+    _, _, data = client.request("PROPFIND", path, PROPFIND, {"Depth": "0"})
+    return ET.fromstring(data).findtext(f".//{tag(DAV, 'sync-token')}")
+
+
+def wait_for_reload(
+    client: Client, path: str, token: str, pid: int | None, timeout: float = 60
+) -> str | None:
+    """
+    Wait until the sync token of the collection is not `token`.
+
+    Returns:
+        New sync token, or None on timeout
+    """
+    if pid is not None:
+        os.kill(pid, signal.SIGHUP)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        time.sleep(0.5)
+        new_token = get_sync_token(client, path)
+        if new_token is not None and new_token != token:
+            return new_token
+    return None
+
+
+def edit_events(
+    data: bytes, path: str, etags: dict[str, str | None]
+) -> tuple[bytes, dict[str, str]] | None:
+    """
+    Remove an event of the collection, change another and add a copy of it.
+
+    Returns:
+        Tuple of the edited events.csv and the expected change of each href,
+        or None if the collection doesn't have two events of events.csv
+    """
+    rows = list(csv.reader(io.StringIO(data.decode("utf_8_sig"))))
+    header, rows = rows[0], rows[1:]
+    uid_column = header.index("UID")
+    summary_column = header.index("イベント名")
+
+    # Rows whose UID is used once, so the href is exactly the UID
+    counts: dict[str, int] = {}
+    for row in rows:
+        counts[row[uid_column]] = counts.get(row[uid_column], 0) + 1
+    candidates = [
+        index
+        for index, row in enumerate(rows)
+        if counts[row[uid_column]] == 1 and f"{path}{row[uid_column]}.ics" in etags
+    ]
+    if len(candidates) < 2:
+        return None
+
+    removed, changed = candidates[:2]
+    added = list(rows[changed])
+    added[uid_column] = str(uuid.uuid4())
+    rows[changed][summary_column] += " (changed)"
+
+    expected = {
+        f"{path}{rows[removed][uid_column]}.ics": "removed",
+        f"{path}{rows[changed][uid_column]}.ics": "changed",
+        f"{path}{added[uid_column]}.ics": "added",
+    }
+    rows = [row for index, row in enumerate(rows) if index != removed] + [added]
+
+    output = io.StringIO()
+    csv.writer(output, lineterminator="\n").writerows([header] + rows)
+    return output.getvalue().encode("utf_8_sig"), expected
+
+
+def check_changes(
+    client: Client, path: str, events_path: str, pid: int | None
+) -> list[bool]:
+    results: list[bool] = []
+    token = get_sync_token(client, path)
+    body = SYNC_COLLECTION.format(token="")
+    _, _, data = client.request("REPORT", path, body)
+    etags = get_etags(ET.fromstring(data))
+
+    with open(events_path, mode="rb") as file:
+        original = file.read()
+    edited = edit_events(original, path, etags)
+    if not check(edited is not None, "calendar has two events of events.csv"):
+        return [False]
+    data, expected = edited
+
+    try:
+        with open(events_path, mode="wb") as file:
+            file.write(data)
+        new_token = wait_for_reload(client, path, token, pid)
+        results.append(check(new_token is not None, "server reloads the data"))
+        if new_token is None:
+            return results
+
+        body = SYNC_COLLECTION.format(token=token)
+        status, _, data = client.request("REPORT", path, body)
+        changes = get_etags(ET.fromstring(data))
+        results.append(
+            check(
+                status == 207 and set(changes) == set(expected),
+                f"incremental sync returns {len(changes)} changed hrefs",
+            )
+        )
+        for href, change in expected.items():
+            if change == "removed":
+                condition = href in changes and changes[href] is None
+            elif change == "changed":
+                condition = changes.get(href) not in (None, etags[href])
+            else:
+                condition = changes.get(href) is not None
+            results.append(check(condition, f"{change} event {href}"))
+    finally:
+        with open(events_path, mode="wb") as file:
+            file.write(original)
+
+    restored_token = wait_for_reload(client, path, new_token or "", pid)
+    results.append(
+        check(restored_token == token, "restoring the data gives the first token")
+    )
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--calendar", default="ja/tsukino_mito")
+    parser.add_argument(
+        "--events", help="events.csv of the server, to check the changes"
+    )
+    parser.add_argument("--pid", type=int, help="send SIGHUP to reload the data")
+    args = parser.parse_args()
+
+    client = Client(args.url)
+    path = f"/caldav/{args.calendar}/"
+    results: list[bool] = []
+
+    status, headers, _ = client.request("OPTIONS", path)
+    dav = headers.get("DAV", "")
+    results.append(check("calendar-access" in dav, "OPTIONS advertises CalDAV"))
+
+    status, _, data = client.request("PROPFIND", path, PROPFIND, {"Depth": "0"})
+    multistatus = ET.fromstring(data)
+    token = multistatus.findtext(f".//{tag(DAV, 'sync-token')}")
+    is_calendar = multistatus.find(f".//{tag(CALDAV, 'calendar')}") is not None
+    results.append(check(status == 207 and is_calendar, "PROPFIND finds a calendar"))
+    results.append(check(bool(token), f"collection has a sync token {token}"))
+
+    # Initial sync: every member
+    body = SYNC_COLLECTION.format(token="")
+    status, _, data = client.request("REPORT", path, body)
+    multistatus = ET.fromstring(data)
+    etags = get_etags(multistatus)
+    new_token = multistatus.findtext(tag(DAV, "sync-token"))
+    is_listed = status == 207 and len(etags) > 0
+    results.append(check(is_listed, f"initial sync: {len(etags)} events"))
+    results.append(check(new_token == token, "initial sync returns the same token"))
+
+    # Incremental sync: nothing changed
+    body = SYNC_COLLECTION.format(token=token)
+    status, _, data = client.request("REPORT", path, body)
+    changes = get_etags(ET.fromstring(data))
+    results.append(check(status == 207 and not changes, "incremental sync: no changes"))
+
+    # Unknown tokens must be rejected so that the client starts over
+    body = SYNC_COLLECTION.format(token="urn:nijical:sync:unknown")
+    status, _, data = client.request("REPORT", path, body)
+    is_rejected = status == 403 and b"valid-sync-token" in data
+    results.append(check(is_rejected, "unknown token is rejected"))
+
+    # Fetch some events
+    hrefs = list(etags)[:3]
+    body = MULTIGET.format(hrefs="".join(f"<D:href>{href}</D:href>" for href in hrefs))
+    status, _, data = client.request("REPORT", path, body, {"Depth": "1"})
+    multistatus = ET.fromstring(data)
+    calendar_data = [
+        element.text or ""
+        for element in multistatus.findall(f".//{tag(CALDAV, 'calendar-data')}")
+    ]
+    results.append(
+        check(
+            status == 207
+            and get_etags(multistatus) == {href: etags[href] for href in hrefs}
+            and all("BEGIN:VEVENT" in text for text in calendar_data),
+            f"multiget returns {len(calendar_data)} events with the same ETags",
+        )
+    )
+
+    status, headers, data = client.request("GET", hrefs[0])
+    etag = etags[hrefs[0]]
+    results.append(check(status == 200 and headers.get("ETag") == etag, "GET an event"))
+    status, _, _ = client.request("GET", hrefs[0], headers={"If-None-Match": etag})
+    results.append(check(status == 304, "conditional GET of an event returns 304"))
+
+    if args.events is not None:
+        results += check_changes(client, path, args.events, args.pid)
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+Check of PostingScheduler and HttpTransport against tools/stub_x_api.py.
+
+Posts a Japanese and an English thread, stops the run once in the middle of
+the English thread as if the job failed, then runs again with the same state
+file. Every tweet must be posted exactly once (the stub rejects duplicates)
+in spite of the 429 and 503 responses of the stub.
+
+When the stub runs with --challenge, the posts must go through the fallback,
+which stands in for PlaywrightTransport by sending a browser User-Agent.
+
+Usage:
+    python tools/stub_x_api.py --port 8002 --limit 5 --window 3
+    python tools/check_posting.py --url http://127.0.0.1:8002/2/tweets
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nijical.posting import (  # noqa: E402
+    HttpTransport,
+    PlaywrightTransport,
+    PostingError,
+    PostingScheduler,
+    PostingState,
+    PostResponse,
+)
+
+
+class CheckTransport:
+    def __init__(self, url: str, fail_at: str | None = None) -> None:
+        browser_session = requests.Session()
+        browser_session.headers["User-Agent"] = PlaywrightTransport.user_agent
+        self.http = HttpTransport(HttpTransport(url=url, session=browser_session), url)
+        self.fail_at = fail_at
+        self.seconds: list[float] = []
+
+    def post(self, auth, text: str) -> PostResponse:
+        if text == self.fail_at:
+            # Stop the run as if the credentials were revoked in the middle
+            return PostResponse(401, {}, '{"title": "Unauthorized"}')
+
+        started = time.perf_counter()
+        response = self.http.post(auth, text)
+        self.seconds.append(time.perf_counter() - started)
+        return response
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", default="http://127.0.0.1:8002/2/tweets")
+    parser.add_argument("--tweets", type=int, default=6, help="tweets per thread")
+    args = parser.parse_args()
+
+    nonce = os.urandom(4).hex()
+    threads = {
+        f"{lang}:{nonce}": [f"{lang} {nonce} {i}" for i in range(args.tweets)]
+        for lang in ("ja", "en")
+    }
+    total = sum(len(texts) for texts in threads.values())
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        state_path = os.path.join(temp_dir, "posting_state.json")
+
+        # First run: fails in the middle of the English thread
+        scheduler = PostingScheduler(
+            CheckTransport(args.url, fail_at=f"en {nonce} {args.tweets // 2}"),
+            PostingState(state_path),
+            reset_jitter=0.5,
+            base_delay=0.2,
+        )
+        try:
+            for key, texts in threads.items():
+                scheduler.post_thread(key, None, texts)
+        except PostingError as error:
+            print(f"First run stopped: {error}")
+        with open(state_path, encoding="utf_8") as file:
+            posted_first = sum(
+                len(thread["ids"]) for thread in json.load(file).values()
+            )
+
+        # Second run: resumes from the state file
+        transport = CheckTransport(args.url)
+        scheduler = PostingScheduler(
+            transport,
+            PostingState(state_path),
+            reset_jitter=0.5,
+            base_delay=0.2,
+        )
+        ids: list[str] = []
+        for key, texts in threads.items():
+            ids += scheduler.post_thread(key, None, texts)
+
+    print(f"{posted_first} tweets in the first run, {len(ids)} in total")
+    if transport.http.is_challenged:
+        print("Posted through the fallback after a Cloudflare challenge")
+    seconds = sorted(transport.seconds)
+    print(f"Median request: {seconds[len(seconds) // 2] * 1000:.1f} ms")
+    if len(ids) != total or len(set(ids)) != total:
+        print(f"FAIL expected {total} distinct tweets")
+        return 1
+    if posted_first in (0, total):
+        print("FAIL the first run should stop in the middle")
+        return 1
+
+    print("OK")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
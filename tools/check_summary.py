@@ -0,0 +1,89 @@
+"""
+Check that the summary of nijical diff fits in the update tweets.
+
+Builds change sets with short and long titles of the added events and checks
+each summary line with parse_tweet after the prefix of
+tweet_calendar_update.py: short titles are kept as they are and long titles
+are shortened with "…". Titles which can't fit under a stricter check leave
+only the counts.
+
+Usage:
+    python tools/check_summary.py
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pkg_resources_compat  # noqa: E402, F401
+from twitter_text import parse_tweet  # noqa: E402
+
+from nijical.diff import (  # noqa: E402
+    UPDATE_TWEET_PREFIXES,
+    Change,
+    ChangeSet,
+    KindChanges,
+)
+
+
+def check(condition: bool, message: str) -> bool:
+    print(("OK   " if condition else "FAIL ") + message)
+    return condition
+
+
+def create_change_set(title: str, eng_title: str, count: int) -> ChangeSet:
+    added = [
+        Change(uid=f"event-{index}", name=title, eng_name=eng_title)
+        for index in range(count)
+    ]
+    return ChangeSet(
+        events=KindChanges(added=added, changed=added[:1]),
+        tickets=KindChanges(removed=added[:2]),
+        talents=KindChanges(changed=added[:1]),
+    )
+
+
+def main() -> int:
+    results: list[bool] = []
+
+    def is_valid(line: str, is_english: bool) -> bool:
+        return parse_tweet(UPDATE_TWEET_PREFIXES[is_english] + line).valid
+
+    def generate(change_set: ChangeSet, is_english: bool) -> str:
+        return change_set.generate_summary(
+            is_english, is_valid=lambda line: is_valid(line, is_english)
+        )
+
+    short = create_change_set("ライブA", "Live A", 3)
+    for is_english, title in ((False, "「ライブA」"), (True, "Live A")):
+        line = generate(short, is_english)
+        results.append(check(title in line and "…" not in line, f"short: {line}"))
+
+    results.append(
+        check("1 liver changed" in generate(short, True), "kind labels are lowercase")
+    )
+
+    long = create_change_set(
+        "にじさんじ" * 20 + "ライブ", "Nijisanji " * 20 + "Live", 3
+    )
+    for is_english in (False, True):
+        line = generate(long, is_english)
+        results.append(
+            check(is_valid(line, is_english) and "…" in line, f"long: {line}")
+        )
+
+    # Titles which can't fit at all leave only the counts
+    for is_english in (False, True):
+        line = long.generate_summary(
+            is_english, is_valid=lambda line: "…" not in line and len(line) < 80
+        )
+        counts_only = long.generate_summary_line(is_english, 0, None)
+        results.append(check(line == counts_only, f"counts only: {line}"))
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
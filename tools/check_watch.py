@@ -0,0 +1,183 @@
+"""
+Check that the watch mode writes the same files as a full generation.
+
+Copies docs/data/*.csv into a temporary directory and runs Watcher.update
+through a series of edits of events.csv: a changed title, a removed row, an
+added row, changed participants, a moved date and finally the original file
+again. Then the calendars are generated from the final CSV files with the
+manifest of the watch mode in another directory, and every file of both
+outputs is compared: calendars, month shards, geo and search indices.
+
+Usage:
+    python tools/check_watch.py [--now 2026-10-19T00:00:00+00:00]
+"""
+
+import argparse
+import csv
+import filecmp
+import os
+import shutil
+import sys
+import tempfile
+from typing import Callable
+
+import arrow
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nijical import NijiCal  # noqa: E402
+from nijical.watch import Watcher  # noqa: E402
+from settings import url_prefix  # noqa: E402
+
+CSV_FILES = ["talents.csv", "events.csv", "tickets.csv"]
+OUTPUT_DIRECTORIES = ["ja", "en", "data/shards", "data/geo", "data/search"]
+
+Row = list[str]
+
+
+def check(condition: bool, message: str) -> bool:
+    print(("OK   " if condition else "FAIL ") + message)
+    return condition
+
+
+def create_instance(output_root: str, now: arrow.Arrow) -> NijiCal:
+    data = f"{output_root}/data"
+    return NijiCal(
+        f"{data}/talents.csv",
+        f"{data}/events.csv",
+        f"{data}/tickets.csv",
+        url_prefix,
+        output_root=output_root,
+        now=now,
+    )
+
+
+def prepare(output_root: str) -> None:
+    for directory in ("ja", "en", "data"):
+        os.makedirs(f"{output_root}/{directory}", exist_ok=True)
+    for name in CSV_FILES:
+        shutil.copy(f"{ROOT}/docs/data/{name}", f"{output_root}/data/{name}")
+
+
+def get_edits(header: Row, rows: list[Row]) -> list[tuple[str, Callable]]:
+    """
+    Get the edits of the event rows, each applied to the result of the last.
+    """
+    columns = {name: index for index, name in enumerate(header)}
+    summary = columns["イベント名"]
+    uid = columns["UID"]
+    dates = [columns["開始日時"], columns["終了日時"]]
+    talents = columns["参加者"]
+
+    def change_title(rows: list[Row]) -> list[Row]:
+        rows = [list(row) for row in rows]
+        rows[10][summary] += "（追加公演）"
+        return rows
+
+    def remove_row(rows: list[Row]) -> list[Row]:
+        return rows[:20] + rows[21:]
+
+    def add_row(rows: list[Row]) -> list[Row]:
+        row = list(rows[30])
+        row[uid] = "00000000-0000-4000-8000-000000000000"
+        row[summary] += "（再演）"
+        return rows + [row]
+
+    def change_talents(rows: list[Row]) -> list[Row]:
+        rows = [list(row) for row in rows]
+        rows[40][talents], rows[41][talents] = rows[41][talents], rows[40][talents]
+        return rows
+
+    def move_date(rows: list[Row]) -> list[Row]:
+        rows = [list(row) for row in rows]
+        for column in dates:
+            date = arrow.get(rows[50][column].strip(), "YYYY/MM/DD HH:mm")
+            rows[50][column] = date.shift(days=40).format("YYYY/MM/DD HH:mm")
+        return rows
+
+    return [
+        ("change a title", change_title),
+        ("remove a row", remove_row),
+        ("add a row", add_row),
+        ("change participants", change_talents),
+        ("move a date", move_date),
+        ("restore the file", lambda _: rows),
+    ]
+
+
+def compare(expected_root: str, actual_root: str) -> list[str]:
+    """
+    Get the paths of the files which differ or exist in only one output.
+    """
+    differences: list[str] = []
+    for directory in OUTPUT_DIRECTORIES:
+        paths: set[str] = set()
+        for root in (expected_root, actual_root):
+            for current, _, names in os.walk(f"{root}/{directory}"):
+                relative = os.path.relpath(current, root)
+                paths.update(f"{relative}/{name}" for name in names)
+        for path in sorted(paths):
+            expected = f"{expected_root}/{path}"
+            actual = f"{actual_root}/{path}"
+            if not (
+                os.path.isfile(expected)
+                and os.path.isfile(actual)
+                and filecmp.cmp(expected, actual, shallow=False)
+            ):
+                differences.append(path)
+    return differences
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--now", default="2026-10-19T00:00:00+00:00", help="fixed current time"
+    )
+    args = parser.parse_args()
+    now = arrow.get(args.now)
+
+    path = f"{ROOT}/docs/data/events.csv"
+    with open(path, encoding="utf_8", newline="") as file:
+        header, *rows = list(csv.reader(file))
+
+    with tempfile.TemporaryDirectory() as temp:
+        watch_root = f"{temp}/watch"
+        full_root = f"{temp}/full"
+        prepare(watch_root)
+        prepare(full_root)
+        shutil.copy(
+            f"{ROOT}/docs/data/manifest.json", f"{watch_root}/data/manifest.json"
+        )
+
+        instance = create_instance(watch_root, now)
+        watcher = Watcher(instance)
+        watcher.try_update(set())
+        current = rows
+        for label, edit in get_edits(header, rows):
+            print(f"Edit: {label}", file=sys.stderr)
+            current = edit(current)
+            path = instance.event_data_path
+            with open(path, mode="w", encoding="utf_8", newline="") as file:
+                csv.writer(file).writerows([header] + current)
+            watcher.update({path})
+
+        # The same stamps as the watch mode, so only the generation differs
+        shutil.copy(
+            f"{watch_root}/data/manifest.json", f"{full_root}/data/manifest.json"
+        )
+        create_instance(full_root, now).generate_all()
+
+        differences = compare(full_root, watch_root)
+        for path in differences[:10]:
+            print(f"  differs: {path}")
+        is_same = check(
+            len(differences) == 0,
+            f"watch output is the same as a full generation: {len(differences)} "
+            + "file(s) differ",
+        )
+        return 0 if is_same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
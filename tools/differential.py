@@ -0,0 +1,311 @@
+"""
+Differential check of the fast paths against the reference implementations.
+
+Generates random talents, events and dates around the edges of the rules of
+Event.has_talent and NijiCal.check_event_date: the organization-wide events
+bounded by the first tweet and the graduation of each talent, yearly and
+leap-day all-day events with repeat_until, timed events of 0 to 72 hours
+which touch the day boundaries, and ticket sales. For every registered pair,
+the fast path must return the same result as the reference on every case.
+
+    talent_events    Dataset.get_talent_events
+                     vs. filtering all_events with Event.has_talent
+    events_for_date  EventStore.get_events_for_date and check_event_date
+                     vs. check_event_date over all events
+
+A pair is a function decorated with @register which takes a Case and
+returns (reference, fast), each a function of the case whose results are
+compared with ==. The relative speed of each pair is reported; the cases
+are small and adversarial, so it is not the speed on the real data.
+
+Usage:
+    python tools/differential.py [--cases 200] [--seed 0] [--events 200]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+import arrow
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nijical import NijiCal  # noqa: E402
+from nijical.dataset import Dataset  # noqa: E402
+from nijical.event import Event, EventType  # noqa: E402
+from nijical.nijical import NIJISANJI  # noqa: E402
+from nijical.store import EventStore  # noqa: E402
+from nijical.talent import Talent  # noqa: E402
+
+TZINFO = "+09:00"
+# Durations of the timed events in seconds, around whole days
+DURATIONS = [0, 1, 3600, 86399, 86400, 86401, 172799, 172800, 172801, 259200]
+
+
+@dataclass
+class Case:
+    seed: int
+    dataset: Dataset
+    dates: list[arrow.Arrow]
+
+
+class CaseGenerator:
+    def __init__(self, seed: int, event_count: int, talent_count: int) -> None:
+        self.rng = random.Random(seed)
+        self.seed = seed
+        self.event_count = event_count
+        self.talent_count = talent_count
+        # Times which the talents and the events share, so that the bounds
+        # are often hit exactly
+        self.anchors = [
+            arrow.get(2020, 2, 29, tzinfo=TZINFO),
+            arrow.get(2023, 12, 31, 23, 59, 59, tzinfo=TZINFO),
+            arrow.get(2024, 1, 1, tzinfo=TZINFO),
+            arrow.get(2024, 2, 28, 15, tzinfo=TZINFO),
+            arrow.get(2024, 2, 29, tzinfo=TZINFO),
+            arrow.get(2024, 3, 1, 0, 0, 1, tzinfo=TZINFO),
+            arrow.get(2025, 6, 15, 12, 30, tzinfo=TZINFO),
+        ]
+
+    def get_time(self) -> arrow.Arrow:
+        rng = self.rng
+        time = rng.choice(self.anchors)
+        if rng.random() < 0.5:
+            time = time.shift(days=rng.randint(-400, 400))
+        if rng.random() < 0.3:
+            time = time.shift(seconds=rng.choice([-1, 1, -3600, 3600]))
+        if rng.random() < 0.1:
+            # Same instant in another time zone
+            time = time.to("utc")
+        return time
+
+    def get_day(self) -> arrow.Arrow:
+        return self.get_time().to(TZINFO).floor("day")
+
+    def generate(self) -> Case:
+        talents = {
+            talent.name: talent
+            for talent in map(self.generate_talent, range(self.talent_count))
+        }
+        talents[NIJISANJI] = self.generate_talent(-1, is_organization=True)
+
+        live_events: list[Event] = []
+        talent_events: list[Event] = []
+        for index in range(self.event_count):
+            event = self.generate_event(index, list(talents.values()))
+            if event.event_type == EventType.EVENT:
+                live_events.append(event)
+            else:
+                talent_events.append(event)
+
+        dataset = Dataset(
+            talents=talents,
+            live_events=live_events,
+            talent_events=talent_events,
+            version=str(self.seed),
+        )
+        dates = [self.get_time().to(TZINFO) for _ in range(8)]
+        return Case(self.seed, dataset, dates)
+
+    def generate_talent(self, index: int, is_organization: bool = False) -> Talent:
+        rng = self.rng
+        name = NIJISANJI if is_organization else f"ライバー{index}"
+        first_tweet = self.get_time()
+        graduation = None
+        if not is_organization and rng.random() < 0.4:
+            graduation = self.get_day() if rng.random() < 0.7 else self.get_time()
+        return Talent(
+            uid=f"talent-{index}",
+            name=name,
+            eng_name="Nijisanji" if is_organization else f"Liver {index}",
+            furigana=name,
+            birthday=None,
+            birthday_label=None,
+            eng_birthday_label=None,
+            first_tweet_datetime=first_tweet,
+            first_stream_datetime=first_tweet,
+            youtube_url="",
+            twitter_url=None,
+            twitch_url=None,
+            description="",
+            eng_description="",
+            graduation_date=graduation,
+            timestamp=first_tweet,
+            is_organization=is_organization,
+        )
+
+    def generate_event(self, index: int, talents: list[Talent]) -> Event:
+        rng = self.rng
+        event_type = rng.choice(
+            [EventType.EVENT] * 3
+            + [
+                EventType.BIRTHDAY,
+                EventType.ANNIVERSARY,
+                EventType.TICKET_BEGIN,
+                EventType.TICKET_END,
+            ]
+        )
+        all_day = event_type in (EventType.BIRTHDAY, EventType.ANNIVERSARY) or (
+            event_type == EventType.EVENT and rng.random() < 0.3
+        )
+        yearly = all_day and rng.random() < 0.6
+        repeat_until = None
+        if all_day:
+            begin = self.get_day()
+            end = begin.shift(days=rng.choice([1, 1, 2, 3]))
+            if yearly and rng.random() < 0.4:
+                repeat_until = self.get_time()
+        elif event_type == EventType.EVENT:
+            begin = self.get_time()
+            end = begin.shift(seconds=rng.choice(DURATIONS))
+        else:
+            begin = self.get_time()
+            end = begin.shift(hours=rng.choice([0, 1]))
+
+        participants = rng.sample(talents, rng.randint(0, min(3, len(talents))))
+        return Event(
+            uid=f"event-{index}",
+            timestamp=begin,
+            begin=begin,
+            end=end,
+            all_day=all_day,
+            yearly=yearly,
+            repeat_until=repeat_until,
+            summary=f"イベント{index}",
+            eng_summary=f"Event {index}",
+            location=None,
+            eng_location=None,
+            geo=None,
+            description="",
+            eng_description="",
+            url=None,
+            talents=participants,
+            event_type=event_type,
+        )
+
+
+Pair = Callable[[Case], tuple[Callable[[Case], object], Callable[[Case], object]]]
+PAIRS: dict[str, Pair] = {}
+
+
+def register(function: Pair) -> Pair:
+    PAIRS[function.__name__] = function
+    return function
+
+
+@register
+def talent_events(case: Case):
+    talents = list(case.dataset.talents.values())
+
+    def reference(case: Case) -> list[list[str]]:
+        all_events = case.dataset.all_events
+        return [
+            [event.uid for event in all_events if event.has_talent(talent)]
+            for talent in talents
+        ]
+
+    def fast(case: Case) -> list[list[str]]:
+        # A new dataset, so that building the index is measured
+        dataset = Dataset(
+            talents=case.dataset.talents,
+            live_events=case.dataset.live_events,
+            talent_events=case.dataset.talent_events,
+            version=case.dataset.version,
+        )
+        return [
+            [event.uid for event in dataset.get_talent_events(talent)]
+            for talent in talents
+        ]
+
+    return reference, fast
+
+
+@register
+def events_for_date(case: Case):
+    instance = NijiCal("", "", "", url_prefix="")
+
+    def reference(case: Case) -> list[tuple[list[str], list[str]]]:
+        return [
+            tuple(
+                sorted(
+                    event.uid
+                    for event in events
+                    if instance.check_event_date(event, date)
+                )
+                for events in (case.dataset.live_events, case.dataset.talent_events)
+            )
+            for date in case.dates
+        ]
+
+    def fast(case: Case) -> list[tuple[list[str], list[str]]]:
+        # Imported once per run like tweet_todays_events.py
+        with EventStore(":memory:") as store:
+            store.import_dataset(case.dataset)
+            return [
+                tuple(
+                    sorted(
+                        event.uid
+                        for event in events
+                        if instance.check_event_date(event, date)
+                    )
+                    for events in store.get_events_for_date(date)
+                )
+                for date in case.dates
+            ]
+
+    return reference, fast
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cases", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first case")
+    parser.add_argument("--events", type=int, default=200, help="events per case")
+    parser.add_argument("--talents", type=int, default=12, help="talents per case")
+    parser.add_argument(
+        "--pair", action="append", choices=list(PAIRS), help="pairs to check"
+    )
+    args = parser.parse_args()
+
+    names = args.pair if args.pair is not None else list(PAIRS)
+    seconds = {name: [0.0, 0.0] for name in names}
+    failures = 0
+    for seed in range(args.seed, args.seed + args.cases):
+        case = CaseGenerator(seed, args.events, args.talents).generate()
+        for name in names:
+            reference, fast = PAIRS[name](case)
+            results = []
+            for index, function in enumerate((reference, fast)):
+                started = time.perf_counter()
+                results.append(function(case))
+                seconds[name][index] += time.perf_counter() - started
+            if results[0] != results[1]:
+                failures += 1
+                print(f"FAIL {name} differs on seed {seed}")
+                for index, (expected, actual) in enumerate(zip(*results)):
+                    if expected != actual:
+                        print(f"  item {index}: reference {expected}, fast {actual}")
+                        break
+
+    for name in names:
+        reference_seconds, fast_seconds = seconds[name]
+        print(
+            f"{name:>16}: reference {reference_seconds * 1000:8.1f} ms, "
+            + f"fast {fast_seconds * 1000:8.1f} ms, "
+            + f"{reference_seconds / fast_seconds:5.2f}x"
+        )
+
+    if failures > 0:
+        print(f"{failures} failure(s) in {args.cases} cases")
+        return 1
+    print(f"OK {args.cases} cases")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
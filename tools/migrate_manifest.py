@@ -0,0 +1,134 @@
+"""
+Migrate the DTSTAMP manifest to the current MANIFEST_VERSION.
+
+The manifest records a hash of the rendered content of every VEVENT, so a
+change of the rendering alone would advance DTSTAMP and SEQUENCE of every
+event it touches. This renders each event as the version of the manifest
+did and as the current code does: an entry whose hash is the same as the
+old rendering only changed by the rendering, and gets the new hash with its
+DTSTAMP and SEQUENCE kept. Other entries are kept as they are, so events
+whose data changed are still advanced by the next generation.
+
+    1 -> 2  TEXT values are escaped as RFC 5545 requires; before, only
+            newlines were replaced (rendered like tools/benchmark_escaping.py)
+
+Usage:
+    python tools/migrate_manifest.py [--data docs/data] [--manifest docs/data/manifest.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+from typing import Callable
+
+import arrow
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nijical import NijiCal  # noqa: E402
+from nijical.event import Event  # noqa: E402
+from nijical.manifest import (  # noqa: E402
+    MANIFEST_VERSION,
+    StampManifest,
+    get_unique_key,
+    write_manifest,
+)
+
+
+def generate_text_properties_v1(self: Event, is_english: bool) -> str:
+    """
+    Text properties as rendered by version 1: newlines only.
+    """
+    summary = self.eng_summary if is_english else self.summary
+    location = self.eng_location if is_english else self.location
+    result = self.param("SUMMARY", summary)
+    if type(location) is str:
+        result += self.param("LOCATION", location)
+    if type(self.geo) is str:
+        result += (
+            f'X-APPLE-STRUCTURED-LOCATION;VALUE=URI;X-TITLE="{location}":'
+            + f"geo:{self.geo}\r\n"
+        )
+    return result + self.param(
+        "DESCRIPTION", self.generate_description(is_english=is_english)
+    )
+
+
+# Version: renderer of the text properties of that version
+RENDERERS: dict[int, Callable[[Event, bool], str]] = {
+    1: generate_text_properties_v1,
+}
+
+
+def get_hashes(
+    instance: NijiCal, renderer: Callable[[Event, bool], str] | None = None
+) -> dict[str, str]:
+    """
+    Get the content hash of every event by its key in the manifest.
+    """
+    # Events are loaded again, so nothing rendered by another renderer is
+    # reused
+    dataset = instance.load_dataset()
+    # Only used for get_hash; no manifest is read
+    hasher = StampManifest(os.devnull, instance.now)
+    current = Event.generate_text_properties
+    if renderer is not None:
+        Event.generate_text_properties = renderer
+    try:
+        hashes: dict[str, str] = {}
+        # Same order and keys as StampManifest.apply in NijiCal.load_dataset
+        for event in dataset.live_events + dataset.talent_events:
+            hashes[get_unique_key(event.uid, hashes)] = hasher.get_hash(event)
+        return hashes
+    finally:
+        Event.generate_text_properties = current
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--data", default="docs/data", help="directory of the CSV files"
+    )
+    parser.add_argument("--manifest", default="docs/data/manifest.json")
+    args = parser.parse_args()
+
+    with open(args.manifest, encoding="utf_8") as file:
+        data = json.load(file)
+    version = data.get("version", 1)
+    entries: dict[str, list] = data["events"]
+    if version == MANIFEST_VERSION:
+        print(f"{args.manifest} is already version {version}")
+        return 0
+    if version not in RENDERERS:
+        print(f"Can't migrate version {version}", file=sys.stderr)
+        return 1
+
+    instance = NijiCal(
+        f"{args.data}/talents.csv",
+        f"{args.data}/events.csv",
+        f"{args.data}/tickets.csv",
+        url_prefix="",
+        now=arrow.utcnow(),
+    )
+    old_hashes = get_hashes(instance, RENDERERS[version])
+    new_hashes = get_hashes(instance)
+
+    migrated = 0
+    for key, entry in entries.items():
+        if key in new_hashes and entry[0] == old_hashes[key]:
+            if entry[0] != new_hashes[key]:
+                migrated += 1
+            entry[0] = new_hashes[key]
+
+    write_manifest(args.manifest, entries)
+    print(
+        f"Migrated {args.manifest} from version {version} to {MANIFEST_VERSION}: "
+        + f"{migrated} of {len(entries)} hashes changed by the rendering"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+Regression gate of the calendar generation.
+
+Regenerates all calendars from docs/data/*.csv into a temporary directory,
+byte-compares them with the committed docs/ja and docs/en, and fails if the
+wall time or the peak memory regresses beyond the threshold relative to the
+stored baseline. The generation runs in a child process so that its peak
+RSS can be measured. Timings depend on the machine, so record the baseline
+on the machine which runs the gate.
+
+Usage:
+    python tools/regression_gate.py [--repeat 3] [--threshold 1.25]
+    python tools/regression_gate.py --now 2026-10-19T00:00:00+00:00 --update-baseline
+"""
+
+import argparse
+import filecmp
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "tools", "regression_baseline.json")
+DATA_FILES = ["talents.csv", "events.csv", "tickets.csv", "manifest.json"]
+
+
+def generate(output_root: str, now: str) -> None:
+    """
+    Generate the calendars; run in the child process.
+    """
+    sys.path.insert(0, ROOT)
+    import arrow
+    from nijical import NijiCal
+    from settings import url_prefix
+
+    data = os.path.join(output_root, "data")
+    instance = NijiCal(
+        f"{data}/talents.csv",
+        f"{data}/events.csv",
+        f"{data}/tickets.csv",
+        url_prefix,
+        output_root=output_root,
+        now=arrow.get(now),
+    )
+
+    started = time.perf_counter()
+    instance.generate_all()
+    seconds = time.perf_counter() - started
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    peak_mib = peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    print(json.dumps({"seconds": seconds, "peak_mib": peak_mib}))
+
+
+def run_once(now: str) -> tuple[dict, list[str]]:
+    """
+    Generate the calendars into a temporary directory and compare them.
+
+    Returns:
+        Tuple of the measurements and the names of the different files
+    """
+    with tempfile.TemporaryDirectory() as output_root:
+        os.makedirs(os.path.join(output_root, "data"))
+        for lang in ["ja", "en"]:
+            os.makedirs(os.path.join(output_root, lang))
+        # The manifest keeps DTSTAMP of the committed events
+        for name in DATA_FILES:
+            shutil.copy(
+                os.path.join(ROOT, "docs", "data", name),
+                os.path.join(output_root, "data", name),
+            )
+
+        result = subprocess.run(
+            [sys.executable, __file__, "--child", output_root, "--now", now],
+            cwd=ROOT,
+            stdout=subprocess.PIPE,
+            check=True,
+        )
+        measurement = json.loads(result.stdout.decode("utf_8").splitlines()[-1])
+
+        differences: list[str] = []
+        for lang in ["ja", "en"]:
+            expected_dir = os.path.join(ROOT, "docs", lang)
+            actual_dir = os.path.join(output_root, lang)
+            # Calendars of removed talents are left in docs, so only the
+            # generated files are compared
+            for name in sorted(os.listdir(actual_dir)):
+                if not os.path.isfile(os.path.join(expected_dir, name)):
+                    differences.append(f"{lang}/{name}")
+                elif not filecmp.cmp(
+                    os.path.join(expected_dir, name),
+                    os.path.join(actual_dir, name),
+                    shallow=False,
+                ):
+                    differences.append(f"{lang}/{name}")
+
+    return measurement, differences
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3, help="use the fastest run")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=None,
+        help="allowed ratio to the baseline (default: from the baseline)",
+    )
+    parser.add_argument(
+        "--now", default=None, help="fixed current time (default: from the baseline)"
+    )
+    parser.add_argument(
+        "--update-baseline",
+        action="store_true",
+        help="store the measurements as the new baseline",
+    )
+    parser.add_argument("--child", metavar="OUTPUT_ROOT", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        generate(args.child, args.now)
+        return 0
+
+    baseline: dict = {}
+    if os.path.isfile(BASELINE_PATH):
+        with open(BASELINE_PATH, encoding="utf_8") as file:
+            baseline = json.load(file)
+
+    now = args.now or baseline.get("now")
+    if now is None:
+        print("--now is required without a baseline", file=sys.stderr)
+        return 2
+
+    measurements: list[dict] = []
+    for _ in range(args.repeat):
+        measurement, differences = run_once(now)
+        if differences:
+            for name in differences:
+                print(f"FAIL output differs: {name}", file=sys.stderr)
+            print(f"{len(differences)} file(s) differ", file=sys.stderr)
+            return 1
+        measurements.append(measurement)
+
+    seconds = min(measurement["seconds"] for measurement in measurements)
+    peak_mib = min(measurement["peak_mib"] for measurement in measurements)
+    print(f"OK   output is identical; {seconds:.2f} s, peak {peak_mib:.1f} MiB")
+
+    if args.update_baseline:
+        baseline.update(
+            {
+                "now": now,
+                "seconds": round(seconds, 2),
+                "peak_mib": round(peak_mib, 1),
+                "threshold": baseline.get("threshold", 1.25),
+            }
+        )
+        with open(BASELINE_PATH, mode="w", encoding="utf_8") as file:
+            json.dump(baseline, file, indent=2)
+            file.write("\n")
+        print(f"Updated {os.path.relpath(BASELINE_PATH, ROOT)}")
+        return 0
+
+    if "seconds" not in baseline:
+        return 0
+
+    threshold = args.threshold or baseline.get("threshold", 1.25)
+    results: list[bool] = []
+    for label, value, key, unit in [
+        ("wall time", seconds, "seconds", "s"),
+        ("peak memory", peak_mib, "peak_mib", "MiB"),
+    ]:
+        limit = baseline[key] * threshold
+        is_ok = value <= limit
+        print(
+            ("OK   " if is_ok else "FAIL ")
+            + f"{label} {value:.2f} {unit} "
+            + f"(baseline {baseline[key]} {unit}, limit {limit:.2f} {unit})"
+        )
+        results.append(is_ok)
+
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
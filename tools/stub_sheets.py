@@ -0,0 +1,75 @@
+"""
+Local stand-in of the Google Sheets CSV export to check `python -m nijical fetch`.
+
+Serves the files in a directory at /<file name> with ETag and Last-Modified.
+With --ignore-validators, it always returns 200 like the real export sometimes does.
+
+Usage:
+    python tools/stub_sheets.py docs/data --port 8001
+    python -m nijical fetch --cache /tmp/fetch_cache.json \\
+        /tmp/talents.csv=http://127.0.0.1:8001/talents.csv
+"""
+
+import argparse
+import hashlib
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Handler(BaseHTTPRequestHandler):
+    def __init__(self, *args, root: str, ignore_validators: bool, **kwargs) -> None:
+        self.root = root
+        self.ignore_validators = ignore_validators
+        super().__init__(*args, **kwargs)
+
+    def do_GET(self) -> None:
+        path = os.path.join(self.root, os.path.basename(self.path.split("?")[0]))
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+
+        with open(path, mode="rb") as file:
+            data = file.read()
+        etag = '"' + hashlib.sha256(data).hexdigest()[:16] + '"'
+        mtime = int(os.path.getmtime(path))
+
+        if not self.ignore_validators and self.is_not_modified(etag, mtime):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", formatdate(mtime, usegmt=True))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def is_not_modified(self, etag: str, mtime: int) -> bool:
+        if "If-None-Match" in self.headers:
+            return self.headers["If-None-Match"] == etag
+        if "If-Modified-Since" in self.headers:
+            since = parsedate_to_datetime(self.headers["If-Modified-Since"])
+            return mtime <= since.timestamp()
+        return False
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("root", help="directory of the CSV files")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--ignore-validators", action="store_true")
+    args = parser.parse_args()
+
+    handler = partial(
+        Handler, root=args.root, ignore_validators=args.ignore_validators
+    )
+    ThreadingHTTPServer(("127.0.0.1", args.port), handler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Local stand-in of POST /2/tweets of the X API to check the posting scheduler.
+
+Allows --limit posts per --window seconds and returns 429 with
+x-rate-limit-remaining and x-rate-limit-reset after that, like the real API.
+Every --fail-every-th request gets 503, and a text posted before gets 403
+as a duplicate, so a scheduler which posts a tweet twice fails. With
+--challenge, requests without a browser User-Agent get a Cloudflare
+challenge page.
+
+Usage:
+    python tools/stub_x_api.py --port 8002 --limit 5 --window 3
+    python tools/check_posting.py --url http://127.0.0.1:8002/2/tweets
+"""
+
+import argparse
+import json
+import threading
+import time
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubState:
+    def __init__(
+        self, limit: int, window: float, fail_every: int, challenge: bool
+    ) -> None:
+        self.limit = limit
+        self.window = window
+        self.fail_every = fail_every
+        self.challenge = challenge
+        self.lock = threading.Lock()
+        self.window_start = time.time()
+        self.count_in_window = 0
+        self.request_count = 0
+        self.texts: list[str] = []
+
+
+class Handler(BaseHTTPRequestHandler):
+    def __init__(self, *args, state: StubState, **kwargs) -> None:
+        self.state = state
+        super().__init__(*args, **kwargs)
+
+    def do_POST(self) -> None:
+        if self.path.split("?")[0] != "/2/tweets":
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        text = json.loads(self.rfile.read(length))["text"]
+
+        state = self.state
+        if state.challenge and "Mozilla" not in self.headers.get("User-Agent", ""):
+            self.send_challenge()
+            return
+
+        with state.lock:
+            now = time.time()
+            if now >= state.window_start + state.window:
+                state.window_start = now
+                state.count_in_window = 0
+            reset = int(state.window_start + state.window) + 1
+            state.request_count += 1
+
+            if state.fail_every > 0 and state.request_count % state.fail_every == 0:
+                self.send_json(503, {"title": "Service Unavailable"})
+                return
+
+            if state.count_in_window >= state.limit:
+                self.send_json(429, {"title": "Too Many Requests"}, 0, reset)
+                return
+
+            state.count_in_window += 1
+            remaining = state.limit - state.count_in_window
+            if text in state.texts:
+                detail = "You are not allowed to create a Tweet with duplicate content."
+                self.send_json(403, {"detail": detail}, remaining, reset)
+                return
+
+            state.texts.append(text)
+            tweet_id = str(len(state.texts))
+
+        self.send_json(201, {"data": {"id": tweet_id, "text": text}}, remaining, reset)
+
+    def send_json(
+        self,
+        status: int,
+        body: dict,
+        remaining: int | None = None,
+        reset: int | None = None,
+    ) -> None:
+        data = json.dumps(body).encode("utf_8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        if remaining is not None:
+            self.send_header("x-rate-limit-limit", str(self.state.limit))
+            self.send_header("x-rate-limit-remaining", str(remaining))
+            self.send_header("x-rate-limit-reset", str(reset))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_challenge(self) -> None:
+        data = b"<!DOCTYPE html><title>Just a moment...</title>"
+        self.send_response(403)
+        self.send_header("Content-Type", "text/html; charset=UTF-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("cf-mitigated", "challenge")
+        self.send_header("cf-ray", "0123456789abcdef-NRT")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def create_server(
+    port: int, limit: int, window: float, fail_every: int, challenge: bool
+) -> ThreadingHTTPServer:
+    state = StubState(limit, window, fail_every, challenge)
+    return ThreadingHTTPServer(("127.0.0.1", port), partial(Handler, state=state))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8002)
+    parser.add_argument("--limit", type=int, default=5, help="posts per window")
+    parser.add_argument("--window", type=float, default=3.0, help="seconds")
+    parser.add_argument(
+        "--fail-every", type=int, default=4, help="return 503 every N requests"
+    )
+    parser.add_argument(
+        "--challenge", action="store_true", help="challenge non-browser clients"
+    )
+    args = parser.parse_args()
+
+    server = create_server(
+        args.port, args.limit, args.window, args.fail_every, args.challenge
+    )
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
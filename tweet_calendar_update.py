@@ -1,97 +1,41 @@
+import argparse
 import arrow
-import json
 import os
 import sys
-from playwright.sync_api import sync_playwright
 from requests_oauthlib import OAuth1
+import pkg_resources_compat  # noqa: F401  # twitter_text より前に import すること
+from twitter_text import parse_tweet
+from nijical.diff import UPDATE_TWEET_PREFIXES
+from nijical.posting import HttpTransport, PlaywrightTransport, PostingError, PostingScheduler, PostingState
+from nijical.profiling import Profiler
 from settings import debug
 
-def create_oauth_header(auth, method: str, url: str, body: str = None):
-    """
-    Create OAuth 1.0a authorization header.
-
-    Args:
-        auth: OAuth1 instance
-        method: HTTP method
-        url: Request URL
-        body: Optional request body
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--state", help="JSON file to resume the posting from")
+    Profiler.add_arguments(parser)
+    return parser.parse_args()
 
-    Returns:
-        str: Authorization header value
+def fit_tweet(text: str) -> str:
     """
-    from requests import Request
-    headers = {"Content-Type": "application/json"} if body else {}
-    body_bytes = body.encode('utf-8') if body else None
-    req = Request(method, url, data=body_bytes, headers=headers)
-    prepared = req.prepare()
-    auth(prepared)
-
-    # Convert bytes to string if needed
-    auth_value = prepared.headers.get('Authorization', '')
-    if isinstance(auth_value, bytes):
-        return auth_value.decode('utf-8')
-    return str(auth_value)
-
-def create_tweet_with_playwright(browser, auth, text: str):
-    """
-    Create a tweet using Playwright to bypass Cloudflare protection.
-
-    Args:
-        browser: Playwright browser instance
-        auth: OAuth1 authentication
-        text: Tweet text
+    Shorten the text with '…' if it is too long for a tweet.
 
-    Returns:
-        dict: Twitter API response with tweet data
-
-    Raises:
-        Exception: If the tweet creation fails
+    `nijical diff` already fits the summary, but the body can be edited on GitHub.
     """
-    context = browser.new_context(
-        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    )
+    if parse_tweet(text).valid:
+        return text
+
+    while len(text) > 0 and not parse_tweet(text + '…').valid:
+        text = text[:-1]
+    return text + '…'
 
-    try:
-        url = "https://api.twitter.com/2/tweets"
-        payload = {"text": text}
-        body_str = json.dumps(payload)
-
-        # Generate OAuth header
-        auth_header = create_oauth_header(auth, 'POST', url, body_str)
-
-        headers = {
-            "Authorization": auth_header,
-            "Content-Type": "application/json"
-        }
-
-        # Make API request through Playwright
-        page = context.new_page()
-        response = page.request.post(url, data=body_str, headers=headers)
-
-        # Check for Cloudflare in response headers (both success and failure cases)
-        response_headers = response.headers
-        if 'cf-ray' in response_headers or 'cf-cache-status' in response_headers:
-            if response.status == 201:
-                print(f"✅ Cloudflare challenge passed successfully")
-            else:
-                print(f"⚠️  Cloudflare detected but request failed")
-            print(f"cf-ray: {response_headers.get('cf-ray', 'N/A')}")
-            print(f"cf-cache-status: {response_headers.get('cf-cache-status', 'N/A')}")
-
-        if response.status != 201:
-            error_detail = f"Status: {response.status}, Response: {response.text()}"
-            raise Exception(f"Failed to create tweet: {error_detail}")
-
-        return response.json()
-    finally:
-        context.close()
-
-def main() -> int:
+def main(args: argparse.Namespace) -> int:
     pr_body = os.environ["PR_BODY"]
 
     ja_body = ''
     en_body = ''
-    lines = pr_body.split("\n")
+    # The body is generated by `nijical diff`, or edited on GitHub with CRLF
+    lines = pr_body.strip().splitlines()
     if len(lines) != 2:
         print(f"Pull request body should have exactly 2 lines")
         return 1
@@ -99,8 +43,8 @@ def main() -> int:
     ja_body = lines[0]
     en_body = lines[1]
     
-    ja_text = f"カレンダーを更新しました: {ja_body}"
-    en_text = f"The calendar data has been updated: {en_body}"
+    ja_text = fit_tweet(UPDATE_TWEET_PREFIXES[False] + ja_body)
+    en_text = fit_tweet(UPDATE_TWEET_PREFIXES[True] + en_body)
 
     if debug:
         print(ja_text)
@@ -126,31 +70,26 @@ def main() -> int:
 
     tweet_failed = False
 
-    # Use Playwright to make requests through real browser context
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-
-        # Post Japanese tweet
-        try:
-            print(ja_text)
-            result = create_tweet_with_playwright(browser, ja_auth, ja_text)
-            print(f"Successfully posted Japanese tweet (ID: {result['data']['id']})")
-        except Exception as e:
-            print(f"Failed to tweet: {e}")
-            print(f"Tweet text: {ja_text}")
-            tweet_failed = True
-
-        # Post English tweet
-        try:
-            print(en_text)
-            result = create_tweet_with_playwright(browser, en_auth, en_text)
-            print(f"Successfully posted English tweet (ID: {result['data']['id']})")
-        except Exception as e:
-            print(f"Failed to tweet: {e}")
-            print(f"Tweet text: {en_text}")
-            tweet_failed = True
-
-        browser.close()
+    # Tweets already posted by a failed run are skipped
+    state = PostingState(args.state)
+    pr_key = os.environ.get('PR_NUMBER', ja_body)
+
+    # Post directly, and through a real browser context only if Cloudflare challenges
+    with HttpTransport(fallback=PlaywrightTransport()) as transport:
+        scheduler = PostingScheduler(transport, state)
+
+        for (label, key, auth, text) in [
+            ('Japanese', f"ja:{pr_key}", ja_auth, ja_text),
+            ('English', f"en:{pr_key}", en_auth, en_text),
+        ]:
+            try:
+                print(text)
+                (tweet_id,) = scheduler.post_thread(key, auth, [text])
+                print(f"Successfully posted {label} tweet (ID: {tweet_id})")
+            except PostingError as e:
+                print(f"Failed to tweet: {e}")
+                print(f"Tweet text: {text}")
+                tweet_failed = True
 
     if tweet_failed:
         return 1
@@ -158,4 +97,7 @@ def main() -> int:
     return 0
 
 if __name__ == "__main__":
-    sys.exit(main())
+    args = parse_args()
+    with Profiler.from_args(args):
+        status = main(args)
+    sys.exit(status)
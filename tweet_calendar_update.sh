@@ -1,3 +1,3 @@
 #!/bin/bash
 
-poetry run python tweet_calendar_update.py
+poetry run python tweet_calendar_update.py "$@"
@@ -1,95 +1,16 @@
+import argparse
 import arrow
-import json
 import os
 import sys
-from playwright.sync_api import sync_playwright
 from requests_oauthlib import OAuth1
 import pkg_resources_compat  # noqa: F401  # twitter_text より前に import すること
 from twitter_text import parse_tweet
 from nijical import NijiCal
+from nijical.posting import HttpTransport, PlaywrightTransport, PostingError, PostingScheduler, PostingState
+from nijical.profiling import Profiler
+from nijical.store import EventStore
 from settings import debug, url_prefix
 
-def create_oauth_header(auth, method: str, url: str, body: str = None):
-    """
-    Create OAuth 1.0a authorization header.
-
-    Args:
-        auth: OAuth1 instance
-        method: HTTP method
-        url: Request URL
-        body: Optional request body
-
-    Returns:
-        str: Authorization header value
-    """
-    from requests import Request
-    headers = {"Content-Type": "application/json"} if body else {}
-    body_bytes = body.encode('utf-8') if body else None
-    req = Request(method, url, data=body_bytes, headers=headers)
-    prepared = req.prepare()
-    auth(prepared)
-
-    # Convert bytes to string if needed
-    auth_value = prepared.headers.get('Authorization', '')
-    if isinstance(auth_value, bytes):
-        return auth_value.decode('utf-8')
-    return str(auth_value)
-
-def create_tweet_with_playwright(browser, auth, text: str):
-    """
-    Create a tweet using Playwright to bypass Cloudflare protection.
-
-    Args:
-        browser: Playwright browser instance
-        auth: OAuth1 authentication
-        text: Tweet text
-
-    Returns:
-        dict: Twitter API response with tweet data
-
-    Raises:
-        Exception: If the tweet creation fails
-    """
-    context = browser.new_context(
-        user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-    )
-
-    try:
-        url = "https://api.twitter.com/2/tweets"
-        payload = {"text": text}
-
-        body_str = json.dumps(payload)
-
-        # Generate OAuth header
-        auth_header = create_oauth_header(auth, 'POST', url, body_str)
-
-        headers = {
-            "Authorization": auth_header,
-            "Content-Type": "application/json"
-        }
-
-        # Make API request through Playwright
-        page = context.new_page()
-        response = page.request.post(url, data=body_str, headers=headers)
-
-        # Check for Cloudflare in response headers (both success and failure cases)
-        response_headers = response.headers
-        if 'cf-ray' in response_headers or 'cf-cache-status' in response_headers:
-            if response.status == 201:
-                print(f"✅ Cloudflare challenge passed successfully")
-            else:
-                print(f"⚠️  Cloudflare detected but request failed")
-            print(f"cf-ray: {response_headers.get('cf-ray', 'N/A')}")
-            print(f"cf-cache-status: {response_headers.get('cf-cache-status', 'N/A')}")
-
-        if response.status != 201:
-            error_detail = f"Status: {response.status}, Response: {response.text()}"
-            raise Exception(f"Failed to create tweet: {error_detail}")
-
-        return response.json()
-    finally:
-        context.close()
-
 def split_text_for_tweets(text_today: str, header_today: str, text_tomorrow: str, header_tomorrow: str) -> list[str]:
     """
     Split combined today/tomorrow events into multiple tweets if needed.
@@ -155,25 +76,22 @@ def split_text_for_tweets(text_today: str, header_today: str, text_tomorrow: str
 
     return result
 
-def main() -> int:
-    talent_file = sys.argv[1]
-    event_file = sys.argv[2]
-    ticket_file = sys.argv[3]
+def generate_tweets(today: arrow.Arrow, ja_text_today: str, en_text_today: str, ja_text_tomorrow: str, en_text_tomorrow: str) -> tuple[list[str], list[str]]:
+    """
+    Add the headers of the days to the event texts and split them into tweets.
 
-    # Optional: date argument (format: YYYY/MM/DD)
-    tzinfo = "+09:00"
-    if len(sys.argv) >= 5:
-        date_str = sys.argv[4]
-        today = arrow.get(date_str, "YYYY/MM/DD", tzinfo=tzinfo)
-    else:
-        today = arrow.now(tzinfo)
+    Args:
+        today: Date of the tweets
+        ja_text_today: Japanese text of today's events from generate_tweet_for_date
+        en_text_today: English text of today's events
+        ja_text_tomorrow: Japanese text of tomorrow's events
+        en_text_tomorrow: English text of tomorrow's events
 
-    instance = NijiCal(talent_file, event_file, ticket_file, url_prefix)
+    Returns:
+        Japanese and English tweet texts
+    """
     tomorrow = today.shift(days=1)
 
-    (ja_text_today, en_text_today) = instance.generate_tweet_for_date(today)
-    (ja_text_tomorrow, en_text_tomorrow) = instance.generate_tweet_for_date(tomorrow)
-
     ja_header_today = f"📅 今日：{today.format('M/D')}（{today.format('ddd', locale='ja')}）\n"
     if len(ja_text_today) == 0:
         ja_text_today = ja_header_today + "なし\n\n"
@@ -187,8 +105,6 @@ def main() -> int:
         ja_text_tomorrow = ja_header_tomorrow + ja_text_tomorrow
 
     ja_tweets = split_text_for_tweets(ja_text_today, ja_header_today, ja_text_tomorrow, ja_header_tomorrow)
-    for t in ja_tweets:
-        print(f"=====================\n{t}\n=====================\n")
 
     en_header_today = f"📅 Today: {today.format('ddd')}, {today.format('MMM D')} JST\n"
     if len(en_text_today) == 0:
@@ -203,7 +119,42 @@ def main() -> int:
         en_text_tomorrow = en_header_tomorrow + en_text_tomorrow
 
     en_tweets = split_text_for_tweets(en_text_today, en_header_today, en_text_tomorrow, en_header_tomorrow)
-    for t in en_tweets:
+
+    return (ja_tweets, en_tweets)
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("talent_file")
+    parser.add_argument("event_file")
+    parser.add_argument("ticket_file")
+    parser.add_argument("date", nargs="?", help="date to tweet (YYYY/MM/DD)")
+    parser.add_argument("--state", help="JSON file to resume the posting from")
+    Profiler.add_arguments(parser)
+    return parser.parse_args()
+
+def main(args: argparse.Namespace) -> int:
+    talent_file = args.talent_file
+    event_file = args.event_file
+    ticket_file = args.ticket_file
+
+    # Optional: date argument (format: YYYY/MM/DD)
+    tzinfo = "+09:00"
+    if args.date is not None:
+        today = arrow.get(args.date, "YYYY/MM/DD", tzinfo=tzinfo)
+    else:
+        today = arrow.now(tzinfo)
+
+    instance = NijiCal(talent_file, event_file, ticket_file, url_prefix)
+    tomorrow = today.shift(days=1)
+
+    # Parse the CSV files once and look up both days in the store
+    with EventStore(":memory:") as store:
+        store.import_dataset(instance.load_dataset())
+        (ja_text_today, en_text_today) = instance.generate_tweet_for_date(today, store)
+        (ja_text_tomorrow, en_text_tomorrow) = instance.generate_tweet_for_date(tomorrow, store)
+
+    ja_tweets, en_tweets = generate_tweets(today, ja_text_today, en_text_today, ja_text_tomorrow, en_text_tomorrow)
+    for t in ja_tweets + en_tweets:
         print(f"=====================\n{t}\n=====================\n")
 
     if debug:
@@ -235,37 +186,26 @@ def main() -> int:
 
     tweet_failed = False
 
-    # Use Playwright to make requests through real browser context
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-
-        # Post Japanese tweets
-        if ja_auth is not None:
-            for t in ja_tweets:
-                try:
-                    result = create_tweet_with_playwright(browser, ja_auth, t)
-                    tweet_id = result["data"]["id"]
-                    print(f"Successfully posted Japanese tweet (ID: {tweet_id})")
-                except Exception as e:
-                    print(f"Failed to tweet: {e}")
-                    print(f"Tweet text: {t}")
-                    tweet_failed = True
-                    break
-
-        # Post English tweets
-        if en_auth is not None:
-            for t in en_tweets:
-                try:
-                    result = create_tweet_with_playwright(browser, en_auth, t)
-                    tweet_id = result["data"]["id"]
-                    print(f"Successfully posted English tweet (ID: {tweet_id})")
-                except Exception as e:
-                    print(f"Failed to tweet: {e}")
-                    print(f"Tweet text: {t}")
-                    tweet_failed = True
-                    break
-
-        browser.close()
+    # Tweets already posted by a failed run are skipped
+    state = PostingState(args.state)
+    date_key = today.format('YYYY-MM-DD')
+
+    # Post directly, and through a real browser context only if Cloudflare challenges
+    with HttpTransport(fallback=PlaywrightTransport()) as transport:
+        scheduler = PostingScheduler(transport, state)
+
+        for (label, key, auth, tweets) in [
+            ('Japanese', f"ja:{date_key}", ja_auth, ja_tweets),
+            ('English', f"en:{date_key}", en_auth, en_tweets),
+        ]:
+            if auth is None:
+                continue
+            try:
+                tweet_ids = scheduler.post_thread(key, auth, tweets)
+                print(f"Successfully posted {label} tweets (IDs: {', '.join(tweet_ids)})")
+            except PostingError as e:
+                print(f"Failed to tweet: {e}")
+                tweet_failed = True
 
     if tweet_failed:
         return 3
@@ -273,4 +213,7 @@ def main() -> int:
     return 0
 
 if __name__ == "__main__":
-    sys.exit(main())
+    args = parse_args()
+    with Profiler.from_args(args):
+        status = main(args)
+    sys.exit(status)
@@ -1,3 +1,3 @@
 #!/bin/bash
 
-poetry run python tweet_todays_events.py docs/data/talents.csv docs/data/events.csv docs/data/tickets.csv
+poetry run python tweet_todays_events.py docs/data/talents.csv docs/data/events.csv docs/data/tickets.csv "$@"